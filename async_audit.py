@@ -0,0 +1,206 @@
+# asyncio counterparts of the audit.py getters
+# The queries, orderings and paging rules all come from audit.py; this module only
+# decides how the rows are read, so the two APIs always return the same rows.
+from contextlib import aclosing
+
+import audit
+from async_database import aiomysql, get_conn
+from audit import (
+    ARCHIVE_CUTOFF_SQL,
+    DEFAULT_PAGE_SIZE,
+    ROLE_SUMMARY_SQL,
+    USER_SUMMARY_SQL,
+    cached_archive_cutoff,
+    choose_source,
+    remember_archive_cutoff,
+)
+
+"""
+    Returns the newest changed_at in audit_log_archive, or None if nothing has been archived.
+    Shares its cached answer with audit.get_archive_cutoff().
+"""
+async def get_archive_cutoff(cur):
+    fresh, cutoff = cached_archive_cutoff()
+    if fresh:
+        return cutoff
+
+    try:
+        await cur.execute(ARCHIVE_CUTOFF_SQL)
+        row = await cur.fetchone()
+        cutoff = (row["cutoff"] if isinstance(row, dict) else row[0]) if row else None
+    except aiomysql.Error:
+        # Database has not been migrated to the partitioned layout yet
+        cutoff = None
+    return remember_archive_cutoff(cutoff)
+
+
+""" Picks audit_log or audit_log_all for a query, like audit.audit_source() """
+async def audit_source(cur, start_time=None) -> str:
+    return choose_source(await get_archive_cutoff(cur), start_time)
+
+"""
+    Async iterator over one of the audit.py KeysetStream queries, page_size rows per
+    round trip. Rows come from an unbuffered cursor, so the event loop is free while
+    MySQL is still sending them. `resume_token` works like KeysetStream's.
+"""
+class AsyncKeysetStream:
+    def __init__(self, stream: audit.KeysetStream):
+        self.stream = stream
+
+    @property
+    def resume_token(self):
+        return self.stream.resume_token
+
+    def __aiter__(self):
+        return self._rows()
+
+    async def _rows(self):
+        stream = self.stream
+        last = stream.start_position()
+
+        async with get_conn() as conn:
+            cur = await conn.cursor(aiomysql.SSDictCursor)
+            try:
+                if stream.since_sql:
+                    await cur.execute(stream.since_sql)
+                    stream.set_since((await cur.fetchall())[0]["since"])
+                source = await audit_source(cur, stream.start_time)
+                while True:
+                    await cur.execute(*stream.page_query(source, last))
+                    fetched = 0
+                    async for row in cur:
+                        fetched += 1
+                        last = stream.advance(row)
+                        yield stream.query.decode(row)
+                    if stream.is_last_page(fetched):
+                        break
+            finally:
+                # Closing an unbuffered cursor reads whatever the caller left unread
+                await cur.close()
+
+
+""" The server's NOW() - INTERVAL 1 MONTH, like audit.one_month_ago() """
+async def one_month_ago():
+    async with get_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(audit.ONE_MONTH_AGO_SQL)
+            return (await cur.fetchone())[0]
+
+
+""" Reads a whole stream into a list """
+async def collect(stream):
+    return [row async for row in stream]
+
+"""
+    Reads one page (page_size rows) of a stream and releases its connection straight away.
+    Returns the rows and the token for the next page, or None when there is nothing left.
+"""
+async def fetch_page(stream):
+    page_size = stream.stream.page_size
+    rows = []
+    async with aclosing(stream.__aiter__()) as page:
+        async for row in page:
+            rows.append(row)
+            if page_size and len(rows) >= page_size:
+                break
+    more = bool(page_size) and len(rows) >= page_size
+    return rows, (stream.resume_token if more else None)
+
+""" Streams salary changes in the last month, newest first """
+def iter_salary_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return AsyncKeysetStream(audit.iter_salary_changes_last_month(page_size, resume_token, since))
+
+async def get_salary_changes_last_month():
+    return await collect(iter_salary_changes_last_month(page_size=None))
+
+""" Streams name changes in the last month, newest first """
+def iter_name_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return AsyncKeysetStream(audit.iter_name_changes_last_month(page_size, resume_token, since))
+
+async def get_name_changes_last_month():
+    return await collect(iter_name_changes_last_month(page_size=None))
+
+""" Streams department changes in the last month, newest first """
+def iter_department_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return AsyncKeysetStream(audit.iter_department_changes_last_month(page_size, resume_token, since))
+
+async def get_department_changes_last_month():
+    return await collect(iter_department_changes_last_month(page_size=None))
+
+""" Streams role changes in the last month, newest first """
+def iter_role_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return AsyncKeysetStream(audit.iter_role_changes_last_month(page_size, resume_token, since))
+
+async def get_role_changes_last_month():
+    return await collect(iter_role_changes_last_month(page_size=None))
+
+""" Streams salary changes of at least min_pct percent, newest first """
+def iter_salary_raises(min_pct, since=None, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_salary_raises(min_pct, since, page_size, resume_token))
+
+async def get_salary_raises(min_pct, since=None):
+    return await collect(iter_salary_raises(min_pct, since, page_size=None))
+
+""" Streams all changes between start_time and end_time, oldest first """
+def iter_changes_in_range(start_time: str, end_time: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_changes_in_range(start_time, end_time, page_size, resume_token))
+
+async def get_changes_in_range(start_time: str, end_time: str):
+    return await collect(iter_changes_in_range(start_time, end_time, page_size=None))
+
+""" Streams the provenance chain for a specific field of an employee, oldest first """
+def iter_field_history(employee_id: int, field_name: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_field_history(employee_id, field_name, page_size, resume_token))
+
+async def trace_field_history(employee_id: int, field_name: str):
+    return await collect(iter_field_history(employee_id, field_name, page_size=None))
+
+""" Streams all changes made to a specific employee, oldest first """
+def iter_all_changes_for_employee(employee_id: int, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_all_changes_for_employee(employee_id, page_size, resume_token))
+
+async def get_all_changes_for_employee(employee_id: int):
+    return await collect(iter_all_changes_for_employee(employee_id, page_size=None))
+
+""" Streams all changes made by a specific user, newest first """
+def iter_changes_by_user(username: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_changes_by_user(username, page_size, resume_token))
+
+async def get_changes_by_user(username: str):
+    return await collect(iter_changes_by_user(username, page_size=None))
+
+""" Streams the whole audit log ordered by user """
+def iter_all_changes_organized_by_user(page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_all_changes_organized_by_user(page_size, resume_token))
+
+async def get_all_changes_organized_by_user():
+    return await collect(iter_all_changes_organized_by_user(page_size=None))
+
+""" Streams all changes made by users with a specific role, newest first """
+def iter_changes_by_role(role: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_changes_by_role(role, page_size, resume_token))
+
+async def get_changes_by_role(role: str):
+    return await collect(iter_changes_by_role(role, page_size=None))
+
+""" Streams the whole audit log ordered by role """
+def iter_all_changes_organized_by_role(page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return AsyncKeysetStream(audit.iter_all_changes_organized_by_role(page_size, resume_token))
+
+async def get_all_changes_organized_by_role():
+    return await collect(iter_all_changes_organized_by_role(page_size=None))
+
+
+async def _get_change_summary(sql):
+    async with get_conn() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(sql.format(source=await audit_source(cur)))
+            return await cur.fetchall()
+
+""" Per-user change counts, field breakdown and first/last change time """
+async def get_change_summary_by_user():
+    return await _get_change_summary(USER_SUMMARY_SQL)
+
+""" Per-role change counts, field breakdown and first/last change time """
+async def get_change_summary_by_role():
+    return await _get_change_summary(ROLE_SUMMARY_SQL)
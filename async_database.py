@@ -0,0 +1,160 @@
+# asyncio counterpart of database.py, for services that answer many audit lookups at once
+import asyncio
+from contextlib import asynccontextmanager
+
+from rich import print
+
+from lazy import lazy_import
+from database import SESSION_VARIABLES, USER_ROLE_SQL, get_auth_cache, get_db_config, get_pool_config
+
+# Loaded on first use so importing this module stays cheap
+aiomysql = lazy_import("aiomysql")
+
+"""
+    asyncio pool of MySQL connections on top of aiomysql.
+    Uses the same DB_POOL_* settings as the blocking pool in database.py and gives
+    connections back in the same state: open work rolled back and the app session
+    variables cleared, so one borrower's identity never leaks to the next.
+"""
+class AsyncConnectionPool:
+    def __init__(self, config, min_size=1, max_size=10, idle_timeout=300.0, wait_timeout=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._pool = None
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "discarded": 0,
+        }
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        host=self.config["host"],
+                        port=self.config["port"],
+                        user=self.config["user"],
+                        password=self.config["password"],
+                        db=self.config["database"],
+                        minsize=self.min_size,
+                        maxsize=self.max_size,
+                        # Connections idle longer than this are reopened on checkout
+                        pool_recycle=int(self.idle_timeout),
+                        autocommit=False,
+                    )
+        return self._pool
+
+    """ Borrow a connection, waiting up to wait_timeout if the pool is exhausted. """
+    async def acquire(self):
+        pool = await self._get_pool()
+        if pool.freesize == 0 and pool.size >= self.max_size:
+            self.stats["waits"] += 1
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No database connection available after {self.wait_timeout}s") from None
+        self.stats["checkouts"] += 1
+        return conn
+
+    """ Return a connection, rolling back open work and clearing the app session variables. """
+    async def release(self, conn):
+        try:
+            await conn.rollback()
+            async with conn.cursor() as cur:
+                await cur.execute("SET " + ", ".join(f"{var} = NULL" for var in SESSION_VARIABLES) + ";")
+        except aiomysql.Error:
+            # Closed connections are dropped by the pool instead of being reused
+            self.stats["discarded"] += 1
+            conn.close()
+        self._pool.release(conn)
+
+    """ Close every connection (used on shutdown). """
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    def snapshot(self):
+        pool = self._pool
+        open_count = pool.size if pool else 0
+        idle = pool.freesize if pool else 0
+        return {
+            **self.stats,
+            "open": open_count,
+            "idle": idle,
+            "in_use": open_count - idle,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+        }
+
+
+_pool = None
+
+"""
+    Returns the process-wide async pool, creating it on first use.
+    aiomysql connections belong to the event loop that opened them, so the pool
+    should only be used from one loop (the service's).
+"""
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(get_db_config(), **get_pool_config())
+    return _pool
+
+
+""" Returns checkout/wait counters and current sizes for the async pool. """
+def get_pool_stats():
+    return get_pool().snapshot()
+
+
+""" Closes the async pool, e.g. when the service shuts down. """
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+""" Borrows a pooled db connection and hands it back when done """
+@asynccontextmanager
+async def get_conn():
+    pool = get_pool()
+    conn = await pool.acquire()
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+"""
+    Set session variables used by the MySQL trigger to know who is making changes.
+    Must be called on the same connection before UPDATE statements.
+"""
+async def set_app_identity(cursor, username: str, role: str | None, justification: str | None = None):
+    await cursor.execute(
+        "SET @app_current_user = %s, @app_current_role = %s, @app_justification = %s;",
+        (username, role, justification),
+    )
+    print(f"[green]Session identity set:[/green] user={username}, role={role}")
+
+
+"""
+    Validates that the given username exists in the employees table with the specified role.
+    Returns True if the user has the role, False otherwise. Shares the authorization
+    cache with database.validate_user_role().
+"""
+async def validate_user_role(cursor, username: str, role: str) -> bool:
+    cache = get_auth_cache()
+    authorized = cache.get(username, role)
+    if authorized is None:
+        await cursor.execute(USER_ROLE_SQL, (username, role))
+        authorized = await cursor.fetchone() is not None
+        cache.put(username, role, authorized)
+    return authorized
@@ -1,61 +1,314 @@
 # Auditing functions
+import base64
+import json
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import groupby
+
 from tabulate import tabulate
 from rich import print
 
-from database import get_conn
+from audit_query import AUDIT_COLUMNS, BY_ROLE, BY_USER, NEWEST_FIRST, OLDEST_FIRST, AuditQuery
+from database import get_conn, get_pool, mysql_connector, prepared_cursor
+from provenance_cache import get_provenance_cache
+
+# The streamed reports are AuditQuery objects (see audit_query.py). The summaries are
+# kept as SQL at module level so verify_indexes.py can EXPLAIN exactly what runs here.
+# One row per editor / editor role with counts per field and first/last change,
+# so the overview transfers O(groups) rows instead of the whole log
+SUMMARY_SELECT = """
+        COUNT(*)                         AS changes,
+        SUM(column_name = 'salary')      AS salary_changes,
+        SUM(column_name = 'full_name')   AS name_changes,
+        SUM(column_name = 'department')  AS department_changes,
+        SUM(column_name = 'role')        AS role_changes,
+        MIN(changed_at)                  AS first_change,
+        MAX(changed_at)                  AS last_change
+"""
+
+USER_SUMMARY_SQL = """
+    SELECT
+        changed_by AS group_key,""" + SUMMARY_SELECT + """    FROM {source}
+    GROUP BY changed_by
+    ORDER BY changed_by;
+"""
+
+ROLE_SUMMARY_SQL = """
+    SELECT
+        changed_role AS group_key,""" + SUMMARY_SELECT + """    FROM {source}
+    GROUP BY changed_role
+    ORDER BY changed_role;
+"""
+
+DEFAULT_PAGE_SIZE = 500
+
+# audit_log is partitioned by month and old partitions are moved to audit_log_archive
+# by partitions.py. audit_log_all is a view over both tables.
+LIVE_SOURCE = "audit_log"
+ALL_SOURCE = "audit_log_all"
+ARCHIVE_CHECK_TTL = 60  # seconds to remember the archive cutoff
+ARCHIVE_CUTOFF_SQL = "SELECT MAX(changed_at) AS cutoff FROM audit_log_archive;"
+
+_archive_cutoff = None
+_archive_checked_at = None
+
+"""
+    Returns the newest changed_at in audit_log_archive, or None if nothing has been archived.
+    The answer is cached for ARCHIVE_CHECK_TTL seconds so most reports skip the lookup.
+"""
+def get_archive_cutoff(cur):
+    fresh, cutoff = cached_archive_cutoff()
+    if fresh:
+        return cutoff
+
+    try:
+        cur.execute(ARCHIVE_CUTOFF_SQL)
+        cutoff = _first_value(cur.fetchone())
+    except mysql_connector.Error:
+        # Database has not been migrated to the partitioned layout yet
+        cutoff = None
+    return remember_archive_cutoff(cutoff)
+
+""" Returns (fresh, cutoff) for the last archive cutoff lookup. """
+def cached_archive_cutoff():
+    if _archive_checked_at is not None and time.monotonic() - _archive_checked_at < ARCHIVE_CHECK_TTL:
+        return True, _archive_cutoff
+    return False, None
+
+
+def remember_archive_cutoff(cutoff):
+    global _archive_cutoff, _archive_checked_at
+    _archive_cutoff = cutoff
+    _archive_checked_at = time.monotonic()
+    return cutoff
+
+
+def _first_value(row):
+    if row is None:
+        return None
+    return row["cutoff"] if isinstance(row, dict) else row[0]
+
+"""
+    Picks the table a query should read from. Queries only need the archive when it
+    holds rows at or after start_time (or for all-time queries, when it holds any rows).
+"""
+def audit_source(cur, start_time=None) -> str:
+    return choose_source(get_archive_cutoff(cur), start_time)
+
+
+def choose_source(cutoff, start_time=None) -> str:
+    if cutoff is None:
+        return LIVE_SOURCE
+    if start_time is not None:
+        if isinstance(start_time, str):
+            start_time = datetime.fromisoformat(start_time)
+        if start_time > cutoff:
+            return LIVE_SOURCE
+    return ALL_SOURCE
+
+# Start of the last-month window in the server's clock and time zone, like changed_at
+ONE_MONTH_AGO_SQL = "SELECT NOW() - INTERVAL 1 MONTH AS since;"
+
+"""
+    The server's NOW() - INTERVAL 1 MONTH, read once so the bound reaches the report
+    queries as a constant and the partitions can be pruned. Uses `cur` when given,
+    otherwise borrows a pooled connection.
+"""
+def one_month_ago(cur=None) -> datetime:
+    if cur is None:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            since = one_month_ago(cur)
+            cur.close()
+        return since
+    cur.execute(ONE_MONTH_AGO_SQL)
+    row = cur.fetchone()
+    return row["since"] if isinstance(row, dict) else row[0]
+
+
+
+""" Opaque token holding the ordering values of the last row a caller received """
+def encode_resume_token(values) -> str:
+    payload = [v.isoformat(sep=" ") if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode()
+
+
+def decode_resume_token(token: str):
+    return json.loads(base64.urlsafe_b64decode(token.encode()))
+
+"""
+    Streams the rows of an AuditQuery, page_size rows per round trip, using keyset
+    pagination on the query's ordering columns instead of OFFSET.
+    Each page runs as a prepared statement that the connection keeps for the next
+    call, so MySQL parses and plans each query shape once per connection.
+    After each row, `resume_token` can be passed to a new stream to continue after it.
+    page_size=None reads everything in a single query.
+    since_sql, when given, is run once on the stream's connection before the first
+    page and its single value becomes the query's `since` (ex: ONE_MONTH_AGO_SQL).
+"""
+class KeysetStream:
+    def __init__(self, query: AuditQuery, page_size=DEFAULT_PAGE_SIZE, resume_token=None, since_sql=None):
+        self.query = query
+        self.order = query.order
+        self.page_size = page_size
+        self.resume_token = resume_token
+        self.start_time = query.since
+        self.since_sql = since_sql
+
+    """ Fixes the lower changed_at bound once since_sql has been answered """
+    def set_since(self, since):
+        self.query.since = since
+        self.start_time = since
+        self.since_sql = None
+
+    """ Ordering values of the row to continue after, or None to start from the top """
+    def start_position(self):
+        return decode_resume_token(self.resume_token) if self.resume_token else None
+
+    """ SQL and parameters for the page that follows the row whose ordering values were `last` """
+    def page_query(self, source, last):
+        return self.query.page_query(source, last, self.page_size)
+
+    """ Records a row as delivered and returns its ordering values """
+    def advance(self, row):
+        last = [row[column] for column, _ in self.order]
+        self.resume_token = encode_resume_token(last)
+        return last
+
+    """ True when a page with `fetched` rows means there is nothing left to read """
+    def is_last_page(self, fetched):
+        return not self.page_size or fetched < self.page_size
+
+    def __iter__(self):
+        last = self.start_position()
+
+        with get_conn() as conn:
+            cur = conn.cursor()
+            if self.since_sql:
+                cur.execute(self.since_sql)
+                self.set_since(cur.fetchone()[0])
+            source = audit_source(cur, self.start_time)
+            cur.close()
+
+            while True:
+                sql, params = self.page_query(source, last)
+                cur = prepared_cursor(conn, sql)
+                cur.execute(sql, params)
+                fetched = 0
+                try:
+                    for row in cur:
+                        fetched += 1
+                        last = self.advance(row)
+                        yield self.query.decode(row)
+                except GeneratorExit:
+                    # The caller stopped part way through a page. The cursor is kept
+                    # for reuse, so read off the rest of the page now.
+                    cur.fetchall()
+                    raise
+                if self.is_last_page(fetched):
+                    break
+
+"""
+    Prints rows as they arrive, one grid per chunk_size rows, so the first rows show
+    up straight away and the whole report never has to sit in memory.
+    before_rows runs once the first row is known to exist.
+    Returns the number of rows printed.
+"""
+def print_stream(rows, to_row, headers, title, empty, before_rows=None, chunk_size=DEFAULT_PAGE_SIZE):
+    count = 0
+    chunk = []
+    for row in rows:
+        if count == 0:
+            if title:
+                print(title)
+            if before_rows:
+                before_rows()
+        chunk.append(to_row(row))
+        count += 1
+        if len(chunk) >= chunk_size:
+            print(tabulate(chunk, headers=headers, tablefmt="grid"))
+            chunk = []
+
+    if chunk:
+        print(tabulate(chunk, headers=headers, tablefmt="grid"))
+    if count == 0:
+        print(empty)
+    return count
+
+# Column names of the last-month reports: field -> (old value, new value)
+LAST_MONTH_VALUE_NAMES = {
+    "salary": ("old_salary", "new_salary"),
+    "full_name": ("old_name", "new_name"),
+    "department": ("old_department", "new_department"),
+    "role": ("old_role", "new_role"),
+}
+
+# What each report renders, so only those columns cross the wire
+LAST_MONTH_COLUMNS = ("audit_id", "row_id", "old_value", "new_value",
+                      "changed_by", "changed_role", "justification", "changed_at")
+FIELD_HISTORY_COLUMNS = ("audit_id", "old_value", "new_value",
+                         "changed_by", "changed_role", "justification", "changed_at")
+EMPLOYEE_CHANGES_COLUMNS = ("audit_id", "column_name") + FIELD_HISTORY_COLUMNS[1:]
+CHANGE_COLUMNS = AUDIT_COLUMNS
+USER_CHANGE_COLUMNS = tuple(c for c in AUDIT_COLUMNS if c != "changed_by")
+ROLE_CHANGE_COLUMNS = tuple(c for c in AUDIT_COLUMNS if c != "changed_role")
+
+"""
+    Streams changes to one employee field since `since` (default: one month before the
+    server's NOW(), read when the stream starts), newest first. Backs the four
+    last-month reports, which only differ in the field.
+"""
+def iter_field_changes_last_month(field: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    old_name, new_name = LAST_MONTH_VALUE_NAMES[field]
+    query = AuditQuery(
+        LAST_MONTH_COLUMNS,
+        aliases={"row_id": "employee_id", "old_value": old_name, "new_value": new_name},
+        table_name="employees",
+        columns=(field,),
+        since=since,
+    )
+    return KeysetStream(query, page_size, resume_token, since_sql=None if since else ONE_MONTH_AGO_SQL)
+
+""" Streams salary changes in the last month, newest first """
+def iter_salary_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return iter_field_changes_last_month("salary", page_size, resume_token, since)
 
 """ Shows all salary changes in the last month """
 def get_salary_changes_last_month():
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT
-                audit_id,
-                row_id      AS employee_id,
-                old_value   AS old_salary,
-                new_value   AS new_salary,
-                changed_by,
-                changed_role,
-                justification,
-                changed_at
-            FROM audit_log
-            WHERE table_name = 'employees'
-              AND column_name = 'salary'
-              AND changed_at >= NOW() - INTERVAL 1 MONTH
-            ORDER BY changed_at DESC;
-            """
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_salary_changes_last_month(page_size=None))
+
+"""
+    Streams salary changes of at least min_pct percent (ex: 10 for raises over 10%),
+    newest first, optionally only since `since`. A range read on idx_audit_change_pct.
+"""
+def iter_salary_raises(min_pct, since=None, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    query = AuditQuery(LAST_MONTH_COLUMNS,
+                       aliases={"row_id": "employee_id", "old_value": "old_salary", "new_value": "new_salary"},
+                       table_name="employees", columns=("salary",), min_change_pct=min_pct, since=since)
+    return KeysetStream(query, page_size, resume_token)
+
+""" Get all salary changes of at least min_pct percent """
+def get_salary_raises(min_pct, since=None):
+    return list(iter_salary_raises(min_pct, since, page_size=None))
+
+""" Streams all changes between start_time and end_time, oldest first """
+def iter_changes_in_range(start_time: str, end_time: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    query = AuditQuery(CHANGE_COLUMNS, since=start_time, until=end_time, order=OLDEST_FIRST)
+    return KeysetStream(query, page_size, resume_token)
 
 """ Get all changes between start_time and end_time. """
 def get_changes_in_range(start_time: str, end_time: str):
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT *
-            FROM audit_log
-            WHERE changed_at BETWEEN %s AND %s
-            ORDER BY changed_at;
-            """,
-            (start_time, end_time),
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_changes_in_range(start_time, end_time, page_size=None))
 
 """ Shows all salary changes in the last month """
-def print_salary_changes_last_month():
-    rows = get_salary_changes_last_month()
-    if not rows:
-        print("[yellow]No salary changes in the last month.[/yellow]")
-        return
-
-    table = [
-        [
+def print_salary_changes_last_month(rows=None):
+    headers = ["Audit ID", "Employee ID", "Old Salary", "New Salary",
+               "Changed By", "Role", "Justification", "Changed At"]
+    print_stream(
+        iter_salary_changes_last_month() if rows is None else rows,
+        lambda r: [
             r["audit_id"],
             r["employee_id"],
             r["old_salary"],
@@ -64,23 +317,22 @@ def print_salary_changes_last_month():
             r["changed_role"],
             r["justification"] or "N/A",
             r["changed_at"],
-        ]
-        for r in rows
-    ]
-    headers = ["Audit ID", "Employee ID", "Old Salary", "New Salary",
-               "Changed By", "Role", "Justification", "Changed At"]
-    print("[bold cyan]Salary changes in the last month:[/bold cyan]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        ],
+        headers,
+        title="[bold cyan]Salary changes in the last month:[/bold cyan]",
+        empty="[yellow]No salary changes in the last month.[/yellow]",
+    )
 
 """ Display all changes made in a specific time range """
 def print_changes_in_range(start_time: str, end_time: str):
-    rows = get_changes_in_range(start_time, end_time)
-    if not rows:
-        print(f"[yellow]No changes between {start_time} and {end_time}.[/yellow]")
-        return
-
-    table = [
-        [
+    headers = [
+        "Audit ID", "Table", "Row ID", "Column",
+        "Old Value", "New Value", "Changed By",
+        "Role", "Justification", "Changed At",
+    ]
+    print_stream(
+        iter_changes_in_range(start_time, end_time),
+        lambda r: [
             r["audit_id"],
             r["table_name"],
             r["row_id"],
@@ -91,78 +343,35 @@ def print_changes_in_range(start_time: str, end_time: str):
             r["changed_role"],
             r["justification"] or "N/A",
             r["changed_at"],
-        ]
-        for r in rows
-    ]
-    headers = [
-        "Audit ID", "Table", "Row ID", "Column",
-        "Old Value", "New Value", "Changed By",
-        "Role", "Justification", "Changed At",
-    ]
-    print(f"[bold cyan]Changes between {start_time} and {end_time}:[/bold cyan]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        ],
+        headers,
+        title=f"[bold cyan]Changes between {start_time} and {end_time}:[/bold cyan]",
+        empty=f"[yellow]No changes between {start_time} and {end_time}.[/yellow]",
+    )
+
+""" Streams name changes in the last month, newest first """
+def iter_name_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return iter_field_changes_last_month("full_name", page_size, resume_token, since)
 
 """ Shows all name changes in the last month """
 def get_name_changes_last_month():
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT
-                audit_id,
-                row_id      AS employee_id,
-                old_value   AS old_name,
-                new_value   AS new_name,
-                changed_by,
-                changed_role,
-                justification,
-                changed_at
-            FROM audit_log
-            WHERE table_name = 'employees'
-              AND column_name = 'full_name'
-              AND changed_at >= NOW() - INTERVAL 1 MONTH
-            ORDER BY changed_at DESC;
-            """
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_name_changes_last_month(page_size=None))
+
+""" Streams department changes in the last month, newest first """
+def iter_department_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return iter_field_changes_last_month("department", page_size, resume_token, since)
 
 """ Shows all department changes in the last month """
 def get_department_changes_last_month():
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT
-                audit_id,
-                row_id      AS employee_id,
-                old_value   AS old_department,
-                new_value   AS new_department,
-                changed_by,
-                changed_role,
-                justification,
-                changed_at
-            FROM audit_log
-            WHERE table_name = 'employees'
-              AND column_name = 'department'
-              AND changed_at >= NOW() - INTERVAL 1 MONTH
-            ORDER BY changed_at DESC;
-            """
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_department_changes_last_month(page_size=None))
 
 """ Shows all name changes in the last month """
-def print_name_changes_last_month():
-    rows = get_name_changes_last_month()
-    if not rows:
-        print("[yellow]No name changes in the last month.[/yellow]")
-        return
-
-    table = [
-        [
+def print_name_changes_last_month(rows=None):
+    headers = ["Audit ID", "Employee ID", "Old Name", "New Name",
+               "Changed By", "Role", "Justification", "Changed At"]
+    print_stream(
+        iter_name_changes_last_month() if rows is None else rows,
+        lambda r: [
             r["audit_id"],
             r["employee_id"],
             r["old_name"],
@@ -171,23 +380,19 @@ def print_name_changes_last_month():
             r["changed_role"],
             r["justification"] or "N/A",
             r["changed_at"],
-        ]
-        for r in rows
-    ]
-    headers = ["Audit ID", "Employee ID", "Old Name", "New Name",
-               "Changed By", "Role", "Justification", "Changed At"]
-    print("[bold cyan]Name changes in the last month:[/bold cyan]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        ],
+        headers,
+        title="[bold cyan]Name changes in the last month:[/bold cyan]",
+        empty="[yellow]No name changes in the last month.[/yellow]",
+    )
 
 
-def print_department_changes_last_month():
-    rows = get_department_changes_last_month()
-    if not rows:
-        print("[yellow]No department changes in the last month.[/yellow]")
-        return
-
-    table = [
-        [
+def print_department_changes_last_month(rows=None):
+    headers = ["Audit ID", "Employee ID", "Old Department", "New Department",
+               "Changed By", "Role", "Justification", "Changed At"]
+    print_stream(
+        iter_department_changes_last_month() if rows is None else rows,
+        lambda r: [
             r["audit_id"],
             r["employee_id"],
             r["old_department"],
@@ -196,50 +401,28 @@ def print_department_changes_last_month():
             r["changed_role"],
             r["justification"] or "N/A",
             r["changed_at"],
-        ]
-        for r in rows
-    ]
-    headers = ["Audit ID", "Employee ID", "Old Department", "New Department",
-               "Changed By", "Role", "Justification", "Changed At"]
-    print("[bold cyan]Department changes in the last month:[/bold cyan]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        ],
+        headers,
+        title="[bold cyan]Department changes in the last month:[/bold cyan]",
+        empty="[yellow]No department changes in the last month.[/yellow]",
+    )
+
 
+""" Streams role changes in the last month, newest first """
+def iter_role_changes_last_month(page_size=DEFAULT_PAGE_SIZE, resume_token=None, since=None):
+    return iter_field_changes_last_month("role", page_size, resume_token, since)
 
 """ Shows all role changes in the last month """
 def get_role_changes_last_month():
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT
-                audit_id,
-                row_id      AS employee_id,
-                old_value   AS old_role,
-                new_value   AS new_role,
-                changed_by,
-                changed_role,
-                justification,
-                changed_at
-            FROM audit_log
-            WHERE table_name = 'employees'
-              AND column_name = 'role'
-              AND changed_at >= NOW() - INTERVAL 1 MONTH
-            ORDER BY changed_at DESC;
-            """
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_role_changes_last_month(page_size=None))
 
 
-def print_role_changes_last_month():
-    rows = get_role_changes_last_month()
-    if not rows:
-        print("[yellow]No role changes in the last month.[/yellow]")
-        return
-
-    table = [
-        [
+def print_role_changes_last_month(rows=None):
+    headers = ["Audit ID", "Employee ID", "Old Role", "New Role",
+               "Changed By", "Role", "Justification", "Changed At"]
+    print_stream(
+        iter_role_changes_last_month() if rows is None else rows,
+        lambda r: [
             r["audit_id"],
             r["employee_id"],
             r["old_role"],
@@ -248,62 +431,41 @@ def print_role_changes_last_month():
             r["changed_role"],
             r["justification"] or "N/A",
             r["changed_at"],
-        ]
-        for r in rows
-    ]
-    headers = ["Audit ID", "Employee ID", "Old Role", "New Role",
-               "Changed By", "Role", "Justification", "Changed At"]
-    print("[bold cyan]Role changes in the last month:[/bold cyan]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        ],
+        headers,
+        title="[bold cyan]Role changes in the last month:[/bold cyan]",
+        empty="[yellow]No role changes in the last month.[/yellow]",
+    )
 
 
+"""
+    Streams the provenance chain for a specific field of an employee, oldest first.
+"""
+def iter_field_history(employee_id: int, field_name: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    query = AuditQuery(FIELD_HISTORY_COLUMNS, table_name="employees", row_ids=(employee_id,),
+                       columns=(field_name,), order=OLDEST_FIRST)
+    return KeysetStream(query, page_size, resume_token)
+
 """
     Shows the complete provenance chain for a specific field of an employee.
     Traces all changes from the initial value to the current value.
 """
 def trace_field_history(employee_id: int, field_name: str):
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT
-                audit_id,
-                old_value,
-                new_value,
-                changed_by,
-                changed_role,
-                justification,
-                changed_at
-            FROM audit_log
-            WHERE table_name = 'employees'
-              AND row_id = %s
-              AND column_name = %s
-            ORDER BY changed_at ASC;
-            """,
-            (employee_id, field_name),
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_field_history(employee_id, field_name, page_size=None))
 
 
 """
     Displays the complete history/provenance chain for a specific field.
 """
 def print_field_history(employee_id: int, field_name: str):
-    rows = trace_field_history(employee_id, field_name)
+    # Served from the provenance cache, which also holds the current row
+    current_row, history = get_provenance_cache().get(employee_id)
+    rows = [r for r in history if r["column_name"] == field_name]
     if not rows:
         print(f"[yellow]No change history found for employee {employee_id}'s {field_name}.[/yellow]")
         return
 
-    # Get current value
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(f"SELECT {field_name} FROM employees WHERE employee_id = %s;", (employee_id,))
-        current_row = cur.fetchone()
-        cur.close()
-        current_value = current_row[field_name] if current_row else "N/A"
-
+    current_value = current_row.get(field_name, "N/A") if current_row else "N/A"
     print(f"[bold cyan]Complete Provenance Chain for Employee {employee_id} - {field_name}:[/bold cyan]")
     print(f"[bold green]Current Value:[/bold green] {current_value}\n")
 
@@ -323,58 +485,34 @@ def print_field_history(employee_id: int, field_name: str):
                "Role", "Justification", "Changed At"]
     print(tabulate(table, headers=headers, tablefmt="grid"))
 
+"""
+    Streams all changes made to a specific employee across all fields, oldest first.
+"""
+def iter_all_changes_for_employee(employee_id: int, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    query = AuditQuery(EMPLOYEE_CHANGES_COLUMNS, table_name="employees", row_ids=(employee_id,),
+                       order=OLDEST_FIRST)
+    return KeysetStream(query, page_size, resume_token)
+
 """
     Get all changes made to a specific employee across all fields.
 """
 def get_all_changes_for_employee(employee_id: int):
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT
-                audit_id,
-                column_name,
-                old_value,
-                new_value,
-                changed_by,
-                changed_role,
-                justification,
-                changed_at
-            FROM audit_log
-            WHERE table_name = 'employees'
-              AND row_id = %s
-            ORDER BY changed_at ASC;
-            """,
-            (employee_id,)
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_all_changes_for_employee(employee_id, page_size=None))
 
 """
     Display all changes made to a specific employee across all fields.
 """
 def print_all_changes_for_employee(employee_id: int):
-    rows = get_all_changes_for_employee(employee_id)
+    # Served from the provenance cache, which also holds the current row
+    current_row, rows = get_provenance_cache().get(employee_id)
     if not rows:
         print(f"[yellow]No change history found for employee {employee_id}.[/yellow]")
         return
 
-    # Get current employee info
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            "SELECT employee_id, full_name, department, role, salary FROM employees WHERE employee_id = %s;",
-            (employee_id,)
-        )
-        current_row = cur.fetchone()
-        cur.close()
-
+    print(f"[bold cyan]Complete Change History for Employee {employee_id}:[/bold cyan]")
     if current_row:
-        print(f"[bold cyan]Complete Change History for Employee {employee_id}:[/bold cyan]")
         print(f"[bold green]Current Info:[/bold green] {current_row['full_name']} | {current_row['department']} | {current_row['role']} | ${current_row['salary']}\n")
     else:
-        print(f"[bold cyan]Complete Change History for Employee {employee_id}:[/bold cyan]")
         print(f"[yellow]Employee not found in current records.[/yellow]\n")
 
     table = [
@@ -395,37 +533,31 @@ def print_all_changes_for_employee(employee_id: int):
     print(tabulate(table, headers=headers, tablefmt="grid"))
 
 
-    """
+"""
+    Streams all changes made by a specific user, newest first.
+"""
+def iter_changes_by_user(username: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    query = AuditQuery(USER_CHANGE_COLUMNS, users=(username,), order=NEWEST_FIRST)
+    return KeysetStream(query, page_size, resume_token)
+
+"""
     Get all changes made by a specific user.
-    """
+"""
 def get_changes_by_user(username: str):
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT *
-            FROM audit_log
-            WHERE changed_by = %s
-            ORDER BY changed_at DESC;
-            """,
-            (username,)
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_changes_by_user(username, page_size=None))
 
 
 """
     Display all changes made by a specific user.
 """
 def print_changes_by_user(username: str):
-    rows = get_changes_by_user(username)
-    if not rows:
-        print(f"[yellow]No changes found for user '{username}'.[/yellow]")
-        return
-
-    table = [
-        [
+    headers = [
+        "Audit ID", "Table", "Row ID", "Column",
+        "Old Value", "New Value", "Role", "Justification", "Changed At"
+    ]
+    print_stream(
+        iter_changes_by_user(username),
+        lambda r: [
             r["audit_id"],
             r["table_name"],
             r["row_id"],
@@ -435,56 +567,58 @@ def print_changes_by_user(username: str):
             r["changed_role"] or "N/A",
             r["justification"] or "N/A",
             r["changed_at"],
-        ]
-        for r in rows
-    ]
-    headers = [
-        "Audit ID", "Table", "Row ID", "Column",
-        "Old Value", "New Value", "Role", "Justification", "Changed At"
-    ]
-    print(f"[bold cyan]All changes by user '{username}':[/bold cyan]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        ],
+        headers,
+        title=f"[bold cyan]All changes by user '{username}':[/bold cyan]",
+        empty=f"[yellow]No changes found for user '{username}'.[/yellow]",
+    )
+
+"""
+    Streams the whole audit log ordered by user, newest change first within each user.
+"""
+def iter_all_changes_organized_by_user(page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return KeysetStream(AuditQuery(CHANGE_COLUMNS, order=BY_USER), page_size, resume_token)
 
 """
     Get all changes from audit log organized by user.
 """
 def get_all_changes_organized_by_user():
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT *
-            FROM audit_log
-            ORDER BY changed_by, changed_at DESC;
-            """
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_all_changes_organized_by_user(page_size=None))
 
 
-def print_all_changes_by_user():
-    """
-    Display all changes organized by user.
-    """
-    rows = get_all_changes_organized_by_user()
-    if not rows:
-        print("[yellow]No changes found in audit log.[/yellow]")
-        return
+"""
+    Key under which two names compare equal the way changed_by and changed_role do in
+    MySQL's default case- and accent-insensitive collation (utf8mb4_0900_ai_ci). The
+    by-user and by-role streams are sorted by that collation, so 'alice', 'Alice' and
+    'Álice' arrive interleaved and must be grouped on this key, not on the raw value.
+"""
+def _collation_key(value):
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
 
-    # Group changes by user
-    from collections import defaultdict
-    changes_by_user = defaultdict(list)
+""" Heading for one group: every spelling of `column` seen in it, or `missing` for NULL """
+def _group_label(rows, column, missing):
+    spellings = dict.fromkeys(r[column] for r in rows)
+    return " / ".join(spelling or missing for spelling in spellings)
 
-    for row in rows:
-        username = row["changed_by"] or "Unknown/No User"
-        changes_by_user[username].append(row)
+"""
+    Display all changes organized by user.
+    Rows arrive already ordered by user, so only one user's changes are held at a time.
+"""
+def print_all_changes_by_user():
+    rows = iter_all_changes_organized_by_user()
+    found = False
 
     # Display changes for each user
-    print("[bold cyan]All Changes Organized by User:[/bold cyan]\n")
+    for _, group in groupby(rows, key=lambda r: _collation_key(r["changed_by"])):
+        if not found:
+            print("[bold cyan]All Changes Organized by User:[/bold cyan]\n")
+            found = True
 
-    for username in sorted(changes_by_user.keys()):
-        user_changes = changes_by_user[username]
+        user_changes = list(group)
+        username = _group_label(user_changes, "changed_by", "Unknown/No User")
         print(f"\n[bold magenta]User: {username}[/bold magenta] ([green]{len(user_changes)} change(s)[/green])")
 
         table = [
@@ -507,36 +641,104 @@ def print_all_changes_by_user():
         ]
         print(tabulate(table, headers=headers, tablefmt="grid"))
 
+    if not found:
+        print("[yellow]No changes found in audit log.[/yellow]")
+
 """
-    Get all changes made by users with a specific role.
+    Runs one of the summary queries and returns a row per group.
 """
-def get_changes_by_role(role: str):
+def _get_change_summary(sql):
     with get_conn() as conn:
         cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT *
-            FROM audit_log
-            WHERE changed_role = %s
-            ORDER BY changed_at DESC;
-            """,
-            (role,)
-        )
+        cur.execute(sql.format(source=audit_source(cur)))
         rows = cur.fetchall()
         cur.close()
         return rows
 
 """
-    Display all changes made by users with a specific role.
+    Per-user change counts, field breakdown and first/last change time, computed in SQL.
 """
-def print_changes_by_role(role: str):
-    rows = get_changes_by_role(role)
-    if not rows:
-        print(f"[yellow]No changes found for role '{role}'.[/yellow]")
-        return
+def get_change_summary_by_user():
+    return _get_change_summary(USER_SUMMARY_SQL)
 
+"""
+    Per-role change counts, field breakdown and first/last change time, computed in SQL.
+    Changes made without a role are grouped under group_key None.
+"""
+def get_change_summary_by_role():
+    return _get_change_summary(ROLE_SUMMARY_SQL)
+
+
+def _print_change_summary(rows, label, unknown, title):
     table = [
         [
+            idx,
+            r["group_key"] or unknown,
+            r["changes"],
+            r["salary_changes"],
+            r["name_changes"],
+            r["department_changes"],
+            r["role_changes"],
+            r["first_change"],
+            r["last_change"],
+        ]
+        for idx, r in enumerate(rows, 1)
+    ]
+    headers = ["#", label, "Changes", "Salary", "Name", "Department", "Role",
+               "First Change", "Last Change"]
+    print(title)
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+
+"""
+    Display one summary line per user. Returns the summary rows so the caller can
+    drill down into a single user with print_changes_by_user().
+"""
+def print_change_summary_by_user():
+    rows = get_change_summary_by_user()
+    if not rows:
+        print("[yellow]No changes found in audit log.[/yellow]")
+        return rows
+    _print_change_summary(rows, "User", "Unknown/No User",
+                          "[bold cyan]Change Summary by User:[/bold cyan]")
+    return rows
+
+"""
+    Display one summary line per role. Returns the summary rows so the caller can
+    drill down into a single role with print_changes_by_role().
+"""
+def print_change_summary_by_role():
+    rows = get_change_summary_by_role()
+    if not rows:
+        print("[yellow]No changes found in audit log.[/yellow]")
+        return rows
+    _print_change_summary(rows, "Role", "Unknown/No Role",
+                          "[bold cyan]Change Summary by Role:[/bold cyan]")
+    return rows
+
+"""
+    Streams all changes made by users with a specific role, newest first.
+"""
+def iter_changes_by_role(role: str, page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    query = AuditQuery(ROLE_CHANGE_COLUMNS, roles=(role,), order=NEWEST_FIRST)
+    return KeysetStream(query, page_size, resume_token)
+
+"""
+    Get all changes made by users with a specific role.
+"""
+def get_changes_by_role(role: str):
+    return list(iter_changes_by_role(role, page_size=None))
+
+"""
+    Display all changes made by users with a specific role.
+"""
+def print_changes_by_role(role: str):
+    headers = [
+        "Audit ID", "Table", "Row ID", "Column",
+        "Old Value", "New Value", "Changed By", "Justification", "Changed At"
+    ]
+    print_stream(
+        iter_changes_by_role(role),
+        lambda r: [
             r["audit_id"],
             r["table_name"],
             r["row_id"],
@@ -546,55 +748,40 @@ def print_changes_by_role(role: str):
             r["changed_by"],
             r["justification"] or "N/A",
             r["changed_at"],
-        ]
-        for r in rows
-    ]
-    headers = [
-        "Audit ID", "Table", "Row ID", "Column",
-        "Old Value", "New Value", "Changed By", "Justification", "Changed At"
-    ]
-    print(f"[bold cyan]All changes by role '{role}':[/bold cyan]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        ],
+        headers,
+        title=f"[bold cyan]All changes by role '{role}':[/bold cyan]",
+        empty=f"[yellow]No changes found for role '{role}'.[/yellow]",
+    )
+
+"""
+    Streams the whole audit log ordered by role, newest change first within each role.
+"""
+def iter_all_changes_organized_by_role(page_size=DEFAULT_PAGE_SIZE, resume_token=None):
+    return KeysetStream(AuditQuery(CHANGE_COLUMNS, order=BY_ROLE), page_size, resume_token)
 
 """
     Get all changes from audit log organized by role.
 """
 def get_all_changes_organized_by_role():
-    with get_conn() as conn:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(
-            """
-            SELECT *
-            FROM audit_log
-            ORDER BY changed_role, changed_at DESC;
-            """
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+    return list(iter_all_changes_organized_by_role(page_size=None))
 
 """
     Display all changes organized by role.
+    Rows arrive already ordered by role, so only one role's changes are held at a time.
 """
 def print_all_changes_by_role():
-    rows = get_all_changes_organized_by_role()
-    if not rows:
-        print("[yellow]No changes found in audit log.[/yellow]")
-        return
-
-    # Group changes by role
-    from collections import defaultdict
-    changes_by_role = defaultdict(list)
-
-    for row in rows:
-        role = row["changed_role"] or "Unknown/No Role"
-        changes_by_role[role].append(row)
+    rows = iter_all_changes_organized_by_role()
+    found = False
 
     # Display changes for each role
-    print("[bold cyan]All Changes Organized by Role:[/bold cyan]\n")
+    for _, group in groupby(rows, key=lambda r: _collation_key(r["changed_role"])):
+        if not found:
+            print("[bold cyan]All Changes Organized by Role:[/bold cyan]\n")
+            found = True
 
-    for role in sorted(changes_by_role.keys()):
-        role_changes = changes_by_role[role]
+        role_changes = list(group)
+        role = _group_label(role_changes, "changed_role", "Unknown/No Role")
         print(f"\n[bold magenta]Role: {role}[/bold magenta] ([green]{len(role_changes)} change(s)[/green])")
 
         table = [
@@ -616,3 +803,56 @@ def print_all_changes_by_role():
             "Old Value", "New Value", "Changed By", "Justification", "Changed At"
         ]
         print(tabulate(table, headers=headers, tablefmt="grid"))
+
+    if not found:
+        print("[yellow]No changes found in audit log.[/yellow]")
+
+
+# Sections of the full monthly report: (field, streaming getter, printer)
+MONTHLY_REPORTS = (
+    ("salary", iter_salary_changes_last_month, print_salary_changes_last_month),
+    ("full_name", iter_name_changes_last_month, print_name_changes_last_month),
+    ("department", iter_department_changes_last_month, print_department_changes_last_month),
+    ("role", iter_role_changes_last_month, print_role_changes_last_month),
+)
+
+"""
+    Runs the four last-month reports over one shared window. With parallel=True each
+    report runs on its own pooled connection in a thread pool, so the wait is roughly
+    the slowest report instead of the sum of all four.
+    Returns ({field: rows}, seconds taken).
+"""
+def get_full_monthly_report(parallel=True):
+    since = one_month_ago()
+    started = time.perf_counter()
+
+    def run(factory):
+        return list(factory(page_size=None, since=since))
+
+    if parallel:
+        # Build the pool (and import the connector) here rather than in four threads at once
+        get_pool()
+        with ThreadPoolExecutor(max_workers=len(MONTHLY_REPORTS)) as executor:
+            futures = {field: executor.submit(run, factory) for field, factory, _ in MONTHLY_REPORTS}
+            report = {field: future.result() for field, future in futures.items()}
+    else:
+        report = {field: run(factory) for field, factory, _ in MONTHLY_REPORTS}
+    return report, time.perf_counter() - started
+
+"""
+    Display all four last-month reports, fetched in parallel.
+    With compare_serial=True the reports are fetched a second time one after another
+    and both wall times are shown.
+"""
+def print_full_monthly_report(compare_serial=False):
+    report, parallel_seconds = get_full_monthly_report(parallel=True)
+    for field, _, printer in MONTHLY_REPORTS:
+        printer(report[field])
+        print()
+
+    total = sum(len(rows) for rows in report.values())
+    print(f"[bold green]{total} change(s) in the last month, fetched in {parallel_seconds * 1000:.0f} ms[/bold green]")
+    if compare_serial:
+        _, serial_seconds = get_full_monthly_report(parallel=False)
+        speedup = serial_seconds / parallel_seconds if parallel_seconds else float("inf")
+        print(f"[bold green]Serial fetch took {serial_seconds * 1000:.0f} ms, parallel was {speedup:.1f}x faster[/bold green]")
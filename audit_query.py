@@ -0,0 +1,174 @@
+# Query engine for the audit_log reports
+# Every streamed report in audit.py is an AuditQuery: filters, an ordering and the
+# columns the caller actually uses. Equal queries compile to the very same SQL text,
+# so each connection prepares a query shape once and then only re-executes it
+# (see database.prepared_cursor).
+import sys
+
+AUDIT_COLUMNS = (
+    "audit_id", "table_name", "row_id", "column_name", "old_value", "new_value",
+    "changed_by", "changed_role", "justification", "changed_at",
+)
+
+# Keyset orderings: (column, direction) pairs ending in a unique column
+NEWEST_FIRST = (("changed_at", "DESC"), ("audit_id", "DESC"))
+OLDEST_FIRST = (("changed_at", "ASC"), ("audit_id", "ASC"))
+BY_USER = (("changed_by", "ASC"),) + NEWEST_FIRST
+BY_ROLE = (("changed_role", "ASC"),) + NEWEST_FIRST
+BY_AUDIT_ID = (("audit_id", "ASC"),)
+
+# Columns in audit_log that can be NULL, which keyset comparisons have to allow for
+NULLABLE_COLUMNS = {"changed_role"}
+
+# Salary changes keep their values in DECIMAL columns and leave old_value/new_value
+# NULL. Queries read both and decode_values() hands back a single typed value.
+AMOUNT_COLUMNS = {"old_value": "old_amount", "new_value": "new_amount"}
+
+"""
+    Folds the `<name>_amount` key of each value in `names` into `name`, so a salary
+    change comes back as a Decimal and every other change as text. Returns the row.
+"""
+def decode_values(row, names=tuple(AMOUNT_COLUMNS)):
+    for name in names:
+        amount = row.pop(f"{name}_amount", None)
+        if amount is not None:
+            row[name] = amount
+    return row
+
+
+"""
+    Condition that continues an ordering after the row whose ordering columns held
+    `last`. Returns (condition, params).
+"""
+def _keyset_condition(order, last):
+    (column, direction), value = order[0], last[0]
+    # MySQL sorts NULL first ascending and last descending
+    if value is None:
+        after, after_params = (f"{column} IS NOT NULL" if direction == "ASC" else "FALSE"), []
+    elif direction == "ASC":
+        after, after_params = f"{column} > %s", [value]
+    elif column in NULLABLE_COLUMNS:
+        after, after_params = f"({column} < %s OR {column} IS NULL)", [value]
+    else:
+        after, after_params = f"{column} < %s", [value]
+
+    if len(order) == 1:
+        return after, after_params
+
+    equals = "<=>" if column in NULLABLE_COLUMNS else "="
+    rest, rest_params = _keyset_condition(order[1:], last[1:])
+    return f"({after} OR ({column} {equals} %s AND {rest}))", after_params + [value] + rest_params
+
+
+def _in(column, values):
+    if len(values) == 1:
+        return f"{column} = %s", list(values)
+    return f"{column} IN ({', '.join(['%s'] * len(values))})", list(values)
+
+"""
+    One read of audit_log, built from filters instead of hand-written SQL.
+
+    projection  columns to return (the ordering columns are always added)
+    aliases     {column: name} to rename columns in the returned rows
+    audit_ids   specific audit rows
+    table_name  audited table, ex: 'employees'
+    columns     audited column names (column_name IN ...)
+    row_ids     audited row ids
+    users       editors (changed_by IN ...)
+    roles       editor roles; None matches changes made without a role
+    since/until inclusive changed_at bounds
+    min_change_pct  salary changes of at least this many percent (idx_audit_change_pct)
+    order       one of the keyset orderings above
+"""
+class AuditQuery:
+    def __init__(self, projection=AUDIT_COLUMNS, aliases=None, table_name=None, columns=(),
+                 row_ids=(), users=(), roles=(), since=None, until=None, order=NEWEST_FIRST,
+                 audit_ids=(), min_change_pct=None):
+        unknown = [c for c in projection if c not in AUDIT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown audit_log column(s): {', '.join(unknown)}")
+        order_columns = [column for column, _ in order]
+        self.projection = tuple(projection) + tuple(c for c in order_columns if c not in projection)
+        self.aliases = dict(aliases or {})
+        if any(c in self.aliases for c in order_columns):
+            raise ValueError("Ordering columns cannot be renamed")
+        self.audit_ids = tuple(dict.fromkeys(audit_ids))
+        self.table_name = table_name
+        self.columns = tuple(dict.fromkeys(columns))
+        self.row_ids = tuple(dict.fromkeys(row_ids))
+        self.users = tuple(dict.fromkeys(users))
+        self.roles = tuple(dict.fromkeys(roles))
+        self.since = since
+        self.until = until
+        self.order = order
+        self.min_change_pct = min_change_pct
+
+    def _select_list(self):
+        items = []
+        for column in self.projection:
+            name = self.aliases.get(column, column)
+            items.append(f"{column} AS {name}" if name != column else column)
+            if column in AMOUNT_COLUMNS:
+                items.append(f"{AMOUNT_COLUMNS[column]} AS {name}_amount")
+        return ", ".join(items)
+
+    """ Turns a fetched row into what callers see: one typed old/new value each """
+    def decode(self, row):
+        return decode_values(row, [self.aliases.get(c, c) for c in self.projection if c in AMOUNT_COLUMNS])
+
+    def _filters(self):
+        conditions, params = [], []
+
+        def add(condition, values):
+            conditions.append(condition)
+            params.extend(values)
+
+        if self.audit_ids:
+            add(*_in("audit_id", self.audit_ids))
+        if self.table_name is not None:
+            add("table_name = %s", [self.table_name])
+        if self.columns:
+            add(*_in("column_name", self.columns))
+        if self.row_ids:
+            add(*_in("row_id", self.row_ids))
+        if self.users:
+            add(*_in("changed_by", self.users))
+        if self.roles:
+            named = [r for r in self.roles if r is not None]
+            if len(self.roles) == 1:
+                add("changed_role <=> %s", list(self.roles))
+            elif None in self.roles:
+                condition, values = _in("changed_role", named)
+                add(f"({condition} OR changed_role IS NULL)", values)
+            else:
+                add(*_in("changed_role", named))
+        if self.since is not None:
+            add("changed_at >= %s", [self.since])
+        if self.until is not None:
+            add("changed_at <= %s", [self.until])
+        if self.min_change_pct is not None:
+            add("change_pct >= %s", [self.min_change_pct])
+        return conditions, params
+
+    """
+        SQL and parameters for up to `limit` rows after the row whose ordering values
+        were `last` (None for the first page, limit None for no limit).
+        Equal queries return the same interned string, so a prepared statement
+        cached by its text is found again.
+    """
+    def page_query(self, source, last=None, limit=None):
+        conditions, params = self._filters()
+        if last is not None:
+            keyset, keyset_params = _keyset_condition(list(self.order), list(last))
+            conditions.append(keyset)
+            params.extend(keyset_params)
+        if limit:
+            params.append(int(limit))
+
+        sql = (
+            f"SELECT {self._select_list()} FROM {source}"
+            f" WHERE {' AND '.join(conditions) or 'TRUE'}"
+            f" ORDER BY {', '.join(f'{column} {direction}' for column, direction in self.order)}"
+            f"{' LIMIT %s' if limit else ''};"
+        )
+        return sys.intern(sql), tuple(params)
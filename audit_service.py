@@ -0,0 +1,229 @@
+# Read-only HTTP/JSON service for the audit reports, for dashboards that poll
+#     python audit_service.py --host 127.0.0.1 --port 8080
+import argparse
+import asyncio
+import binascii
+import functools
+import json
+import time
+from datetime import datetime
+
+from aiohttp import web
+
+import async_audit
+from async_database import aiomysql, close_pool, get_conn
+from audit import DEFAULT_PAGE_SIZE, decode_resume_token
+from cdc import MAX_TRACKED_GAP
+from main import UPDATABLE_COLUMNS
+
+MAX_PAGE_SIZE = 5000
+ETAG_POLL_INTERVAL = 1.0  # seconds an audit log version lookup is shared between requests
+GZIP_MIN_BYTES = 1024     # smaller bodies are sent uncompressed
+
+# Newest audit_id, and how many rows sit in the MAX_TRACKED_GAP ids below it. A
+# transaction that commits after a later audit_id leaves MAX(audit_id) alone but
+# raises the count.
+AUDIT_LOG_VERSION_SQL = """
+    SELECT MAX(audit_id), COUNT(*) FROM audit_log
+    WHERE audit_id > (SELECT COALESCE(MAX(audit_id), 0) FROM audit_log) - %s;
+"""
+
+# Report name -> async_audit function. The *-last-month reports are paged;
+# the summaries are one row per group and come back whole.
+PAGED_REPORTS = {
+    "salary-last-month": async_audit.iter_salary_changes_last_month,
+    "name-last-month": async_audit.iter_name_changes_last_month,
+    "department-last-month": async_audit.iter_department_changes_last_month,
+    "role-last-month": async_audit.iter_role_changes_last_month,
+    "all-by-user": async_audit.iter_all_changes_organized_by_user,
+    "all-by-role": async_audit.iter_all_changes_organized_by_role,
+}
+SUMMARY_REPORTS = {
+    "summary-by-user": async_audit.get_change_summary_by_user,
+    "summary-by-role": async_audit.get_change_summary_by_role,
+}
+
+def _json_default(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else str(value)
+
+
+def _bad_request(message):
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+"""
+    Remembers the audit log version (newest audit_id and recent row count) for
+    ETAG_POLL_INTERVAL seconds. Any newly committed audit row changes it, including one
+    whose audit_id is below rows already seen, so it doubles as the version of every
+    report. Concurrent requests share one lookup.
+"""
+class AuditLogVersion:
+    def __init__(self, poll_interval=ETAG_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._value = None
+        self._checked_at = None
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.poll_interval:
+                async with get_conn() as conn:
+                    async with conn.cursor() as cur:
+                        await cur.execute(AUDIT_LOG_VERSION_SQL, (MAX_TRACKED_GAP,))
+                        row = await cur.fetchone()
+                self._value = f"{row[0] or 0}.{row[1]}" if row else "0.0"
+                self._checked_at = time.monotonic()
+            return self._value
+
+
+# Audit log version, shared by every request of an app
+AUDIT_LOG_VERSION = web.AppKey("audit_log_version", AuditLogVersion)
+
+
+def _page_size(request):
+    raw = request.query.get("page_size", str(DEFAULT_PAGE_SIZE))
+    try:
+        size = int(raw)
+    except ValueError:
+        raise _bad_request(f"page_size must be a number, got '{raw}'")
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise _bad_request(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return size
+
+
+def _time(request, name):
+    raw = request.query.get(name)
+    if raw is None:
+        raise _bad_request(f"missing '{name}'")
+    try:
+        return datetime.fromisoformat(raw).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise _bad_request(f"invalid {name} '{raw}', use YYYY-MM-DD HH:MM[:SS]")
+
+
+def _matches(if_none_match, etag):
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+"""
+    Answers 304 when the client already holds this version of the resource.
+    `window` is added to the tag for reports whose rows age out over time.
+"""
+async def _check_etag(request, window=None):
+    version = await request.app[AUDIT_LOG_VERSION].get()
+    etag = f'"{version}-{window}"' if window else f'"{version}"'
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and _matches(if_none_match, etag):
+        raise web.HTTPNotModified(headers={"ETag": etag})
+    return etag
+
+
+def _respond(request, body, etag):
+    response = web.Response(
+        body=json.dumps(body, default=_json_default).encode(),
+        content_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "no-cache"},
+    )
+    if len(response.body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("Accept-Encoding", ""):
+        response.enable_compression(web.ContentCoding.gzip)
+    return response
+
+"""
+    Runs one page of a stream factory. Rows come back with a `next` token to pass
+    as ?after= for the following page (null on the last page).
+"""
+async def _paged(request, factory, *args, window=None):
+    after = request.query.get("after")
+    stream = factory(*args, page_size=_page_size(request), resume_token=after)
+    if after:
+        try:
+            last = decode_resume_token(after)
+        except (binascii.Error, ValueError):
+            last = None
+        if not isinstance(last, list) or len(last) != len(stream.stream.order):
+            raise _bad_request("invalid 'after' token")
+
+    etag = await _check_etag(request, window)
+    rows, next_token = await async_audit.fetch_page(stream)
+    return _respond(request, {"rows": rows, "next": next_token}, etag)
+
+
+async def report(request):
+    name = request.match_info["name"]
+    if name in SUMMARY_REPORTS:
+        etag = await _check_etag(request)
+        return _respond(request, {"rows": await SUMMARY_REPORTS[name]()}, etag)
+    if name in PAGED_REPORTS:
+        factory, window = PAGED_REPORTS[name], None
+        if name.endswith("-last-month"):
+            # The last-month window moves, so the tag changes each minute as well.
+            # The bound comes from the server clock, like changed_at.
+            since = await async_audit.one_month_ago()
+            factory, window = functools.partial(factory, since=since), f"{since:%Y%m%d%H%M}"
+        return await _paged(request, factory, window=window)
+    raise web.HTTPNotFound(text=json.dumps({"error": f"unknown report '{name}'"}),
+                           content_type="application/json")
+
+
+async def changes_in_range(request):
+    return await _paged(request, async_audit.iter_changes_in_range,
+                        _time(request, "start"), _time(request, "end"))
+
+
+async def employee_changes(request):
+    try:
+        employee_id = int(request.match_info["employee_id"])
+    except ValueError:
+        raise _bad_request("employee id must be a number")
+    field = request.query.get("field")
+    if field is None:
+        return await _paged(request, async_audit.iter_all_changes_for_employee, employee_id)
+    if field not in UPDATABLE_COLUMNS:
+        raise _bad_request(f"field must be one of {', '.join(UPDATABLE_COLUMNS)}")
+    return await _paged(request, async_audit.iter_field_history, employee_id, field)
+
+
+async def user_changes(request):
+    return await _paged(request, async_audit.iter_changes_by_user, request.match_info["username"])
+
+
+async def role_changes(request):
+    return await _paged(request, async_audit.iter_changes_by_role, request.match_info["role"])
+
+
+@web.middleware
+async def database_errors(request, handler):
+    try:
+        return await handler(request)
+    except (aiomysql.Error, TimeoutError) as e:
+        return web.json_response({"error": f"database error: {e}"}, status=503)
+
+
+async def _shutdown(app):
+    await close_pool()
+
+
+def build_app(poll_interval=ETAG_POLL_INTERVAL):
+    app = web.Application(middlewares=[database_errors])
+    app[AUDIT_LOG_VERSION] = AuditLogVersion(poll_interval)
+    app.router.add_get("/reports/{name}", report)
+    app.router.add_get("/changes", changes_in_range)
+    app.router.add_get("/employees/{employee_id}/changes", employee_changes)
+    app.router.add_get("/users/{username}/changes", user_changes)
+    app.router.add_get("/roles/{role}/changes", role_changes)
+    app.on_cleanup.append(_shutdown)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only HTTP/JSON service for the audit reports.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--etag-poll", type=float, default=ETAG_POLL_INTERVAL,
+                        help="seconds between audit log version lookups for ETags")
+    args = parser.parse_args()
+    web.run_app(build_app(args.etag_poll), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# Bulk employee updates from a CSV or JSONL file
+import argparse
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+from database import get_auth_cache, get_conn, mysql_connector, set_app_identity, validate_user_role, with_retry
+from main import AUTHORIZED_ROLES
+from reference_data import get_reference_data
+
+UPDATABLE_FIELDS = ("salary", "full_name", "department", "role")
+FIELD_LIMITS = {"full_name": 255, "department": 100, "role": 100}
+
+CREATE_STAGING_SQL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS batch_changes (
+        line_no     INT PRIMARY KEY,
+        employee_id INT NOT NULL,
+        salary      DECIMAL(12,2) NULL,
+        full_name   VARCHAR(255) NULL,
+        department  VARCHAR(100) NULL,
+        role        VARCHAR(100) NULL,
+        INDEX (employee_id)
+    );
+"""
+
+STAGE_ROWS_SQL = """
+    INSERT INTO batch_changes (line_no, employee_id, salary, full_name, department, role)
+    VALUES (%s, %s, %s, %s, %s, %s);
+"""
+
+MISSING_EMPLOYEES_SQL = """
+    SELECT b.line_no, b.employee_id
+    FROM batch_changes b
+    LEFT JOIN employees e ON e.employee_id = b.employee_id
+    WHERE e.employee_id IS NULL;
+"""
+
+# Fields left empty in the file keep their current value
+APPLY_STAGED_SQL = """
+    UPDATE employees e
+    JOIN batch_changes b ON b.employee_id = e.employee_id
+    SET e.salary     = COALESCE(b.salary, e.salary),
+        e.full_name  = COALESCE(b.full_name, e.full_name),
+        e.department = COALESCE(b.department, e.department),
+        e.role       = COALESCE(b.role, e.role);
+"""
+
+APPLY_ONE_SQL = """
+    UPDATE employees
+    SET salary     = COALESCE(%s, salary),
+        full_name  = COALESCE(%s, full_name),
+        department = COALESCE(%s, department),
+        role       = COALESCE(%s, role)
+    WHERE employee_id = %s;
+"""
+
+"""
+    Reads change records from a .csv (with a header row) or .jsonl file.
+    Each record needs employee_id and at least one of salary, full_name, department, role.
+    Yields (line_no, record) pairs.
+"""
+def read_changes(path: Path):
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            # Line 1 is the header
+            for line_no, record in enumerate(csv.DictReader(f), 2):
+                yield line_no, record
+    elif path.suffix.lower() in (".jsonl", ".ndjson"):
+        with path.open(encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    record = {"_error": f"Invalid JSON: {e.msg}"}
+                if not isinstance(record, dict):
+                    record = {"_error": "Each line must be a JSON object"}
+                yield line_no, record
+    else:
+        raise ValueError(f"Unsupported file type '{path.suffix}'. Use .csv or .jsonl")
+
+"""
+    Checks one record and returns the staged row tuple (line_no, employee_id, salary,
+    full_name, department, role). Raises ValueError describing the problem.
+"""
+def parse_change(line_no: int, record: dict):
+    if "_error" in record:
+        raise ValueError(record["_error"])
+
+    try:
+        employee_id = int(str(record.get("employee_id", "")).strip())
+    except ValueError:
+        raise ValueError("employee_id must be an integer")
+
+    values = {}
+    for field in UPDATABLE_FIELDS:
+        value = record.get(field)
+        if value is None or str(value).strip() == "":
+            values[field] = None
+            continue
+        value = str(value).strip()
+        if field == "salary":
+            try:
+                salary = Decimal(value)
+            except InvalidOperation:
+                raise ValueError(f"salary '{value}' is not a number")
+            if salary < 0:
+                raise ValueError("salary cannot be negative")
+            values[field] = salary
+        else:
+            if len(value) > FIELD_LIMITS[field]:
+                raise ValueError(f"{field} is longer than {FIELD_LIMITS[field]} characters")
+            values[field] = value
+
+    if all(v is None for v in values.values()):
+        raise ValueError("no fields to update")
+
+    return (line_no, employee_id, values["salary"], values["full_name"],
+            values["department"], values["role"])
+
+"""
+    Splits staged rows into chunks of at most chunk_size with no employee repeated
+    inside a chunk, so a joined UPDATE applies each employee's changes in file order.
+"""
+def chunk_changes(rows, chunk_size: int):
+    chunk, seen = [], set()
+    for row in rows:
+        if len(chunk) >= chunk_size or row[1] in seen:
+            yield chunk
+            chunk, seen = [], set()
+        chunk.append(row)
+        seen.add(row[1])
+    if chunk:
+        yield chunk
+
+"""
+    Applies one chunk in a single transaction: the rows are bulk-inserted into a
+    temporary table with executemany and applied with one joined UPDATE.
+    Returns (rows applied, failures).
+"""
+def apply_chunk(conn, cur, chunk):
+    cur.execute("DELETE FROM batch_changes;")
+    cur.executemany(STAGE_ROWS_SQL, chunk)
+
+    cur.execute(MISSING_EMPLOYEES_SQL)
+    failures = [(line_no, employee_id, "employee not found") for line_no, employee_id in cur.fetchall()]
+    if failures:
+        cur.execute(
+            f"DELETE FROM batch_changes WHERE line_no IN ({', '.join(['%s'] * len(failures))});",
+            tuple(f[0] for f in failures),
+        )
+
+    cur.execute(APPLY_STAGED_SQL)
+    conn.commit()
+    return len(chunk) - len(failures), failures
+
+"""
+    Fallback when a chunk fails as a whole: applies its rows one at a time so only
+    the offending rows are reported.
+"""
+def apply_rows_individually(conn, cur, chunk):
+    applied, failures = 0, []
+    for line_no, employee_id, salary, full_name, department, role in chunk:
+        try:
+            cur.execute(APPLY_ONE_SQL, (salary, full_name, department, role, employee_id))
+            if cur.rowcount == 0:
+                cur.execute("SELECT 1 FROM employees WHERE employee_id = %s;", (employee_id,))
+                if cur.fetchone() is None:
+                    conn.rollback()
+                    failures.append((line_no, employee_id, "employee not found"))
+                    continue
+            conn.commit()
+            applied += 1
+        except mysql_connector.Error as e:
+            conn.rollback()
+            failures.append((line_no, employee_id, e.msg))
+    return applied, failures
+
+"""
+    Applies every change in the file as `username` acting as `role`.
+    The operator is validated and the audit identity set once for the whole batch.
+    Bad rows are reported and skipped; they never abort the batch.
+    Returns a dict with applied/failed counts, elapsed seconds and rows/sec.
+"""
+def apply_changes_file(path, username: str, role: str, justification: str | None = None, chunk_size: int = 500):
+    path = Path(path)
+    if role not in AUTHORIZED_ROLES:
+        print(f"[red]Role '{role}' is not allowed to make changes.[/red]")
+        return None
+
+    start = time.perf_counter()
+    staged, failures = [], []
+    for line_no, record in read_changes(path):
+        try:
+            staged.append(parse_change(line_no, record))
+        except ValueError as e:
+            failures.append((line_no, record.get("employee_id"), str(e)))
+
+    applied = 0
+    with get_conn() as conn:
+        cur = conn.cursor()
+        if not validate_user_role(cur, username, role):
+            print(f"[red]Authorization failed: User '{username}' does not have the role '{role}'.[/red]")
+            cur.close()
+            return None
+
+        set_app_identity(cur, username, role, justification)
+        cur.execute(CREATE_STAGING_SQL)
+
+        for chunk in chunk_changes(staged, chunk_size):
+            try:
+                # A deadlock with concurrent editors retries the chunk before falling back
+                chunk_applied, chunk_failures = with_retry(lambda: apply_chunk(conn, cur, chunk), conn=conn)
+            except mysql_connector.Error:
+                conn.rollback()
+                chunk_applied, chunk_failures = apply_rows_individually(conn, cur, chunk)
+            applied += chunk_applied
+            failures.extend(chunk_failures)
+
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS batch_changes;")
+        cur.close()
+
+    # Department and role pickers are cached; drop them if the batch moved anyone
+    if applied and any(row[4] is not None or row[5] is not None for row in staged):
+        get_reference_data().invalidate()
+    # Renames and role changes can grant or revoke edit rights
+    if applied and any(row[3] is not None or row[5] is not None for row in staged):
+        get_auth_cache().clear()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "applied": applied,
+        "failed": len(failures),
+        "failures": sorted(failures, key=lambda f: f[0]),
+        "seconds": elapsed,
+        "rows_per_second": applied / elapsed if elapsed else 0.0,
+    }
+
+"""
+    Runs a batch file and prints throughput and per-row failures.
+"""
+def print_batch_update(path, username: str, role: str, justification: str | None = None, chunk_size: int = 500):
+    result = apply_changes_file(path, username, role, justification, chunk_size)
+    if result is None:
+        return None
+
+    print(f"[green]Applied {result['applied']} change(s)[/green] in {result['seconds']:.2f}s "
+          f"({result['rows_per_second']:.0f} rows/sec)")
+    if result["failures"]:
+        print(f"[red]{result['failed']} row(s) failed:[/red]")
+        print(tabulate(result["failures"], headers=["Line", "Employee ID", "Error"], tablefmt="grid"))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply employee changes from a CSV or JSONL file.")
+    parser.add_argument("file", help="CSV (with header) or JSONL file with employee_id and fields to change")
+    parser.add_argument("--user", required=True, help="your username (for audit log)")
+    parser.add_argument("--role", required=True, choices=AUTHORIZED_ROLES, help="your authorized role")
+    parser.add_argument("--justification", help="reason recorded for every change in the batch")
+    parser.add_argument("--chunk-size", type=int, default=500, help="rows per transaction")
+    args = parser.parse_args()
+    print_batch_update(args.file, args.user, args.role, args.justification, args.chunk_size)
@@ -0,0 +1,120 @@
+# Times the authorization check (does this user hold this role?) four ways: the old
+# COUNT(*) with the name/role index ignored, the indexed lookup, and answers from the
+# authorization cache for granted and refused roles. Run it against a table of the size
+# you care about, for example after
+#     python -m benchmarks.generate_data --employees 100000 --audit-rows 1000000 --reset
+#     python -m benchmarks.bench_auth --checks 2000
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+import database
+from benchmarks.bench_suite import RESULTS_DIR, run_metadata
+from database import USER_ROLE_SQL, AuthCache, get_conn, validate_user_role
+from main import AUTHORIZED_ROLES
+
+# The lookup as it ran before idx_employees_name_role and the cache
+SCAN_SQL = ("SELECT COUNT(*) FROM employees IGNORE INDEX (idx_employees_name_role) "
+            "WHERE full_name = %s AND role = %s;")
+
+"""
+    Picks `count` random (name, role) pairs employees actually hold, and the same names
+    paired with an authorized role they do not hold.
+"""
+def sample_pairs(count, rng):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT full_name, role FROM employees WHERE role IS NOT NULL ORDER BY RAND(%s) LIMIT %s;",
+                    (rng.randint(0, 2 ** 31), count))
+        granted = cur.fetchall()
+        cur.close()
+    refused = [(name, next(r for r in AUTHORIZED_ROLES if r != role)) for name, role in granted]
+    return granted, refused
+
+""" Runs check(cur, name, role) for every pair and returns latency statistics in microseconds """
+def time_checks(check, pairs):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        # Warm up: buffer pool, and the cache for the cached cases
+        for name, role in pairs:
+            check(cur, name, role)
+        timings = []
+        for name, role in pairs:
+            start = time.perf_counter()
+            check(cur, name, role)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        cur.close()
+
+    timings.sort()
+    return {
+        "checks": len(timings),
+        "median_us": statistics.median(timings),
+        "p95_us": timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+        "mean_us": statistics.fmean(timings),
+    }
+
+
+def scan_check(cur, name, role):
+    cur.execute(SCAN_SQL, (name, role))
+    return cur.fetchone()[0] > 0
+
+
+def index_check(cur, name, role):
+    cur.execute(USER_ROLE_SQL, (name, role))
+    return cur.fetchone() is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark authorization check latency.")
+    parser.add_argument("--checks", type=int, default=2000, help="checks timed per case")
+    parser.add_argument("--seed", type=int, default=4270)
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/auth-<time>.json)")
+    args = parser.parse_args()
+
+    meta = run_metadata()
+    if meta["employees"] < 100000:
+        print(f"[yellow]Only {meta['employees']} employees; generate 100000 for the reference numbers.[/yellow]")
+
+    granted, refused = sample_pairs(args.checks, random.Random(args.seed))
+    if not granted:
+        print("[red]No employee has a role; nothing to check.[/red]")
+        raise SystemExit(1)
+
+    # A private cache with TTLs longer than the run, so the cached cases only measure hits
+    original = database._auth_cache
+    database._auth_cache = AuthCache(ttl=3600, negative_ttl=3600, max_entries=2 * len(granted))
+    try:
+        cases = [
+            ("scan (no index)", scan_check, granted),
+            ("indexed lookup", index_check, granted),
+            ("cache hit", validate_user_role, granted),
+            ("negative cache hit", validate_user_role, refused),
+        ]
+        results = []
+        for name, check, pairs in cases:
+            print(f"Timing {name}...")
+            results.append({"case": name, **time_checks(check, pairs)})
+        cache_stats = database._auth_cache.snapshot()
+    finally:
+        database._auth_cache = original
+
+    table = [[r["case"], r["checks"], f"{r['median_us']:.1f}", f"{r['p95_us']:.1f}", f"{r['mean_us']:.1f}"]
+             for r in results]
+    print(f"[bold cyan]Authorization check latency ({meta['employees']} employees):[/bold cyan]")
+    print(tabulate(table, headers=["Case", "Checks", "Median µs", "P95 µs", "Mean µs"], tablefmt="grid"))
+
+    output = args.output or RESULTS_DIR / f"auth-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": meta, "cases": results, "cache": cache_stats}, indent=2))
+    print(f"[green]Results written to {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# Times each salary statistic in salary_analytics.py against the same statistic
+# written the plain way, a Python loop over dict rows, and checks both give the same
+# answer. Only reads data; load a large history first, for example
+#     python -m benchmarks.generate_data --employees 100000 --audit-rows 10000000 --reset
+#     python -m benchmarks.bench_salary_analytics --repeat 3
+import argparse
+import json
+import math
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+import salary_analytics
+from benchmarks.bench_suite import RESULTS_DIR, run_metadata
+from salary_analytics import PERCENTILES, RAISE_EDGES, load_salary_history
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def py_percentile(ordered, q):
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def py_raise_pct(row):
+    if row["old_cents"] <= 0:
+        return None
+    return (row["new_cents"] - row["old_cents"]) * 100.0 / row["old_cents"]
+
+
+def py_raise_distribution(rows):
+    pcts = sorted(p for p in map(py_raise_pct, rows) if p is not None)
+    buckets = [0] * (len(RAISE_EDGES) + 1)
+    for pct in pcts:
+        index = 0
+        while index < len(RAISE_EDGES) and pct >= RAISE_EDGES[index]:
+            index += 1
+        buckets[index] += 1
+    return {
+        "count": len(pcts),
+        "percentiles": {q: py_percentile(pcts, q) for q in PERCENTILES} if pcts else {},
+        "buckets": buckets,
+    }
+
+
+def py_group_percentiles(rows, by="department", period="month"):
+    groups = defaultdict(list)
+    for row in rows:
+        pct = py_raise_pct(row)
+        if pct is None:
+            continue
+        changed_at = EPOCH + timedelta(seconds=row["seconds"])
+        months = (changed_at.year - 1970) * 12 + changed_at.month - 1
+        number = months // {"month": 1, "quarter": 3, "year": 12}[period]
+        groups[(row[by], number)].append(pct)
+
+    result = []
+    for (group, number), pcts in sorted(groups.items()):
+        pcts.sort()
+        result.append({
+            "group": group or "N/A",
+            "period": salary_analytics.period_label(number, period),
+            "count": len(pcts),
+            "mean": sum(pcts) / len(pcts),
+            **{f"p{q}": py_percentile(pcts, q) for q in PERCENTILES},
+        })
+    return result
+
+
+def py_cumulative_by_employee(rows):
+    totals = {}
+    for row in sorted(rows, key=lambda r: (r["employee_id"], r["seconds"], r["audit_id"])):
+        entry = totals.get(row["employee_id"])
+        if entry is None:
+            entry = totals[row["employee_id"]] = {"changes": 0, "first_cents": row["old_cents"], "total_cents": 0}
+        entry["changes"] += 1
+        entry["total_cents"] += row["new_cents"] - row["old_cents"]
+        entry["last_cents"] = row["new_cents"]
+    return totals
+
+
+def py_editor_totals(rows):
+    totals = defaultdict(lambda: {"changes": 0, "raises": 0, "cuts": 0, "net_cents": 0, "gross_cents": 0,
+                                  "pct_sum": 0.0, "pct_count": 0})
+    for row in rows:
+        entry = totals[row["changed_by"]]
+        delta = row["new_cents"] - row["old_cents"]
+        entry["changes"] += 1
+        entry["raises"] += delta > 0
+        entry["cuts"] += delta < 0
+        entry["net_cents"] += delta
+        entry["gross_cents"] += abs(delta)
+        pct = py_raise_pct(row)
+        if pct is not None:
+            entry["pct_sum"] += pct
+            entry["pct_count"] += 1
+    return totals
+
+""" Whether the NumPy result and the Python loop's result agree, per statistic """
+def same_distribution(fast, slow):
+    return (fast["count"] == slow["count"]
+            and [c for _, _, c in fast["buckets"]] == slow["buckets"]
+            and all(math.isclose(fast["percentiles"][q], slow["percentiles"][q], abs_tol=1e-9)
+                    for q in slow["percentiles"]))
+
+
+def same_groups(fast, slow):
+    return len(fast) == len(slow) and all(
+        f["group"] == s["group"] and f["period"] == s["period"] and f["count"] == s["count"]
+        and all(math.isclose(f[k], s[k], rel_tol=1e-9, abs_tol=1e-9)
+                for k in s if k == "mean" or (k.startswith("p") and k != "period"))
+        for f, s in zip(fast, slow)
+    )
+
+
+def same_cumulative(fast, slow):
+    return len(fast["employee_id"]) == len(slow) and all(
+        slow[int(e)] == {"changes": int(c), "first_cents": int(f), "total_cents": int(t), "last_cents": int(l)}
+        for e, c, f, t, l in zip(fast["employee_id"], fast["changes"], fast["first_cents"],
+                                 fast["total_cents"], fast["last_cents"])
+    )
+
+
+def same_editors(fast, slow):
+    return len(fast) == len(slow) and all(
+        all(r[k] == slow[r["changed_by"]][k] for k in ("changes", "raises", "cuts", "net_cents", "gross_cents"))
+        for r in fast
+    )
+
+""" Median seconds of `repeat` calls of func, and its last result """
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NumPy salary analytics against Python loops.")
+    parser.add_argument("--since", help="first changed_at to include")
+    parser.add_argument("--until", help="last changed_at to include")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per statistic")
+    parser.add_argument("--output", type=Path,
+                        help="results file (default: benchmarks/results/salary-analytics-<time>.json)")
+    args = parser.parse_args()
+
+    print("Loading salary history...")
+    start = time.perf_counter()
+    history = load_salary_history(args.since, args.until)
+    load_seconds = time.perf_counter() - start
+    rows = history.to_rows()
+    print(f"Loaded {len(history):,} salary changes in {load_seconds:.2f}s")
+
+    cases = [
+        ("raise distribution", lambda: salary_analytics.raise_distribution(history),
+         lambda: py_raise_distribution(rows), same_distribution),
+        ("percentiles by department and month", lambda: salary_analytics.group_percentiles(history),
+         lambda: py_group_percentiles(rows), same_groups),
+        ("percentiles by role and quarter", lambda: salary_analytics.group_percentiles(history, "role", "quarter"),
+         lambda: py_group_percentiles(rows, "role", "quarter"), same_groups),
+        ("cumulative change per employee", lambda: salary_analytics.cumulative_by_employee(history),
+         lambda: py_cumulative_by_employee(rows), same_cumulative),
+        ("editor totals", lambda: salary_analytics.editor_totals(history),
+         lambda: py_editor_totals(rows), same_editors),
+    ]
+
+    results = []
+    for name, fast, slow, same in cases:
+        print(f"Timing {name}...")
+        numpy_seconds, fast_result = timed(fast, args.repeat)
+        python_seconds, slow_result = timed(slow, args.repeat)
+        results.append({
+            "case": name,
+            "numpy_ms": numpy_seconds * 1000,
+            "python_ms": python_seconds * 1000,
+            "speedup": python_seconds / numpy_seconds if numpy_seconds else None,
+            "match": same(fast_result, slow_result),
+        })
+
+    table = [[r["case"], f"{r['numpy_ms']:.1f}", f"{r['python_ms']:.1f}",
+              f"{r['speedup']:.1f}x" if r["speedup"] else "N/A", "yes" if r["match"] else "NO"]
+             for r in results]
+    print(f"[bold cyan]Salary analytics over {len(history):,} changes:[/bold cyan]")
+    print(tabulate(table, headers=["Statistic", "NumPy ms", "Python ms", "Speedup", "Same result"],
+                   tablefmt="grid"))
+
+    output = args.output or RESULTS_DIR / f"salary-analytics-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": run_metadata(), "salary_changes": len(history),
+                                  "load_seconds": load_seconds, "cases": results}, indent=2))
+    print(f"[green]Results written to {output}[/green]")
+    if not all(r["match"] for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
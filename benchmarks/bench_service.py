@@ -0,0 +1,122 @@
+# Load test for audit_service.py. Start the service first, then:
+#     python -m benchmarks.bench_service --url http://127.0.0.1:8080 --concurrency 1,8,32,128
+# Each level sends --requests requests spread over the sample paths from that many
+# concurrent clients, first cold and then with If-None-Match (the dashboard polling case).
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+import aiohttp
+from tabulate import tabulate
+from rich import print
+
+from benchmarks.bench_suite import RESULTS_DIR, run_metadata, sample_arguments
+
+
+def sample_paths(sample):
+    start, end = (quote(t) for t in sample["range"])
+    return [
+        "/reports/salary-last-month",
+        "/reports/summary-by-user",
+        f"/employees/{sample['employee_id']}/changes",
+        f"/employees/{sample['employee_id']}/changes?field=salary",
+        f"/users/{quote(sample['username'])}/changes?page_size=100",
+        f"/roles/{quote(str(sample['role']))}/changes?page_size=100",
+        f"/changes?start={start}&end={end}&page_size=500",
+    ]
+
+"""
+    Sends `total` GETs from `concurrency` workers. With etags, each request carries the
+    ETag the service last returned for its path. Returns latency and status counts.
+"""
+async def run_level(session, base_url, paths, concurrency, total, etags=None):
+    latencies = []
+    statuses = {}
+    bytes_received = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal bytes_received
+        for i in counter:
+            path = paths[i % len(paths)]
+            headers = {"Accept-Encoding": "gzip"}
+            if etags is not None and path in etags:
+                headers["If-None-Match"] = etags[path]
+            start = time.perf_counter()
+            async with session.get(base_url + path, headers=headers, auto_decompress=False) as resp:
+                body = await resp.read()
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+            bytes_received += len(body)
+            if etags is not None and "ETag" in resp.headers:
+                etags[path] = resp.headers["ETag"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "requests_per_sec": total / elapsed,
+        "median_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        "p99_ms": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+        "bytes": bytes_received,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+async def run(args, paths):
+    levels = [int(c) for c in args.concurrency.split(",")]
+    results = []
+    connector = aiohttp.TCPConnector(limit=max(levels))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for concurrency in levels:
+            print(f"Running {concurrency} concurrent client(s)...")
+            cold = await run_level(session, args.url, paths, concurrency, args.requests)
+            etags = {}
+            await run_level(session, args.url, paths, 1, len(paths), etags)  # learn the ETags
+            polling = await run_level(session, args.url, paths, concurrency, args.requests, etags)
+            results.append({"mode": "cold", **cold})
+            results.append({"mode": "if-none-match", **polling})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the audit HTTP service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="base URL of a running audit_service.py")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level and mode")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/service-<time>.json)")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    paths = sample_paths(sample_arguments())
+    levels = asyncio.run(run(args, paths))
+    results = {"meta": run_metadata(), "url": args.url, "paths": paths, "levels": levels}
+
+    table = [
+        [r["mode"], r["concurrency"], f"{r['requests_per_sec']:.0f}", f"{r['median_ms']:.1f}",
+         f"{r['p95_ms']:.1f}", f"{r['p99_ms']:.1f}", f"{r['bytes'] / r['requests']:.0f}",
+         ", ".join(f"{k}: {v}" for k, v in r["statuses"].items())]
+        for r in levels
+    ]
+    print(f"[bold cyan]Service results ({results['meta']['audit_rows']:,} audit rows):[/bold cyan]")
+    print(tabulate(table, headers=["Mode", "Clients", "Req/s", "Median ms", "P95 ms", "P99 ms",
+                                   "Bytes/req", "Statuses"], tablefmt="grid"))
+
+    output = args.output or RESULTS_DIR / f"service-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"[green]Results written to {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Startup-time benchmark for the main.py entry point.
+#     python -m benchmarks.bench_startup --runs 10 --budget 250
+# Measures time-to-first-prompt of the interactive menu and lists the slowest
+# imports reported by `python -X importtime`. Exits non-zero when the median
+# time-to-first-prompt is over budget. No database connection is made.
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+ROOT = Path(__file__).resolve().parent.parent
+PROMPT = b"Choose an option"
+
+# Target time-to-first-prompt in milliseconds
+DEFAULT_BUDGET_MS = 250
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+"""
+    Starts main.py, waits for the menu prompt, then answers it with the exit option.
+    Returns milliseconds from process start to the prompt.
+"""
+def time_to_first_prompt() -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    seen = b""
+    while PROMPT not in seen:
+        chunk = proc.stdout.read1(4096)
+        if not chunk:
+            proc.wait()
+            raise RuntimeError("main.py exited before showing the menu")
+        seen += chunk
+    elapsed = (time.perf_counter() - start) * 1000
+
+    # Exit is the last menu option
+    exit_option = re.findall(rb"(\d+)\) Exit", seen)[-1]
+    proc.communicate(exit_option + b"\n", timeout=10)
+    return elapsed
+
+"""
+    Runs `import main` under -X importtime and returns (total ms, [(module, cumulative ms)])
+    for the modules imported directly by main, slowest first.
+"""
+def import_profile(module: str = "main"):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            entries.append((name, int(cumulative) / 1000, len(indent)))
+
+    # Output is post-order: a module's imports are listed just before it, one level deeper
+    total, children = 0.0, []
+    for idx, (name, ms, depth) in enumerate(entries):
+        if name != module:
+            continue
+        total = ms
+        for child, child_ms, child_depth in reversed(entries[:idx]):
+            if child_depth <= depth:
+                break
+            if child_depth == depth + 2:
+                children.append((child, child_ms))
+        break
+    return total, sorted(children, key=lambda e: e[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure main.py startup time.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="target time-to-first-prompt in ms")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to list")
+    args = parser.parse_args()
+
+    total, imports = import_profile()
+    print(f"[bold cyan]Import time for main.py: {total:.1f} ms[/bold cyan]")
+    print(tabulate([[name, f"{ms:.1f}"] for name, ms in imports[:args.top]],
+                   headers=["Module", "Cumulative ms"], tablefmt="grid"))
+
+    timings = sorted(time_to_first_prompt() for _ in range(args.runs))
+    median = statistics.median(timings)
+    print(f"[bold cyan]Time to first prompt over {args.runs} runs:[/bold cyan] "
+          f"min {timings[0]:.1f} ms, median {median:.1f} ms, max {timings[-1]:.1f} ms")
+
+    if median > args.budget:
+        print(f"[red]Over budget: {median:.1f} ms > {args.budget:.0f} ms[/red]")
+        sys.exit(1)
+    print(f"[green]Within budget ({args.budget:.0f} ms).[/green]")
+
+
+if __name__ == "__main__":
+    main()
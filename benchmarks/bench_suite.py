@@ -0,0 +1,230 @@
+# Times every get_* in audit.py and every update path in main.py and records the
+# results as JSON so runs can be compared. Update cases change data, so use a
+# test database (see benchmarks/generate_data.py):
+#     python -m benchmarks.bench_suite --repeat 5
+#     python -m benchmarks.bench_suite --compare benchmarks/results/bench-20261017-120000.json
+import argparse
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+import audit
+from database import get_conn
+from main import AUTHORIZED_ROLES, apply_employee_change
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+"""
+    Picks realistic arguments from the data: an employee with a long history,
+    the busiest editor and role, and the busiest week of the log.
+"""
+def sample_arguments():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT row_id FROM audit_log GROUP BY row_id ORDER BY COUNT(*) DESC LIMIT 1;")
+        row = cur.fetchone()
+        employee_id = row[0] if row else 1
+
+        cur.execute("SELECT changed_by, changed_role FROM audit_log "
+                    "GROUP BY changed_by, changed_role ORDER BY COUNT(*) DESC LIMIT 1;")
+        row = cur.fetchone()
+        username, role = row if row else ("Unknown", "HR Manager")
+
+        cur.execute("SELECT MAX(changed_at) FROM audit_log;")
+        newest = cur.fetchone()[0] or datetime.now()
+
+        cur.execute(
+            f"SELECT full_name, role FROM employees WHERE role IN ({', '.join(['%s'] * len(AUTHORIZED_ROLES))}) LIMIT 1;",
+            tuple(AUTHORIZED_ROLES),
+        )
+        editor = cur.fetchone()
+
+        cur.execute("SELECT MIN(employee_id), MAX(employee_id) FROM employees;")
+        id_range = cur.fetchone()
+
+        cur.execute("SELECT DISTINCT department, role FROM employees WHERE role IS NOT NULL;")
+        department_roles = cur.fetchall()
+        cur.close()
+
+    return {
+        "employee_id": employee_id,
+        "username": username,
+        "role": role,
+        "range": ((newest - timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S"),
+                  newest.strftime("%Y-%m-%d %H:%M:%S")),
+        "editor": editor,
+        "id_range": id_range,
+        "department_roles": department_roles,
+    }
+
+def _monthly_rows(result):
+    report, _ = result
+    return [row for rows in report.values() for row in rows]
+
+""" Read benchmark cases: (name, callable returning the rows) """
+def read_cases(args):
+    return [
+        ("get_salary_changes_last_month", audit.get_salary_changes_last_month),
+        ("get_name_changes_last_month", audit.get_name_changes_last_month),
+        ("get_department_changes_last_month", audit.get_department_changes_last_month),
+        ("get_role_changes_last_month", audit.get_role_changes_last_month),
+        ("full_monthly_report_serial", lambda: _monthly_rows(audit.get_full_monthly_report(parallel=False))),
+        ("full_monthly_report_parallel", lambda: _monthly_rows(audit.get_full_monthly_report(parallel=True))),
+        ("get_changes_in_range", lambda: audit.get_changes_in_range(*args["range"])),
+        ("trace_field_history", lambda: audit.trace_field_history(args["employee_id"], "salary")),
+        ("get_all_changes_for_employee", lambda: audit.get_all_changes_for_employee(args["employee_id"])),
+        ("get_changes_by_user", lambda: audit.get_changes_by_user(args["username"])),
+        ("get_changes_by_role", lambda: audit.get_changes_by_role(args["role"])),
+        ("get_change_summary_by_user", audit.get_change_summary_by_user),
+        ("get_change_summary_by_role", audit.get_change_summary_by_role),
+        ("get_all_changes_organized_by_user", audit.get_all_changes_organized_by_user),
+        ("get_all_changes_organized_by_role", audit.get_all_changes_organized_by_role),
+    ]
+
+""" Update benchmark cases, each one authorized update of a random employee """
+def update_cases(args, rng):
+    if args["editor"] is None:
+        return []
+    username, role = args["editor"]
+    low, high = args["id_range"]
+
+    def update(changes):
+        def run():
+            apply_employee_change(username, role, rng.randint(low, high), changes(), "benchmark")
+            return 1
+        return run
+
+    return [
+        ("update_salary", update(lambda: {"salary": round(rng.uniform(40000, 200000), 2)})),
+        ("update_name", update(lambda: {"full_name": f"Bench Employee {rng.randint(1, 10 ** 6)}"})),
+        ("update_department", update(lambda: dict(zip(("department", "role"), rng.choice(args["department_roles"]))))),
+        ("update_role", update(lambda: {"role": rng.choice(args["department_roles"])[1]})),
+    ]
+
+"""
+    Runs a case `warmup` + `repeat` times with its console output discarded.
+    Returns timing statistics in milliseconds and the row count of the last run.
+"""
+def time_case(func, repeat: int, warmup: int):
+    timings = []
+    rows = 0
+    for i in range(warmup + repeat):
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+        rows = len(result) if isinstance(result, list) else result
+
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "rows": rows,
+        "min_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+        "mean_ms": statistics.fmean(timings),
+    }
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT (SELECT COUNT(*) FROM employees), (SELECT COUNT(*) FROM audit_log);")
+        employees, audit_rows = cur.fetchone()
+        cur.close()
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "employees": employees,
+        "audit_rows": audit_rows,
+    }
+
+"""
+    Prints median times next to a previous results file and returns the names of
+    cases that got slower by more than `threshold` (a ratio, ex: 1.2 = 20% slower).
+"""
+def compare(results, baseline_path: Path, threshold: float):
+    baseline = json.loads(baseline_path.read_text())["cases"]
+    regressions = []
+    table = []
+    for name, stats in results["cases"].items():
+        old = baseline.get(name)
+        if old is None:
+            table.append([name, "N/A", f"{stats['median_ms']:.1f}", "new"])
+            continue
+        ratio = stats["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        status = "[red]slower[/red]" if ratio > threshold else "[green]ok[/green]"
+        if ratio > threshold:
+            regressions.append(name)
+        table.append([name, f"{old['median_ms']:.1f}", f"{stats['median_ms']:.1f}", f"{ratio:.2f}x {status}"])
+
+    print(f"[bold cyan]Compared with {baseline_path}:[/bold cyan]")
+    print(tabulate(table, headers=["Case", "Baseline ms", "Current ms", "Ratio"], tablefmt="grid"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audit.py getters and main.py update paths.")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case")
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--skip-updates", action="store_true", help="do not run the update cases")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    parser.add_argument("--seed", type=int, default=4270)
+    args = parser.parse_args()
+
+    sample = sample_arguments()
+    cases = read_cases(sample)
+    if not args.skip_updates:
+        cases += update_cases(sample, random.Random(args.seed))
+    if args.only:
+        cases = [c for c in cases if args.only in c[0]]
+
+    results = {"meta": run_metadata(), "cases": {}}
+    for name, func in cases:
+        print(f"Running {name}...")
+        results["cases"][name] = time_case(func, args.repeat, args.warmup)
+
+    table = [
+        [name, s["rows"], f"{s['min_ms']:.1f}", f"{s['median_ms']:.1f}", f"{s['p95_ms']:.1f}"]
+        for name, s in results["cases"].items()
+    ]
+    print(f"[bold cyan]Benchmark results ({results['meta']['audit_rows']:,} audit rows):[/bold cyan]")
+    print(tabulate(table, headers=["Case", "Rows", "Min ms", "Median ms", "P95 ms"], tablefmt="grid"))
+
+    output = args.output or RESULTS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"[green]Results written to {output}[/green]")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"[red]{len(regressions)} regression(s): {', '.join(regressions)}[/red]")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
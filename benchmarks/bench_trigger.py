@@ -0,0 +1,112 @@
+# Compares bulk UPDATE throughput of the legacy and current audit triggers.
+# Run from the repo root against a test database (it replaces trg_employees_audit
+# while running and puts the schema.sql version back at the end):
+#     python -m benchmarks.bench_trigger --rows 1000 --rounds 5
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+from database import get_conn
+
+ROOT = Path(__file__).resolve().parent.parent
+VARIANTS = {
+    "legacy (one INSERT per column)": ROOT / "benchmarks" / "legacy_trg_employees_audit.sql",
+    "current (single INSERT)": ROOT / "mysql" / "schema.sql",
+}
+
+# Touches three of the four audited columns on every row
+BULK_UPDATE_SQL = """
+    UPDATE employees
+    SET salary = salary + 1,
+        full_name = CONCAT(full_name, ' '),
+        role = CONCAT(COALESCE(role, ''), ' ')
+    WHERE employee_id <= %s;
+"""
+
+"""
+    Pulls the CREATE TRIGGER statement out of a mysql CLI script that uses DELIMITER $$.
+"""
+def load_trigger_sql(path: Path) -> str:
+    text = path.read_text()
+    start = text.index("CREATE TRIGGER trg_employees_audit")
+    end = text.index("END$$", start)
+    return text[start:end] + "END"
+
+
+def install_trigger(cur, trigger_sql: str):
+    cur.execute("DROP TRIGGER IF EXISTS trg_employees_audit;")
+    cur.execute(trigger_sql)
+
+"""
+    Times the bulk update `rounds` times with the given trigger installed.
+    Every round is rolled back, so the data and audit_log are left untouched.
+"""
+def run_variant(name: str, trigger_sql: str, rows: int, rounds: int):
+    timings = []
+    updated = audit_rows = 0
+    with get_conn() as conn:
+        cur = conn.cursor()
+        install_trigger(cur, trigger_sql)
+        cur.execute("SET @app_current_user = 'benchmark', @app_current_role = NULL, @app_justification = NULL;")
+
+        for _ in range(rounds):
+            conn.start_transaction()
+            cur.execute("SELECT COALESCE(MAX(audit_id), 0) FROM audit_log;")
+            before = cur.fetchone()[0]
+
+            start = time.perf_counter()
+            cur.execute(BULK_UPDATE_SQL, (rows,))
+            timings.append(time.perf_counter() - start)
+            updated = cur.rowcount
+
+            cur.execute("SELECT COUNT(*) FROM audit_log WHERE audit_id > %s;", (before,))
+            audit_rows = cur.fetchone()[0]
+            conn.rollback()
+        cur.close()
+
+    median = statistics.median(timings)
+    return {
+        "variant": name,
+        "rows_updated": updated,
+        "audit_rows": audit_rows,
+        "median_seconds": median,
+        "rows_per_second": updated / median if median else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk UPDATE employees with each audit trigger.")
+    parser.add_argument("--rows", type=int, default=1000, help="update employees with employee_id <= ROWS")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per trigger")
+    args = parser.parse_args()
+
+    results = []
+    try:
+        for name, path in VARIANTS.items():
+            results.append(run_variant(name, load_trigger_sql(path), args.rows, args.rounds))
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            install_trigger(cur, load_trigger_sql(VARIANTS["current (single INSERT)"]))
+            cur.close()
+
+    table = [
+        [r["variant"], r["rows_updated"], r["audit_rows"],
+         f"{r['median_seconds'] * 1000:.1f}", f"{r['rows_per_second']:.0f}"]
+        for r in results
+    ]
+    headers = ["Trigger", "Rows Updated", "Audit Rows", "Median ms", "Rows/sec"]
+    print("[bold cyan]Bulk UPDATE employees:[/bold cyan]")
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+
+    legacy, current = results
+    if legacy["rows_per_second"]:
+        print(f"Speedup: {current['rows_per_second'] / legacy['rows_per_second']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# Compares the latency of one employee update through the old statement-by-statement
+# path and through the update_employee stored procedure, over a link with added
+# round-trip time. A local TCP proxy between the client and MySQL holds every chunk
+# for half the RTT in each direction. Updates change data, so use a test database:
+#     python -m benchmarks.bench_update_rtt --rtt 0,5,20,50 --updates 50
+import argparse
+import io
+import json
+import queue
+import random
+import socket
+import statistics
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+import database
+from benchmarks.bench_suite import RESULTS_DIR, run_metadata, sample_arguments
+from database import ConnectionPool, get_conn, get_db_config, set_app_identity
+from main import apply_employee_change
+
+"""
+    TCP proxy on 127.0.0.1 that forwards to `upstream` and delays every chunk by
+    rtt_ms / 2 in each direction. Counts the chunks sent by the client, which is
+    the number of request round trips the client made.
+"""
+class LatencyProxy:
+    def __init__(self, upstream_host: str, upstream_port: int, rtt_ms: float):
+        self.upstream = (upstream_host, upstream_port)
+        self.delay = rtt_ms / 2000
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.upstream)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, upstream, count=True)
+            self._pipe(upstream, client, count=False)
+
+    """ Forwards src to dst, each chunk sent `delay` seconds after it arrived """
+    def _pipe(self, src, dst, count):
+        chunks = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = src.recv(65536)
+                except OSError:
+                    data = b""
+                if data and count:
+                    with self._lock:
+                        self.requests += 1
+                chunks.put((time.monotonic() + self.delay, data))
+                if not data:
+                    return
+
+        def write():
+            while True:
+                due, data = chunks.get()
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    if not data:
+                        dst.shutdown(socket.SHUT_WR)
+                        return
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+    def close(self):
+        self._server.close()
+
+"""
+    The update path main.py used before update_employee: an authorization query on
+    one checkout, then the identity SETs, a SELECT of the old values, the UPDATE and
+    a COMMIT on a second one.
+"""
+def statement_update(username, role, employee_id, changes, justification):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        # Queried directly: validate_user_role() now answers from the authorization cache
+        cur.execute("SELECT COUNT(*) FROM employees WHERE full_name = %s AND role = %s;", (username, role))
+        authorized = cur.fetchone()[0] > 0
+        cur.close()
+    if not authorized:
+        raise PermissionError(f"User '{username}' does not have the role '{role}'")
+
+    columns = list(changes)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        set_app_identity(cur, username, role, justification)
+        cur.execute(f"SELECT {', '.join(columns)} FROM employees WHERE employee_id = %s;", (employee_id,))
+        row = cur.fetchone()
+        if row:
+            cur.execute(
+                f"UPDATE employees SET {', '.join(f'{c} = %s' for c in columns)} WHERE employee_id = %s;",
+                tuple(changes.values()) + (employee_id,),
+            )
+        conn.commit()
+        cur.close()
+    return dict(zip(columns, row)) if row else None
+
+
+PATHS = {
+    "statements": statement_update,
+    "procedure": apply_employee_change,
+}
+
+"""
+    Times `updates` salary updates through each path with the pool connected through
+    a proxy adding rtt_ms. Returns one result dict per path.
+"""
+def run_rtt(rtt_ms, updates, sample, rng):
+    config = get_db_config()
+    proxy = LatencyProxy(config["host"], config["port"], rtt_ms)
+    original = database._pool
+    database._pool = ConnectionPool({**config, "host": "127.0.0.1", "port": proxy.port}, min_size=0, max_size=1)
+    username, role = sample["editor"]
+    low, high = sample["id_range"]
+
+    results = []
+    try:
+        for name, update in PATHS.items():
+            # Warm up so the connection handshake is not timed
+            with redirect_stdout(io.StringIO()):
+                update(username, role, low, {"salary": 50000.00}, "benchmark")
+
+            timings = []
+            before = proxy.requests
+            for _ in range(updates):
+                changes = {"salary": round(rng.uniform(40000, 200000), 2)}
+                with redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    update(username, role, rng.randint(low, high), changes, "benchmark")
+                    timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results.append({
+                "rtt_ms": rtt_ms,
+                "path": name,
+                "updates": updates,
+                "median_ms": statistics.median(timings),
+                "p95_ms": timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+                "round_trips": (proxy.requests - before) / updates,
+            })
+    finally:
+        database._pool.close()
+        database._pool = original
+        proxy.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the update paths over a simulated high-latency link.")
+    parser.add_argument("--rtt", default="0,5,20,50", help="comma-separated round-trip times in ms")
+    parser.add_argument("--updates", type=int, default=50, help="timed updates per path and RTT")
+    parser.add_argument("--seed", type=int, default=4270)
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/update-rtt-<time>.json)")
+    args = parser.parse_args()
+
+    sample = sample_arguments()
+    if sample["editor"] is None:
+        print("[red]No employee holds an authorized role; nothing to update as.[/red]")
+        raise SystemExit(1)
+
+    rng = random.Random(args.seed)
+    levels = []
+    for rtt in (float(r) for r in args.rtt.split(",")):
+        print(f"Running with {rtt:g} ms RTT...")
+        levels.extend(run_rtt(rtt, args.updates, sample, rng))
+
+    table = [
+        [f"{r['rtt_ms']:g}", r["path"], f"{r['median_ms']:.1f}", f"{r['p95_ms']:.1f}", f"{r['round_trips']:.1f}"]
+        for r in levels
+    ]
+    print("[bold cyan]Latency per update:[/bold cyan]")
+    print(tabulate(table, headers=["RTT ms", "Path", "Median ms", "P95 ms", "Round trips"], tablefmt="grid"))
+
+    by_key = {(r["rtt_ms"], r["path"]): r for r in levels}
+    for rtt in sorted({r["rtt_ms"] for r in levels}):
+        statements, procedure = by_key[(rtt, "statements")], by_key[(rtt, "procedure")]
+        if procedure["median_ms"]:
+            print(f"{rtt:g} ms RTT: procedure is {statements['median_ms'] / procedure['median_ms']:.1f}x faster")
+
+    results = {"meta": run_metadata(), "levels": levels}
+    output = args.output or RESULTS_DIR / f"update-rtt-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"[green]Results written to {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
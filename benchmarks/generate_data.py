@@ -0,0 +1,237 @@
+# Synthetic employees and audit_log at configurable scale for load testing.
+# Replaces ALL data in the target database, so only run it against a test database:
+#     python -m benchmarks.generate_data --employees 100000 --audit-rows 10000000 --reset
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from rich import print
+
+from chain import GENESIS_HASH
+from database import get_conn
+from main import AUTHORIZED_ROLES
+from partitions import add_months, ensure_future_partitions, list_partitions
+
+DEPARTMENT_ROLES = {
+    "HR": ["HR Manager", "Payroll Specialist", "Benefits Specialist", "Recruiter"],
+    "Accounting": ["CFO", "Staff Accountant", "Financial Analyst", "Auditor"],
+    "IT": ["CIO", "Software Engineer", "System Administrator", "Helpdesk II", "Helpdesk I"],
+    "Sales": ["Sales Manager", "Sales Associate II", "Sales Associate I"],
+    "Marketing": ["Marketing Manager", "Advertising Specialist", "Social Media Specialist"],
+    "Legal": ["CLO", "Senior Legal Counsel", "IP Lawyer", "Employment Lawyer"],
+    "Customer Service": ["Customer Service Manager", "CSR I", "CSR II"],
+}
+DEPARTMENT_WEIGHTS = {"HR": 8, "Accounting": 10, "IT": 25, "Sales": 25, "Marketing": 10,
+                      "Legal": 7, "Customer Service": 15}
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+               "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+               "Thomas", "Sarah", "Charles", "Karen", "Daniel", "Nancy", "Matthew", "Lisa",
+               "Anthony", "Betty", "Mark", "Sandra", "Steven", "Ashley", "Paul", "Kimberly"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+              "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+              "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson",
+              "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Walker"]
+JUSTIFICATIONS = ["Annual review", "Promotion", "Market adjustment", "Legal name change",
+                  "Reorganization", "Transfer request", "Correction of data entry error", None]
+
+# Share of change events per audited field. Department moves also change the role.
+FIELD_WEIGHTS = {"salary": 50, "role": 20, "department": 15, "full_name": 15}
+
+EMPLOYEE_INSERT_SQL = """
+    INSERT INTO employees (employee_id, full_name, department, role, salary)
+    VALUES (%s, %s, %s, %s, %s);
+"""
+
+AUDIT_INSERT_SQL = """
+    INSERT INTO audit_log
+        (table_name, row_id, column_name, old_value, new_value, old_amount, new_amount,
+         changed_by, changed_role, justification, changed_at)
+    VALUES ('employees', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+"""
+
+
+def random_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+"""
+    Builds the starting employees, with department heads first so every department has one.
+    Returns {employee_id: [full_name, department, role, salary]}.
+"""
+def make_employees(rng, count: int):
+    employees = {}
+    departments = list(DEPARTMENT_ROLES)
+    weights = [DEPARTMENT_WEIGHTS[d] for d in departments]
+    for employee_id in range(1, count + 1):
+        if employee_id <= len(departments):
+            department = departments[employee_id - 1]
+            role = DEPARTMENT_ROLES[department][0]
+        else:
+            department = rng.choices(departments, weights)[0]
+            role = rng.choice(DEPARTMENT_ROLES[department][1:])
+        salary = round(min(max(rng.lognormvariate(11.4, 0.35), 35000), 400000), 2)
+        employees[employee_id] = [random_name(rng), department, role, salary]
+    return employees
+
+"""
+    Employees allowed to make changes, with Zipf-like weights so a few editors
+    account for most of the log.
+"""
+def make_editors(employees, rng):
+    editors = [(e[0], e[2]) for e in employees.values() if e[2] in AUTHORIZED_ROLES]
+    rng.shuffle(editors)
+    weights = [1 / (rank ** 1.2) for rank in range(1, len(editors) + 1)]
+    return editors, weights
+
+"""
+    Number of audit rows per day. Most days carry a background load; month ends,
+    random burst days and one annual compensation-cycle week carry much more.
+"""
+def daily_counts(rng, start: date, days: int, total: int):
+    weights = []
+    cycle_start = rng.randrange(max(days - 7, 1))
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weight = rng.uniform(0.5, 1.5)
+        if day.weekday() >= 5:
+            weight *= 0.1
+        if (day + timedelta(days=1)).month != day.month:
+            weight *= 3
+        if rng.random() < 0.05:
+            weight *= rng.uniform(5, 30)
+        if cycle_start <= offset < cycle_start + 7:
+            weight *= 20
+        weights.append(weight)
+
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    counts[-1] += total - sum(counts)
+    return counts
+
+"""
+    Applies one random change to an employee and returns the audit entries it
+    produces as (column, old_value, new_value, old_amount, new_amount).
+"""
+def random_change(rng, employee):
+    field = rng.choices(list(FIELD_WEIGHTS), list(FIELD_WEIGHTS.values()))[0]
+    name, department, role, salary = employee
+
+    if field == "salary":
+        factor = rng.uniform(1.01, 1.15) if rng.random() < 0.9 else rng.uniform(0.9, 0.99)
+        new_salary = round(salary * factor, 2)
+        employee[3] = new_salary
+        return [("salary", None, None, Decimal(f"{salary:.2f}"), Decimal(f"{new_salary:.2f}"))]
+    if field == "full_name":
+        new_name = f"{name.split(' ')[0]} {rng.choice(LAST_NAMES)}"
+        employee[0] = new_name
+        return [("full_name", name, new_name, None, None)]
+    if field == "role":
+        new_role = rng.choice(DEPARTMENT_ROLES[department])
+        employee[2] = new_role
+        return [("role", role, new_role, None, None)]
+
+    new_department = rng.choice([d for d in DEPARTMENT_ROLES if d != department])
+    new_role = rng.choice(DEPARTMENT_ROLES[new_department][1:])
+    employee[1], employee[2] = new_department, new_role
+    return [("department", department, new_department, None, None), ("role", role, new_role, None, None)]
+
+"""
+    Streams audit rows in changed_at order, keeping only the current employee state in memory.
+"""
+def generate_audit_rows(rng, employees, start: date, days: int, total: int):
+    editors, editor_weights = make_editors(employees, rng)
+    employee_ids = list(employees)
+    # A small set of employees gets a large share of the changes
+    hot = employee_ids[: max(len(employee_ids) // 20, 1)]
+
+    for offset, count in enumerate(daily_counts(rng, start, days, total)):
+        day = datetime.combine(start + timedelta(days=offset), datetime.min.time())
+        seconds = sorted(
+            int(min(max(rng.gauss(13 * 3600, 3 * 3600), 0), 86399)) for _ in range(count)
+        )
+        for second in seconds:
+            employee_id = rng.choice(hot) if rng.random() < 0.3 else rng.choice(employee_ids)
+            changed_by, changed_role = rng.choices(editors, editor_weights)[0]
+            justification = rng.choice(JUSTIFICATIONS)
+            changed_at = day + timedelta(seconds=second)
+            for change in random_change(rng, employees[employee_id]):
+                yield (employee_id, *change, changed_by, changed_role, justification, changed_at)
+
+
+def reset_tables(cur):
+    for table in ("employee_checkpoint_gaps", "employee_checkpoint_rows", "employee_checkpoints",
+                  "audit_log_exchange", "audit_log_archive", "audit_log", "employees"):
+        cur.execute(f"TRUNCATE TABLE {table};")
+    # Start a fresh hash chain for the generated rows
+    cur.execute("UPDATE audit_chain_head SET last_hash = %s, last_seq = 0 WHERE id = 1;", (GENESIS_HASH,))
+
+"""
+    Creates monthly partitions back to the start of the generated range when
+    audit_log only has the pmax catch-all partition.
+"""
+def prepare_partitions(cur, start: date):
+    if list_partitions(cur):
+        return
+    today = date.today()
+    months = (today.year - start.year) * 12 + today.month - start.month
+    ensure_future_partitions(cur, months_ahead=months + 3, today=add_months(start, 0))
+
+
+def generate(employee_count: int, audit_rows: int, days: int, seed: int, batch_size: int, reset: bool):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT (SELECT COUNT(*) FROM employees) + (SELECT COUNT(*) FROM audit_log);")
+        if cur.fetchone()[0] and not reset:
+            print("[red]Database already has data. Re-run with --reset to replace it.[/red]")
+            cur.close()
+            return
+        if reset:
+            reset_tables(cur)
+        prepare_partitions(cur, start)
+
+        began = time.perf_counter()
+        employees = make_employees(rng, employee_count)
+
+        written = 0
+        batch = []
+        for row in generate_audit_rows(rng, employees, start, days, audit_rows):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cur.executemany(AUDIT_INSERT_SQL, batch)
+                conn.commit()
+                written += len(batch)
+                batch = []
+                print(f"  {written:,} audit rows", end="\r")
+        if batch:
+            cur.executemany(AUDIT_INSERT_SQL, batch)
+            written += len(batch)
+
+        # employees holds the state after every generated change, so the audit
+        # chain of each employee ends at their current values
+        final = [(eid, *values) for eid, values in employees.items()]
+        for i in range(0, len(final), batch_size):
+            cur.executemany(EMPLOYEE_INSERT_SQL, final[i:i + batch_size])
+        conn.commit()
+        cur.close()
+
+    elapsed = time.perf_counter() - began
+    print(f"[green]Generated {len(employees):,} employees and {written:,} audit rows "
+          f"in {elapsed:.1f}s ({written / elapsed:,.0f} rows/sec).[/green]")
+    print("Run `python chain.py seal` to add the generated audit rows to the hash chain.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill employees and audit_log with synthetic data.")
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--audit-rows", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=730, help="how far back the audit history goes")
+    parser.add_argument("--seed", type=int, default=4270)
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per multi-row INSERT")
+    parser.add_argument("--reset", action="store_true", help="delete existing employees and audit data first")
+    args = parser.parse_args()
+    generate(args.employees, args.audit_rows, args.days, args.seed, args.batch_size, args.reset)
@@ -0,0 +1,112 @@
+-- Original trg_employees_audit: one INSERT per changed column. Kept so
+-- benchmarks/bench_trigger.py can compare it with the current trigger.
+DELIMITER $$
+
+DROP TRIGGER IF EXISTS trg_employees_audit$$
+
+CREATE TRIGGER trg_employees_audit
+BEFORE UPDATE ON employees
+FOR EACH ROW
+BEGIN
+    -- Log salary changes
+    IF NOT (NEW.salary <=> OLD.salary) THEN
+        INSERT INTO audit_log (
+            table_name,
+            row_id,
+            column_name,
+            old_value,
+            new_value,
+            changed_by,
+            changed_role,
+            justification,
+            changed_at
+        ) VALUES (
+            'employees',
+            OLD.employee_id,
+            'salary',
+            OLD.salary,
+            NEW.salary,
+            COALESCE(@app_current_user, CURRENT_USER()),
+            @app_current_role,
+            @app_justification,
+            NOW()
+        );
+    END IF;
+
+    -- Log name changes
+    IF NOT (NEW.full_name <=> OLD.full_name) THEN
+        INSERT INTO audit_log (
+            table_name,
+            row_id,
+            column_name,
+            old_value,
+            new_value,
+            changed_by,
+            changed_role,
+            justification,
+            changed_at
+        ) VALUES (
+            'employees',
+            OLD.employee_id,
+            'full_name',
+            OLD.full_name,
+            NEW.full_name,
+            COALESCE(@app_current_user, CURRENT_USER()),
+            @app_current_role,
+            @app_justification,
+            NOW()
+        );
+    END IF;
+
+    -- Log department changes
+    IF NOT (NEW.department <=> OLD.department) THEN
+        INSERT INTO audit_log (
+            table_name,
+            row_id,
+            column_name,
+            old_value,
+            new_value,
+            changed_by,
+            changed_role,
+            justification,
+            changed_at
+        ) VALUES (
+            'employees',
+            OLD.employee_id,
+            'department',
+            OLD.department,
+            NEW.department,
+            COALESCE(@app_current_user, CURRENT_USER()),
+            @app_current_role,
+            @app_justification,
+            NOW()
+        );
+    END IF;
+
+    -- Log role changes
+    IF NOT (NEW.role <=> OLD.role) THEN
+        INSERT INTO audit_log (
+            table_name,
+            row_id,
+            column_name,
+            old_value,
+            new_value,
+            changed_by,
+            changed_role,
+            justification,
+            changed_at
+        ) VALUES (
+            'employees',
+            OLD.employee_id,
+            'role',
+            OLD.role,
+            NEW.role,
+            COALESCE(@app_current_user, CURRENT_USER()),
+            @app_current_role,
+            @app_justification,
+            NOW()
+        );
+    END IF;
+END$$
+
+DELIMITER ;
@@ -0,0 +1,235 @@
+# Many editors raising the salaries of the same few employees at once. Every update is
+# an optimistic read-modify-write (+1.00 against the version that was read), so lost
+# updates or audit rows that skip a value show up as a wrong final salary or a broken
+# chain of salary rows. Updates change data, so use a test database:
+#     python -m benchmarks.stress_concurrent_updates --threads 1,2,4,8,16,32,64 --duration 10
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+import database
+from benchmarks.bench_suite import RESULTS_DIR, run_metadata, sample_arguments
+from database import RETRYABLE_ERRORS, ConnectionPool, get_conn, get_db_config, get_retry_stats, mysql_connector
+from main import StaleVersionError, apply_employee_change, fetch_employee
+
+RAISE = Decimal("1.00")
+MAX_CONSECUTIVE_ERRORS = 20  # an editor whose updates keep failing drops out of the level
+MAX_REPORTED_ERRORS = 10     # per level; every failed update is still counted
+
+""" Reads salary and version of each employee in ids, and the newest audit_id """
+def read_state(ids):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT employee_id, salary, version FROM employees "
+            f"WHERE employee_id IN ({', '.join(['%s'] * len(ids))});",
+            tuple(ids),
+        )
+        state = {employee_id: (salary, version) for employee_id, salary, version in cur.fetchall()}
+        cur.execute("SELECT COALESCE(MAX(audit_id), 0) FROM audit_log;")
+        last_audit_id = cur.fetchone()[0]
+        cur.close()
+    return state, last_audit_id
+
+"""
+    Checks a finished level: every employee's salary and version moved by exactly its
+    number of successful updates, and its salary audit rows since the start form one
+    unbroken chain of +1.00 steps starting at the initial salary. Returns problem strings.
+"""
+def check_level(before, last_audit_id, successes):
+    ids = list(before)
+    after, _ = read_state(ids)
+    problems = []
+    for employee_id in ids:
+        salary, version = before[employee_id]
+        done = successes[employee_id]
+        if after[employee_id][0] != salary + RAISE * done:
+            problems.append(f"employee {employee_id}: salary {after[employee_id][0]}, expected {salary + RAISE * done}")
+        if after[employee_id][1] != version + done:
+            problems.append(f"employee {employee_id}: version {after[employee_id][1]}, expected {version + done}")
+
+    chains = defaultdict(list)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT row_id, old_amount, new_amount FROM audit_log "
+            f"WHERE audit_id > %s AND table_name = 'employees' AND column_name = 'salary' "
+            f"AND row_id IN ({', '.join(['%s'] * len(ids))}) ORDER BY audit_id;",
+            (last_audit_id, *ids),
+        )
+        for row_id, old_amount, new_amount in cur.fetchall():
+            chains[row_id].append((old_amount, new_amount))
+        cur.close()
+
+    for employee_id in ids:
+        expected = before[employee_id][0]
+        chain = chains[employee_id]
+        if len(chain) != successes[employee_id]:
+            problems.append(f"employee {employee_id}: {len(chain)} audit rows for {successes[employee_id]} updates")
+        for old_amount, new_amount in chain:
+            if old_amount != expected or new_amount - old_amount != RAISE:
+                problems.append(f"employee {employee_id}: audit row {old_amount} -> {new_amount} after {expected}")
+                break
+            expected = new_amount
+    return problems
+
+"""
+    Runs `threads` editors for `duration` seconds over the hot employees, each with its
+    own pooled connection. On a version conflict an editor retries with the values the
+    procedure returned. An update that still deadlocks or times out after with_retry, or
+    fails any other way, is counted and the editor moves on; only MAX_CONSECUTIVE_ERRORS
+    failures in a row make it drop out. Returns the level's result dict, with dropouts
+    and failed updates kept apart from the consistency problems.
+"""
+def run_level(threads, duration, hot_ids, editor, seed):
+    original = database._pool
+    database._pool = ConnectionPool(get_db_config(), min_size=0, max_size=threads)
+    before, last_audit_id = read_state(hot_ids)
+    retries_before = get_retry_stats()
+
+    successes = Counter()
+    conflicts = Counter()
+    lock_failures = Counter()
+    failures = Counter()
+    errors = []
+    dropouts = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads + 1)
+    username, role = editor
+
+    def failed(worker, e):
+        with lock:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"worker {worker}: {e}")
+
+    def editor_loop(worker):
+        rng = random.Random(seed + worker)
+        done, clashes, gave_up, other, in_a_row = Counter(), 0, 0, 0, 0
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            employee_id = rng.choice(hot_ids)
+            try:
+                current = fetch_employee(employee_id)
+                while True:
+                    try:
+                        apply_employee_change(username, role, employee_id,
+                                              {"salary": current["salary"] + RAISE},
+                                              "stress test", current["version"])
+                        done[employee_id] += 1
+                        break
+                    except StaleVersionError as e:
+                        clashes += 1
+                        current = e.current
+                in_a_row = 0
+            except Exception as e:
+                if isinstance(e, mysql_connector.Error) and e.errno in RETRYABLE_ERRORS:
+                    gave_up += 1
+                else:
+                    other += 1
+                    failed(worker, e)
+                in_a_row += 1
+                if in_a_row >= MAX_CONSECUTIVE_ERRORS:
+                    with lock:
+                        dropouts.append(f"worker {worker}: {in_a_row} failed updates in a row, last: {e}")
+                    break
+        with lock:
+            successes.update(done)
+            conflicts[worker] = clashes
+            lock_failures[worker] = gave_up
+            failures[worker] = other
+
+    workers = [threading.Thread(target=editor_loop, args=(w,)) for w in range(threads)]
+    try:
+        for w in workers:
+            w.start()
+        start_barrier.wait()
+        started = time.perf_counter()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - started
+        problems = check_level(before, last_audit_id, successes)
+    finally:
+        database._pool.close()
+        database._pool = original
+
+    retries_after = get_retry_stats()
+    updates = sum(successes.values())
+    return {
+        "threads": threads,
+        "seconds": elapsed,
+        "updates": updates,
+        "updates_per_second": updates / elapsed if elapsed else 0.0,
+        "conflicts": sum(conflicts.values()),
+        "lock_retries": retries_after["retries"] - retries_before["retries"],
+        "lock_gave_up": retries_after["gave_up"] - retries_before["gave_up"],
+        "lock_failures": sum(lock_failures.values()),
+        "failed_updates": sum(failures.values()),
+        "errors": errors,
+        "dropouts": dropouts,
+        "problems": problems,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent employee updates and check nothing was lost.")
+    parser.add_argument("--threads", default="1,2,4,8,16,32,64", help="comma-separated editor counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per editor count")
+    parser.add_argument("--hot-employees", type=int, default=100, help="employees all editors update")
+    parser.add_argument("--seed", type=int, default=4270)
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/stress-<time>.json)")
+    args = parser.parse_args()
+
+    sample = sample_arguments()
+    if sample["editor"] is None:
+        print("[red]No employee holds an authorized role; nothing to update as.[/red]")
+        raise SystemExit(1)
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT employee_id FROM employees ORDER BY employee_id LIMIT %s;", (args.hot_employees,))
+        hot_ids = [row[0] for row in cur.fetchall()]
+        cur.close()
+
+    levels = []
+    for threads in (int(t) for t in args.threads.split(",")):
+        print(f"Running {threads} editor(s) over {len(hot_ids)} employees for {args.duration:g}s...")
+        levels.append(run_level(threads, args.duration, hot_ids, sample["editor"], args.seed))
+
+    table = [
+        [r["threads"], r["updates"], f"{r['updates_per_second']:.0f}", r["conflicts"],
+         r["lock_retries"], r["lock_failures"], r["failed_updates"], len(r["dropouts"]),
+         "OK" if not r["problems"] else f"{len(r['problems'])} problem(s)"]
+        for r in levels
+    ]
+    print("[bold cyan]Concurrent editors:[/bold cyan]")
+    print(tabulate(table, headers=["Editors", "Updates", "Updates/sec", "Version conflicts", "Lock retries",
+                                   "Lock gave up", "Other failures", "Dropouts", "Consistency"], tablefmt="grid"))
+    for r in levels:
+        for dropout in r["dropouts"]:
+            print(f"[yellow]{r['threads']} editor(s): {dropout}[/yellow]")
+        for error in r["errors"]:
+            print(f"[yellow]{r['threads']} editor(s): {error}[/yellow]")
+        for problem in r["problems"][:10]:
+            print(f"[red]{r['threads']} editor(s): {problem}[/red]")
+
+    results = {"meta": run_metadata(), "hot_employees": len(hot_ids), "levels": levels}
+    output = args.output or RESULTS_DIR / f"stress-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"[green]Results written to {output}[/green]")
+    if any(r["problems"] for r in levels):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
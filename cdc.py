@@ -0,0 +1,240 @@
+# Change-data-capture feed: follows audit_log by audit_id and hands new rows to a local sink
+#     python cdc.py --sink jsonl --out cdc/            # append-only JSONL files
+#     python cdc.py --sink sqlite --out mirror.db      # local SQLite copy of audit_log
+# Delivery is at-least-once: a batch is written before the watermark moves past it,
+# so after a crash the last batch may be delivered again. Consumers dedupe on audit_id.
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from rich import print
+
+from audit import LIVE_SOURCE
+from audit_query import AUDIT_COLUMNS, BY_AUDIT_ID, AuditQuery
+from database import get_conn, prepared_cursor
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_POLL_INTERVAL = 1.0   # seconds to wait when caught up
+GAP_TIMEOUT = 300             # seconds to keep looking for a skipped audit_id
+MAX_TRACKED_GAP = 1000        # larger id jumps are treated as permanent (ex: auto_increment bumps)
+JSONL_FILE_BYTES = 64 * 1024 * 1024
+
+NEW_ROWS = AuditQuery(AUDIT_COLUMNS, order=BY_AUDIT_ID)
+
+
+def _json_default(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else str(value)
+
+"""
+    Where the feed has got to: every audit_id up to `watermark` has been delivered,
+    except the ids in `gaps`. An id is skipped when a transaction that took it had not
+    committed yet when a later id was read; gaps are re-checked on every poll until
+    the row shows up or GAP_TIMEOUT passes (rolled-back inserts never show up).
+"""
+class FeedState:
+    def __init__(self, watermark=0, gaps=None):
+        self.watermark = watermark
+        self.gaps = {int(k): v for k, v in (gaps or {}).items()}  # audit_id -> first seen (epoch)
+
+    def to_dict(self):
+        return {"watermark": self.watermark, "gaps": {str(k): v for k, v in self.gaps.items()}}
+
+    """ Moves past a batch of rows (sorted by audit_id) and records any ids skipped inside it """
+    def advance(self, rows, now):
+        previous = self.watermark
+        for row in rows:
+            audit_id = row["audit_id"]
+            if audit_id in self.gaps:
+                del self.gaps[audit_id]
+                continue
+            if audit_id <= previous:
+                continue
+            if 1 < audit_id - previous <= MAX_TRACKED_GAP:
+                for missing in range(previous + 1, audit_id):
+                    self.gaps.setdefault(missing, now)
+            previous = audit_id
+        self.watermark = previous
+
+    def expire_gaps(self, now, timeout=GAP_TIMEOUT):
+        for audit_id, first_seen in list(self.gaps.items()):
+            if now - first_seen > timeout:
+                del self.gaps[audit_id]
+
+
+"""
+    Appends each batch to JSONL files in a directory, starting a new file (named after
+    its first audit_id) once the current one passes max_bytes. The watermark is kept in
+    checkpoint.json next to them, with the size of the file it was written to, and only
+    updated after the batch is on disk. A batch cut short by a crash is trimmed off on
+    restart and delivered again.
+"""
+class JsonlSink:
+    def __init__(self, directory, max_bytes=JSONL_FILE_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.checkpoint = self.directory / "checkpoint.json"
+
+    def load_state(self):
+        try:
+            checkpoint = json.loads(self.checkpoint.read_text())
+        except FileNotFoundError:
+            return FeedState()
+        path = self.directory / checkpoint["file"]
+        if path.exists() and path.stat().st_size > checkpoint["bytes"]:
+            with open(path, "r+b") as f:
+                f.truncate(checkpoint["bytes"])
+        for later in self.directory.glob("changes-*.jsonl"):
+            if later.name > checkpoint["file"]:
+                later.unlink()
+        return FeedState(**checkpoint["state"])
+
+    def _current_file(self, first_audit_id):
+        files = sorted(self.directory.glob("changes-*.jsonl"))
+        if files and files[-1].stat().st_size < self.max_bytes:
+            return files[-1]
+        return self.directory / f"changes-{first_audit_id:012d}.jsonl"
+
+    def write(self, rows, state: FeedState):
+        path = self._current_file(rows[0]["audit_id"])
+        with open(path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=_json_default) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        checkpoint = {"state": state.to_dict(), "file": path.name, "bytes": path.stat().st_size}
+        tmp = self.checkpoint.with_suffix(".tmp")
+        tmp.write_text(json.dumps(checkpoint))
+        tmp.replace(self.checkpoint)
+
+    def close(self):
+        pass
+
+"""
+    Mirrors audit_log into a local SQLite file. Rows and the watermark are written in
+    one SQLite transaction and rows are upserted by audit_id, so redelivered rows are
+    harmless.
+"""
+class SqliteSink:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS audit_log (
+                audit_id      INTEGER PRIMARY KEY,
+                table_name    TEXT,
+                row_id        INTEGER,
+                column_name   TEXT,
+                old_value     TEXT,
+                new_value     TEXT,
+                changed_by    TEXT,
+                changed_role  TEXT,
+                justification TEXT,
+                changed_at    TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_audit_row_time ON audit_log (table_name, row_id, changed_at);
+            CREATE TABLE IF NOT EXISTS cdc_state (
+                id    INTEGER PRIMARY KEY CHECK (id = 1),
+                state TEXT NOT NULL
+            );
+        """)
+
+    def load_state(self):
+        row = self.db.execute("SELECT state FROM cdc_state WHERE id = 1;").fetchone()
+        return FeedState(**json.loads(row[0])) if row else FeedState()
+
+    def write(self, rows, state: FeedState):
+        values = [
+            tuple(_json_default(row[c]) if isinstance(row[c], (datetime, Decimal)) else row[c]
+                  for c in AUDIT_COLUMNS)
+            for row in rows
+        ]
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO audit_log ({', '.join(AUDIT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(AUDIT_COLUMNS))});",
+                values,
+            )
+            self.db.execute("INSERT OR REPLACE INTO cdc_state (id, state) VALUES (1, ?);",
+                            (json.dumps(state.to_dict()),))
+
+    def close(self):
+        self.db.close()
+
+"""
+    Reads up to batch_size rows after the watermark plus any skipped ids that have
+    committed since. Each call borrows a fresh connection, so every poll sees a new
+    snapshot of the log. Returns the rows sorted by audit_id.
+"""
+def fetch_changes(state: FeedState, batch_size: int):
+    with get_conn() as conn:
+        sql, params = NEW_ROWS.page_query(LIVE_SOURCE, [state.watermark], batch_size)
+        cur = prepared_cursor(conn, sql)
+        cur.execute(sql, params)
+        rows = [NEW_ROWS.decode(row) for row in cur.fetchall()]
+
+        if state.gaps:
+            gaps = AuditQuery(AUDIT_COLUMNS, audit_ids=sorted(state.gaps), order=BY_AUDIT_ID)
+            sql, params = gaps.page_query(LIVE_SOURCE)
+            cur = conn.cursor(dictionary=True)
+            cur.execute(sql, params)
+            rows = [gaps.decode(row) for row in cur.fetchall()] + rows
+            cur.close()
+
+    return sorted(rows, key=lambda r: r["audit_id"])
+
+"""
+    Follows audit_log until interrupted (or, with once=True, until caught up).
+    Every batch is written to the sink together with the new watermark.
+    Prints rows per batch and the delivery lag: how long ago the newest row was written.
+"""
+def tail(sink, batch_size=DEFAULT_BATCH_SIZE, poll_interval=DEFAULT_POLL_INTERVAL, once=False):
+    state = sink.load_state()
+    print(f"[cyan]Following audit_log after audit_id {state.watermark}[/cyan]")
+    delivered = 0
+    try:
+        while True:
+            before = state.watermark
+            rows = fetch_changes(state, batch_size)
+            now = time.time()
+            if rows:
+                state.advance(rows, now)
+                state.expire_gaps(now)
+                sink.write(rows, state)
+                delivered += len(rows)
+                newest = max(r["changed_at"] for r in rows)
+                lag = (datetime.now() - newest).total_seconds()
+                print(f"Delivered {len(rows)} row(s) up to audit_id {state.watermark} "
+                      f"(lag {lag:.1f}s, {len(state.gaps)} open gap(s))")
+            elif state.gaps:
+                state.expire_gaps(now)
+
+            caught_up = sum(1 for r in rows if r["audit_id"] > before) < batch_size
+            if caught_up and once:
+                break
+            if caught_up:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+    return delivered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Follow audit_log and write new rows to a local sink.")
+    parser.add_argument("--sink", choices=["jsonl", "sqlite"], required=True)
+    parser.add_argument("--out", required=True, help="directory for jsonl, database file for sqlite")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per batch")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_INTERVAL, help="seconds between polls when idle")
+    parser.add_argument("--once", action="store_true", help="stop when caught up instead of following")
+    args = parser.parse_args()
+
+    sink = JsonlSink(args.out) if args.sink == "jsonl" else SqliteSink(args.out)
+    total = tail(sink, args.batch_size, args.poll, args.once)
+    print(f"[green]Delivered {total} row(s).[/green]")
@@ -0,0 +1,443 @@
+# Tamper-evident hash chain over audit_log
+# The sealer gives every committed audit row the next chain_seq, the hash of the row
+# before it in the chain (prev_hash) and a SHA-256 over that hash plus the row's own
+# values (row_hash), so editing, removing or reordering any sealed row breaks the chain
+# from that point on. Sealing runs after the audited writes commit, so writers never
+# wait on the chain head.
+#     python chain.py seal --follow               # keep sealing new rows (run as a service)
+#     python chain.py verify                      # rows sealed since the last verified checkpoint
+#     python chain.py verify --full --processes 8 # whole chain, split into chain_seq ranges
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+from tabulate import tabulate
+from rich import print
+
+from audit import LIVE_SOURCE, audit_source
+from database import get_conn, prepared_cursor
+
+GENESIS_HASH = "0" * 64
+DEFAULT_PAGE_SIZE = 10000
+DEFAULT_SEAL_INTERVAL = 1.0  # seconds between passes of seal --follow
+DEFAULT_MAX_UNSEALED_AGE = 60  # seconds a row may wait for the sealer before verify fails
+MAX_SEAL_CONFLICTS = 5       # consecutive failed batches before seal gives up
+DEFAULT_CHECKPOINT = Path("audit_chain.checkpoint")
+MAX_REPORTED_PROBLEMS = 20   # per range; every problem is still counted
+RANGES_PER_PROCESS = 4       # smaller ranges even out slow and fast workers
+
+# Values covered by row_hash, each length-prefixed ('~' for NULL) so values cannot be
+# shifted between columns. The same input trg_audit_log_chain hashed before
+# migrate_async_chain_sealing.sql, so rows it chained still verify. changed_at
+# is hashed as a Unix timestamp so the hash does not depend on the session time zone,
+# and salary values as the text of their DECIMAL, as they were stored before
+# migrate_typed_audit_values.sql, so rows chained before that migration still verify.
+HASHED_FIELDS = (
+    "table_name", "row_id", "column_name", "old_value", "new_value",
+    "changed_by", "changed_role", "justification", "changed_ts",
+)
+
+CHAIN_SELECT = """
+    SELECT audit_id, table_name, row_id, column_name,
+           COALESCE(CAST(old_amount AS CHAR), old_value) AS old_value,
+           COALESCE(CAST(new_amount AS CHAR), new_value) AS new_value,
+           changed_by, changed_role, justification,
+           UNIX_TIMESTAMP(changed_at) AS changed_ts, changed_at, prev_hash, row_hash, chain_seq
+    FROM {source}
+"""
+RANGE_SQL = CHAIN_SELECT + "WHERE chain_seq > %s AND chain_seq <= %s ORDER BY chain_seq LIMIT %s;"
+UNSEALED_SQL = CHAIN_SELECT + "WHERE chain_seq IS NULL ORDER BY audit_id LIMIT %s;"
+UNSEALED_COUNT_SQL = """
+    SELECT COUNT(*) AS unsealed,
+           COUNT(CASE WHEN changed_at < NOW() - INTERVAL %s SECOND THEN 1 END) AS overdue,
+           MIN(changed_at) AS oldest
+    FROM {source} WHERE chain_seq IS NULL;
+"""
+ROW_HASH_SQL = "SELECT row_hash, chain_seq FROM {source} WHERE audit_id = %s;"
+HEAD_SQL = "SELECT last_hash, last_seq FROM audit_chain_head WHERE id = 1;"
+HEAD_LOCK_SQL = "SELECT last_hash, last_seq FROM audit_chain_head WHERE id = 1 FOR UPDATE;"
+
+""" Length-prefixed encoding of one value ('~' for NULL) """
+def _field(value) -> bytes:
+    if value is None:
+        return b"~"
+    data = value if isinstance(value, (bytes, bytearray)) else str(value).encode("utf-8")
+    return str(len(data)).encode() + b":" + bytes(data)
+
+""" The row_hash of `row` when it follows prev_hash in the chain """
+def row_hash(prev_hash: str, row) -> str:
+    digest = hashlib.sha256(prev_hash.encode("ascii"))
+    for name in HASHED_FIELDS:
+        digest.update(_field(row[name]))
+    return digest.hexdigest()
+
+
+def read_checkpoint(path: Path):
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path: Path, chain_seq: int, audit_id: int, hash_value: str):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"chain_seq": chain_seq, "audit_id": audit_id, "row_hash": hash_value,
+                               "verified_at": datetime.now().isoformat(sep=" ", timespec="seconds")}))
+    tmp.replace(path)
+
+"""
+    Reads the chain head: the last sealed chain_seq and its row_hash, and the rows still
+    waiting for the sealer. Rows the sealer has not reached yet are not covered by the
+    chain; those older than max_unsealed_age seconds (by the server clock) mean the
+    sealer is stopped or stuck and are returned as a problem.
+"""
+def chain_state(cur, source, max_unsealed_age=DEFAULT_MAX_UNSEALED_AGE):
+    cur.execute(HEAD_SQL)
+    head = cur.fetchone()
+    cur.execute(UNSEALED_COUNT_SQL.format(source=source), (max_unsealed_age,))
+    waiting = cur.fetchone()
+    overdue = []
+    if waiting["overdue"]:
+        overdue.append((None, f"{waiting['overdue']:,} row(s) unsealed for over {max_unsealed_age}s, "
+                              f"oldest from {waiting['oldest']} (is `chain.py seal --follow` running?)"))
+    return head["last_seq"], head["last_hash"], waiting["unsealed"], overdue
+
+"""
+    The verified checkpoint is kept outside the database. If the row it points at is
+    gone or its hash or position changed, history before the checkpoint was rewritten.
+"""
+def check_checkpoint(cur, source, checkpoint):
+    if checkpoint is None:
+        return []
+    cur.execute(ROW_HASH_SQL.format(source=source), (checkpoint["audit_id"],))
+    row = cur.fetchone()
+    if row is None:
+        return [(checkpoint["audit_id"], "checkpoint row is missing")]
+    if row["row_hash"] != checkpoint["row_hash"] or row["chain_seq"] != checkpoint["chain_seq"]:
+        return [(checkpoint["audit_id"], "checkpoint row hash changed (history rewritten)")]
+    return []
+
+""" The checkpoint at `path`, or None when there is none or it predates chain_seq """
+def load_checkpoint(path: Path):
+    checkpoint = read_checkpoint(path)
+    if checkpoint is None or "chain_seq" not in checkpoint:
+        return None
+    return checkpoint
+
+""" Problems when the chain does not end where audit_chain_head says it does """
+def check_head(results, last_seq, last_hash):
+    last = next((r for r in reversed(results) if r["rows"]), None)
+    end_seq = last["last_seq"] if last else (results[0]["lo"] if results else 0)
+    if end_seq != last_seq:
+        return [(last["last_audit_id"] if last else None,
+                 f"chain ends at chain_seq {end_seq} but the head is at {last_seq} (rows removed)")]
+    if last is not None and last["last_hash"] != last_hash:
+        return [(last["last_audit_id"], "last row_hash does not match audit_chain_head")]
+    return []
+
+"""
+    Walks sealed rows with lo < chain_seq <= hi in chain order and checks every link,
+    hash and sequence number. With expected_prev None the first row's link is left to
+    the caller (parallel ranges are stitched together afterwards).
+    Returns a dict with rows checked, the first row's chain_seq and prev_hash, the last
+    row's chain_seq, audit_id and row_hash and the problems found as (audit_id, problem) pairs.
+"""
+def verify_range(lo, hi, page_size=DEFAULT_PAGE_SIZE, expected_prev=None):
+    result = {"lo": lo, "hi": hi, "rows": 0, "first_audit_id": None, "first_seq": None, "first_prev": None,
+              "last_seq": lo, "last_audit_id": None, "last_hash": expected_prev,
+              "problems": [], "problem_count": 0}
+
+    def problem(audit_id, message):
+        result["problem_count"] += 1
+        if len(result["problems"]) < MAX_REPORTED_PROBLEMS:
+            result["problems"].append((audit_id, message))
+
+    prev = expected_prev
+    prev_seq = lo if expected_prev is not None else None
+    with get_conn() as conn:
+        lookup = conn.cursor(dictionary=True)
+        source = audit_source(lookup)
+        lookup.close()
+        sql = sys.intern(RANGE_SQL.format(source=source))
+        cur = prepared_cursor(conn, sql)
+
+        last = lo
+        while True:
+            cur.execute(sql, (last, hi, page_size))
+            rows = cur.fetchall()
+            for row in rows:
+                audit_id = row["audit_id"]
+                if result["rows"] == 0:
+                    result["first_audit_id"] = audit_id
+                    result["first_seq"] = row["chain_seq"]
+                    result["first_prev"] = row["prev_hash"]
+                result["rows"] += 1
+
+                if row["row_hash"] is None:
+                    problem(audit_id, "sealed row has no row_hash")
+                else:
+                    if prev_seq is not None and row["chain_seq"] != prev_seq + 1:
+                        problem(audit_id, f"chain_seq jumps from {prev_seq} to {row['chain_seq']} (rows removed)")
+                    if prev is not None and row["prev_hash"] != prev:
+                        problem(audit_id, "prev_hash does not match the row before (rows removed, inserted or rewritten)")
+                    if row_hash(row["prev_hash"] or "", row) != row["row_hash"]:
+                        problem(audit_id, "row values changed after it was sealed")
+                prev = row["row_hash"]
+                prev_seq = row["chain_seq"]
+
+            if rows:
+                last = rows[-1]["chain_seq"]
+                result["last_seq"] = last
+                result["last_audit_id"] = rows[-1]["audit_id"]
+                result["last_hash"] = prev
+            if len(rows) < page_size:
+                break
+    return result
+
+
+def _verify_range_job(args):
+    return verify_range(*args)
+
+"""
+    Checks the rows sealed since the last verified checkpoint (all rows the first time)
+    and moves the checkpoint forward when they are intact.
+"""
+def verify_incremental(checkpoint_path=DEFAULT_CHECKPOINT, page_size=DEFAULT_PAGE_SIZE,
+                       max_unsealed_age=DEFAULT_MAX_UNSEALED_AGE):
+    checkpoint = load_checkpoint(checkpoint_path)
+    started = time.perf_counter()
+    with get_conn() as conn:
+        cur = conn.cursor(dictionary=True)
+        source = audit_source(cur)
+        problems = check_checkpoint(cur, source, checkpoint)
+        last_seq, last_hash, unsealed, overdue = chain_state(cur, source, max_unsealed_age)
+        cur.close()
+
+    lo = checkpoint["chain_seq"] if checkpoint else 0
+    prev = checkpoint["row_hash"] if checkpoint else GENESIS_HASH
+    results = [verify_range(lo, last_seq, page_size, prev)]
+    problems += check_head(results, last_seq, last_hash)
+    return _finish(checkpoint_path, results, problems, started, 1, unsealed, overdue)
+
+"""
+    Checks the whole chain. The chain_seq range is split into processes * RANGES_PER_PROCESS
+    pieces verified in separate processes; each piece checks its own links and the
+    pieces are stitched together here by comparing each one's first prev_hash and
+    chain_seq with the previous piece's last ones.
+"""
+def verify_full(processes=None, checkpoint_path=DEFAULT_CHECKPOINT, page_size=DEFAULT_PAGE_SIZE,
+                max_unsealed_age=DEFAULT_MAX_UNSEALED_AGE):
+    processes = processes or os.cpu_count() or 1
+    checkpoint = load_checkpoint(checkpoint_path)
+    started = time.perf_counter()
+    with get_conn() as conn:
+        cur = conn.cursor(dictionary=True)
+        source = audit_source(cur)
+        problems = check_checkpoint(cur, source, checkpoint)
+        last_seq, last_hash, unsealed, overdue = chain_state(cur, source, max_unsealed_age)
+        cur.close()
+
+    if last_seq == 0:
+        return _finish(checkpoint_path, [], problems, started, processes, unsealed, overdue)
+
+    count = processes * RANGES_PER_PROCESS
+    step = max((last_seq + count - 1) // count, 1)
+    ranges = [(start, min(start + step, last_seq), page_size, None) for start in range(0, last_seq, step)]
+    ranges[0] = ranges[0][:3] + (GENESIS_HASH,)
+
+    # Spawned workers each open their own connection pool
+    with ProcessPoolExecutor(processes, mp_context=get_context("spawn")) as pool:
+        results = list(pool.map(_verify_range_job, ranges))
+
+    prev, prev_seq = None, None
+    for result in results:
+        if not result["rows"]:
+            continue
+        if prev is not None:
+            if result["first_seq"] != prev_seq + 1:
+                problems.append((result["first_audit_id"],
+                                 f"chain_seq jumps from {prev_seq} to {result['first_seq']} (rows removed)"))
+            if result["first_prev"] != prev:
+                problems.append((result["first_audit_id"],
+                                 "prev_hash does not match the row before (rows removed, inserted or rewritten)"))
+        prev, prev_seq = result["last_hash"], result["last_seq"]
+    problems += check_head(results, last_seq, last_hash)
+    return _finish(checkpoint_path, results, problems, started, processes, unsealed, overdue)
+
+
+"""
+    Totals the verified ranges and moves the checkpoint when the sealed chain is intact.
+    Overdue unsealed rows fail the run but do not hold back the checkpoint: the rows
+    that are sealed were still checked.
+"""
+def _finish(checkpoint_path, results, problems, started, processes, unsealed, overdue=()):
+    elapsed = time.perf_counter() - started
+    rows = sum(r["rows"] for r in results)
+    problem_count = len(problems) + sum(r["problem_count"] for r in results)
+    problems = problems + [p for r in results for p in r["problems"]]
+    problems.sort(key=lambda p: (p[0] is None, p[0] or 0))
+
+    last = next((r for r in reversed(results) if r["rows"]), None)
+    if last is not None and problem_count == 0:
+        write_checkpoint(checkpoint_path, last["last_seq"], last["last_audit_id"], last["last_hash"])
+    problem_count += len(overdue)
+    problems += overdue
+    return {
+        "rows": rows,
+        "last_seq": last["last_seq"] if last else None,
+        "unsealed": unsealed,
+        "problem_count": problem_count,
+        "problems": problems,
+        "processes": processes,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+"""
+    Raised by seal_batch when fewer rows were updated than were read, e.g. because
+    partitions.py archived a month in between. The batch is rolled back; a retry reads
+    the rows again, but a conflict that keeps coming back means the sealer is stuck.
+"""
+class SealConflict(Exception):
+    def __init__(self, table: str, expected: int, updated: int):
+        super().__init__(f"sealed {updated} of {expected} row(s) read from {table}; batch rolled back")
+        self.table = table
+        self.expected = expected
+        self.updated = updated
+
+"""
+    Seals up to page_size unsealed rows of `table`, oldest audit_id first, as one
+    transaction: each row gets the next chain_seq and is hashed onto the chain head.
+    Only this transaction locks audit_chain_head, and it runs after the audited writes
+    have committed, so writers never wait on it. Rows that commit late with a lower
+    audit_id are simply sealed in a later batch. Returns the number of rows sealed;
+    raises SealConflict, after rolling back, when not every row read could be sealed.
+"""
+def seal_batch(conn, cur, table, page_size=DEFAULT_PAGE_SIZE):
+    conn.start_transaction()
+    try:
+        cur.execute(HEAD_LOCK_SQL)
+        head = cur.fetchone()
+        cur.execute(UNSEALED_SQL.format(source=table), (page_size,))
+        rows = cur.fetchall()
+
+        prev, seq = head["last_hash"], head["last_seq"]
+        pending = []
+        for row in rows:
+            seq += 1
+            hash_value = row_hash(prev, row)
+            pending.append((seq, prev, hash_value, row["audit_id"], row["changed_at"]))
+            prev = hash_value
+
+        if pending:
+            cur.executemany(
+                f"UPDATE {table} SET chain_seq = %s, prev_hash = %s, row_hash = %s "
+                f"WHERE audit_id = %s AND changed_at = %s AND chain_seq IS NULL;",
+                pending,
+            )
+            # partitions.py may have moved a month to the archive since the rows were
+            # read; a sequence number without its row would break the chain
+            if cur.rowcount != len(pending):
+                raise SealConflict(table, len(pending), cur.rowcount)
+            cur.execute("UPDATE audit_chain_head SET last_hash = %s, last_seq = %s WHERE id = 1;", (prev, seq))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(pending)
+
+"""
+    Seals every unsealed row in audit_log_archive and audit_log, page_size rows per
+    transaction. With follow, keeps polling for new rows every `interval` seconds
+    until interrupted. A batch that conflicts is reported and read again; after
+    MAX_SEAL_CONFLICTS conflicts in a row the SealConflict is raised so a stuck sealer
+    stops with an error instead of silently sealing nothing. Returns the number of rows sealed.
+"""
+def seal(page_size=DEFAULT_PAGE_SIZE, follow=False, interval=DEFAULT_SEAL_INTERVAL):
+    sealed = 0
+    conflicts = 0
+    with get_conn() as conn:
+        cur = conn.cursor(dictionary=True)
+        try:
+            while True:
+                for table in ("audit_log_archive", LIVE_SOURCE):
+                    while True:
+                        try:
+                            count = seal_batch(conn, cur, table, page_size)
+                        except SealConflict as e:
+                            conflicts += 1
+                            if conflicts >= MAX_SEAL_CONFLICTS:
+                                raise
+                            print(f"[yellow]Seal conflict ({conflicts}/{MAX_SEAL_CONFLICTS}), retrying: {e}[/yellow]")
+                            continue
+                        conflicts = 0
+                        sealed += count
+                        if count:
+                            print(f"  {sealed:,} rows sealed", end="\r")
+                        if count < page_size:
+                            break
+                if not follow:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cur.close()
+    return sealed
+
+
+def print_result(result):
+    print(f"Checked {result['rows']:,} row(s) up to chain_seq {result['last_seq']} "
+          f"in {result['seconds']:.2f}s ({result['rows_per_second']:,.0f} rows/sec, "
+          f"{result['processes']} process(es))")
+    if result["unsealed"]:
+        print(f"[yellow]{result['unsealed']:,} audit row(s) not sealed yet; run `python chain.py seal`.[/yellow]")
+    if result["problem_count"] == 0:
+        print("[green]Audit chain intact.[/green]")
+        return
+    print(f"[red]{result['problem_count']} problem(s) found"
+          f"{' (first ones shown)' if result['problem_count'] > len(result['problems']) else ''}:[/red]")
+    print(tabulate(result["problems"], headers=["Audit ID", "Problem"], tablefmt="grid"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify or seal the audit_log hash chain.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    verify = sub.add_parser("verify", help="check the chain (from the last checkpoint unless --full)")
+    verify.add_argument("--full", action="store_true", help="check every row, in parallel")
+    verify.add_argument("--processes", type=int, help="worker processes for --full (default: CPU count)")
+    verify.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT,
+                        help="file holding the last verified chain_seq, audit_id and hash")
+    verify.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="rows per query")
+    verify.add_argument("--max-unsealed-age", type=int, default=DEFAULT_MAX_UNSEALED_AGE,
+                        help="fail when a row has waited longer than this many seconds for the sealer")
+    seal_cmd = sub.add_parser("seal", help="add committed audit rows to the chain")
+    seal_cmd.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="rows per transaction")
+    seal_cmd.add_argument("--follow", action="store_true", help="keep sealing new rows until interrupted")
+    seal_cmd.add_argument("--interval", type=float, default=DEFAULT_SEAL_INTERVAL,
+                          help="seconds between passes with --follow")
+    args = parser.parse_args()
+
+    if args.command == "seal":
+        try:
+            count = seal(args.page_size, args.follow, args.interval)
+        except SealConflict as e:
+            print(f"[red]Sealing stopped: {e}[/red]")
+            raise SystemExit(1)
+        print(f"[green]Sealed {count:,} audit row(s).[/green]")
+    else:
+        if args.full:
+            result = verify_full(args.processes, args.checkpoint, args.page_size, args.max_unsealed_age)
+        else:
+            result = verify_incremental(args.checkpoint, args.page_size, args.max_unsealed_age)
+        print_result(result)
+        if result["problem_count"]:
+            raise SystemExit(1)
@@ -0,0 +1,265 @@
+# Non-interactive command line interface for scripts and cron jobs
+import argparse
+import csv
+import json
+import shlex
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from database import mysql_connector
+from lazy import lazy_import
+from main import AUTHORIZED_ROLES, UPDATABLE_COLUMNS, StaleVersionError, apply_employee_change
+
+audit = lazy_import("audit")
+snapshot = lazy_import("snapshot")
+
+# Report name -> audit.py function, looked up on use so audit.py loads lazily
+REPORTS = {
+    "salary-last-month": "iter_salary_changes_last_month",
+    "name-last-month": "iter_name_changes_last_month",
+    "department-last-month": "iter_department_changes_last_month",
+    "role-last-month": "iter_role_changes_last_month",
+    "summary-by-user": "get_change_summary_by_user",
+    "summary-by-role": "get_change_summary_by_role",
+    "all-by-user": "iter_all_changes_organized_by_user",
+    "all-by-role": "iter_all_changes_organized_by_role",
+}
+
+# `update name` sets full_name; the other fields keep their column name
+UPDATE_FIELDS = {"salary": "salary", "name": "full_name", "department": "department", "role": "role"}
+
+
+class CommandError(Exception):
+    pass
+
+
+def parse_time(value: str) -> str:
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid timestamp '{value}', use YYYY-MM-DD HH:MM[:SS]")
+
+
+def _json_default(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else str(value)
+
+"""
+    Writes rows (an iterable of dicts) in the requested format.
+    jsonl and csv stream row by row; table and json need the full result.
+"""
+def emit(rows, fmt: str, out=sys.stdout):
+    if fmt == "jsonl":
+        for row in rows:
+            out.write(json.dumps(row, default=_json_default) + "\n")
+    elif fmt == "csv":
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+    elif fmt == "json":
+        out.write(json.dumps(list(rows), default=_json_default, indent=2) + "\n")
+    else:
+        from tabulate import tabulate
+        rows = list(rows)
+        if rows:
+            out.write(tabulate([list(r.values()) for r in rows], headers=list(rows[0]), tablefmt="grid") + "\n")
+        else:
+            out.write("No rows.\n")
+    out.flush()
+
+
+def cmd_report(args):
+    return getattr(audit, REPORTS[args.name])()
+
+
+"""
+    All four last-month reports in one result, fetched in parallel (or one after
+    another with --serial). Each row gets a `field` column and the old/new values are
+    named old_value/new_value. The fetch time goes to stderr.
+"""
+def cmd_monthly(args):
+    report, seconds = audit.get_full_monthly_report(parallel=not args.serial)
+    sys.stderr.write(f"fetched in {seconds * 1000:.0f} ms ({'serial' if args.serial else 'parallel'})\n")
+    if args.compare:
+        _, other = audit.get_full_monthly_report(parallel=args.serial)
+        sys.stderr.write(f"fetched in {other * 1000:.0f} ms ({'parallel' if args.serial else 'serial'})\n")
+
+    rows = []
+    for field, section in report.items():
+        for r in section:
+            old_key, new_key = [k for k in r if k.startswith(("old_", "new_"))]
+            rows.append({
+                "audit_id": r["audit_id"],
+                "employee_id": r["employee_id"],
+                "field": field,
+                "old_value": r[old_key],
+                "new_value": r[new_key],
+                "changed_by": r["changed_by"],
+                "changed_role": r["changed_role"],
+                "justification": r["justification"],
+                "changed_at": r["changed_at"],
+            })
+    rows.sort(key=lambda r: (r["changed_at"], r["audit_id"]), reverse=True)
+    return rows
+
+
+def cmd_range(args):
+    return audit.iter_changes_in_range(args.start, args.end)
+
+
+def cmd_changes(args):
+    if args.user is not None:
+        return audit.iter_changes_by_user(args.user)
+    if args.role is not None:
+        return audit.iter_changes_by_role(args.role)
+    return audit.iter_all_changes_for_employee(args.employee)
+
+
+def cmd_trace(args):
+    if args.field:
+        return audit.iter_field_history(args.employee, args.field)
+    return audit.iter_all_changes_for_employee(args.employee)
+
+
+def cmd_as_of(args):
+    return snapshot.as_of(args.at, args.employee)
+
+
+def cmd_update(args):
+    column = UPDATE_FIELDS[args.field]
+    changes = {column: args.value}
+    if column == "salary":
+        try:
+            changes[column] = float(args.value)
+        except ValueError:
+            raise CommandError(f"Invalid salary '{args.value}'")
+    if column == "department":
+        if not args.new_role:
+            raise CommandError("update department needs --new-role")
+        changes["role"] = args.new_role
+
+    # Status messages from the update path go to stderr to keep stdout machine-readable
+    with redirect_stdout(sys.stderr):
+        try:
+            old = apply_employee_change(args.user, args.as_role, args.id, changes, args.justification,
+                                        args.if_version)
+        except (PermissionError, StaleVersionError) as e:
+            raise CommandError(str(e))
+    if old is None:
+        raise CommandError(f"Employee with ID {args.id} not found")
+
+    return [{"employee_id": args.id, "field": c, "old_value": old[c], "new_value": changes[c]}
+            for c in UPDATABLE_COLUMNS if c in changes]
+
+"""
+    Runs one command per line from a file (or stdin with '-') in this process, so
+    every command reuses the same pooled connection. Blank lines and # comments are skipped.
+"""
+def cmd_run(args):
+    source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    failures = 0
+    try:
+        for line_no, line in enumerate(source, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            status = execute(shlex.split(line), default_format=args.format)
+            if status != 0:
+                failures += 1
+                sys.stderr.write(f"line {line_no}: command failed: {line}\n")
+                if args.stop_on_error:
+                    break
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    if failures:
+        raise CommandError(f"{failures} command(s) failed")
+    return None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Employee audit reports and updates.")
+    parser.add_argument("--format", choices=["table", "json", "jsonl", "csv"], default=None,
+                        help="output format (default: table)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("report", help="canned audit reports")
+    p.add_argument("name", choices=sorted(REPORTS))
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("monthly", help="all four last-month reports at once")
+    p.add_argument("--serial", action="store_true", help="run the reports one after another")
+    p.add_argument("--compare", action="store_true", help="also time the other path")
+    p.set_defaults(func=cmd_monthly)
+
+    p = sub.add_parser("range", help="all changes in a time range")
+    p.add_argument("--start", type=parse_time, required=True)
+    p.add_argument("--end", type=parse_time, required=True)
+    p.set_defaults(func=cmd_range)
+
+    p = sub.add_parser("changes", help="changes made by a user or role, or to an employee")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--user")
+    group.add_argument("--role")
+    group.add_argument("--employee", type=int)
+    p.set_defaults(func=cmd_changes)
+
+    p = sub.add_parser("trace", help="provenance chain for an employee or one of their fields")
+    p.add_argument("--employee", type=int, required=True)
+    p.add_argument("--field", choices=list(UPDATABLE_COLUMNS))
+    p.set_defaults(func=cmd_trace)
+
+    p = sub.add_parser("as-of", help="employees as they were at a point in time")
+    p.add_argument("--at", type=parse_time, required=True)
+    p.add_argument("--employee", type=int)
+    p.set_defaults(func=cmd_as_of)
+
+    p = sub.add_parser("update", help="change one employee field")
+    p.add_argument("field", choices=list(UPDATE_FIELDS))
+    p.add_argument("--id", type=int, required=True, help="employee ID to update")
+    p.add_argument("--value", required=True)
+    p.add_argument("--new-role", help="role in the new department (update department only)")
+    p.add_argument("--user", required=True, help="your username (for audit log)")
+    p.add_argument("--as-role", required=True, choices=AUTHORIZED_ROLES, help="your authorized role")
+    p.add_argument("--justification")
+    p.add_argument("--if-version", type=int, help="only update if the employee is still at this version")
+    p.set_defaults(func=cmd_update)
+
+    p = sub.add_parser("run", help="run many commands from a file in one process")
+    p.add_argument("file", help="file with one command per line, or - for stdin")
+    p.add_argument("--stop-on-error", action="store_true")
+    p.set_defaults(func=cmd_run)
+
+    return parser
+
+"""
+    Parses and runs one command. Returns a process exit status.
+"""
+def execute(argv, default_format=None):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code or 0
+
+    fmt = args.format or default_format or "table"
+    if args.command == "run":
+        args.format = fmt
+    try:
+        rows = args.func(args)
+        if rows is not None:
+            emit(rows, fmt)
+    except (CommandError, ValueError) as e:
+        sys.stderr.write(f"error: {e}\n")
+        return 1
+    except mysql_connector.Error as e:
+        sys.stderr.write(f"database error: {e}\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(execute(sys.argv[1:]))
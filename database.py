@@ -1,14 +1,32 @@
+import atexit
 import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
 from contextlib import contextmanager
 
-import mysql.connector
-from dotenv import load_dotenv
 from rich import print
 
-load_dotenv()  # Load .env file
+from lazy import lazy_import, load_now
+
+# Loaded on first use so importing this module stays cheap
+mysql_connector = lazy_import("mysql.connector")
+
+_env_loaded = False
+
+""" Load .env file the first time settings are read """
+def load_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
 """ db creds """
 def get_db_config():
+    load_env()
     return {
         "host": os.getenv("DB_HOST", "localhost"),
         "port": int(os.getenv("DB_PORT", "3306")),
@@ -18,15 +36,255 @@ def get_db_config():
     }
 
 
-""" Starts and ends db connection """
+""" pool settings """
+def get_pool_config():
+    load_env()
+    return {
+        "min_size": int(os.getenv("DB_POOL_MIN", "1")),
+        "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+        "idle_timeout": float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+        "wait_timeout": float(os.getenv("DB_POOL_WAIT_TIMEOUT", "30")),
+    }
+
+
+# Session variables read by trg_employees_audit. They are cleared every time a
+# connection goes back to the pool so one borrower's identity never leaks to the next.
+SESSION_VARIABLES = ("@app_current_user", "@app_current_role", "@app_justification")
+
+"""
+    Process-wide pool of MySQL connections.
+    Opens min_size connections up front and keeps between min_size and max_size
+    open, pings each one on checkout, closes connections that sat idle longer than
+    idle_timeout and counts checkouts, waits and handshakes (new physical connections).
+"""
+class ConnectionPool:
+    def __init__(self, config, min_size=1, max_size=10, idle_timeout=300.0, wait_timeout=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._idle = deque()  # (conn, returned_at) pairs, most recently returned on the right
+        self._open = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "handshakes": 0,
+            "failed_pings": 0,
+            "evictions": 0,
+        }
+        self.warm_up()
+
+    """ Opens connections until min_size are open, so the first borrowers skip the handshake. """
+    def warm_up(self):
+        while True:
+            with self._cond:
+                if self._open >= self.min_size:
+                    return
+                self._open += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    """ Counts a connection as checked out once it is actually handed to the borrower. """
+    def _checked_out(self, conn):
+        with self._cond:
+            self.stats["checkouts"] += 1
+        return conn
+
+    def _connect(self):
+        conn = mysql_connector.connect(**self.config)
+        with self._cond:
+            self.stats["handshakes"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except mysql_connector.Error:
+            pass
+
+    """ Close connections idle longer than idle_timeout, keeping at least min_size open. Caller holds the lock. """
+    def _evict_idle(self):
+        now = time.monotonic()
+        evicted = []
+        while self._idle and self._open > self.min_size:
+            conn, returned_at = self._idle[0]
+            if now - returned_at < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._open -= 1
+            self.stats["evictions"] += 1
+            evicted.append(conn)
+        return evicted
+
+    """ Borrow a connection, waiting up to wait_timeout if the pool is exhausted. """
+    def acquire(self):
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            evicted = self._evict_idle()
+            waited = False
+            while True:
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No database connection available after {self.wait_timeout}s")
+                if not waited:
+                    self.stats["waits"] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+        for old in evicted:
+            self._discard(old)
+
+        if conn is not None:
+            # Liveness check: reconnect transparently if the server dropped us
+            try:
+                conn.ping(reconnect=False)
+                return self._checked_out(conn)
+            except mysql_connector.Error:
+                with self._cond:
+                    self.stats["failed_pings"] += 1
+                self._discard(conn)
+
+        try:
+            return self._checked_out(self._connect())
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    """ Return a connection, rolling back open work and clearing the app session variables. """
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            cur = conn.cursor()
+            cur.execute("SET " + ", ".join(f"{var} = NULL" for var in SESSION_VARIABLES) + ";")
+            cur.close()
+        except mysql_connector.Error:
+            self._discard(conn)
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    """ Close every idle connection (registered with atexit by get_pool). """
+    def close(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                **self.stats,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+"""
+    Returns the process-wide pool, creating it on first use. The connector module is
+    imported while the pool is built, so threads sharing the pool never import it, and
+    the pool's idle connections are closed when the interpreter exits.
+"""
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                load_now(mysql_connector)
+                _pool = ConnectionPool(get_db_config(), **get_pool_config())
+                atexit.register(_pool.close)
+    return _pool
+
+
+""" Returns checkout/wait/handshake counters and current sizes for the pool. """
+def get_pool_stats():
+    return get_pool().snapshot()
+
+
+""" Borrows a pooled db connection and hands it back when done """
 @contextmanager
 def get_conn():
-    config = get_db_config()
-    conn = mysql.connector.connect(**config)
+    pool = get_pool()
+    conn = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+# Server-side prepared statements belong to the connection that prepared them, so each
+# pooled connection keeps its own small LRU of prepared cursors keyed by SQL text.
+PREPARED_CACHE_SIZE = 32
+
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+_prepared_stats = {"prepares": 0, "reuses": 0}
+
+"""
+    Returns a prepared dictionary cursor for `sql` on this connection.
+    The first call prepares the statement; later calls with the same text get the
+    same cursor back and only re-execute it, skipping the server's parse and plan.
+    The cursor must be executed with this exact `sql` object (audit_query interns it).
+"""
+def prepared_cursor(conn, sql: str):
+    evicted = []
+    with _prepared_lock:
+        cursors = _prepared.setdefault(conn, OrderedDict())
+        cur = cursors.get(sql)
+        if cur is None:
+            _prepared_stats["prepares"] += 1
+            while len(cursors) >= PREPARED_CACHE_SIZE:
+                evicted.append(cursors.popitem(last=False)[1])
+            cur = cursors[sql] = conn.cursor(prepared=True, dictionary=True)
+        else:
+            _prepared_stats["reuses"] += 1
+            cursors.move_to_end(sql)
+
+    for old in evicted:
+        try:
+            old.close()
+        except mysql_connector.Error:
+            pass
+    return cur
+
+
+""" Returns how many statements were prepared and how many executions reused one. """
+def get_prepared_stats():
+    with _prepared_lock:
+        return dict(_prepared_stats)
 
 """
     Set session variables used by the MySQL trigger to know who is making changes.
@@ -40,18 +298,164 @@ def set_app_identity(cursor, username: str, role: str | None, justification: str
     print(f"[green]Session identity set:[/green] user={username}, role={role}")
 
 
+"""
+    Answers "does username hold role?" from memory for a short while. Granted roles are
+    kept for `ttl` seconds and refusals for `negative_ttl`, so repeated checks (and
+    repeated bad guesses) skip the database. Paths that change an employee's name or
+    role call invalidate_user(); other processes' changes show up once the TTL runs out.
+"""
+class AuthCache:
+    def __init__(self, ttl=30.0, negative_ttl=5.0, max_entries=10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (username, role) -> (authorized, expires_at), oldest first
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+        }
+
+    """ Returns True or False if the answer is cached and fresh, otherwise None """
+    def get(self, username: str, role: str):
+        with self._lock:
+            entry = self._entries.get((username, role))
+            if entry is None or entry[1] <= time.monotonic():
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits" if entry[0] else "negative_hits"] += 1
+            return entry[0]
+
+    def put(self, username: str, role: str, authorized: bool):
+        ttl = self.ttl if authorized else self.negative_ttl
+        with self._lock:
+            self._entries.pop((username, role), None)
+            self._entries[(username, role)] = (authorized, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    """ Forgets every cached answer for these usernames """
+    def invalidate_user(self, *usernames):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in usernames]:
+                del self._entries[key]
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "ttl": self.ttl, "negative_ttl": self.negative_ttl}
+
+
+_auth_cache = None
+_auth_cache_lock = threading.Lock()
+
+""" Returns the process-wide authorization cache, with TTLs from AUTH_CACHE_TTL and AUTH_CACHE_NEGATIVE_TTL """
+def get_auth_cache():
+    global _auth_cache
+    if _auth_cache is None:
+        with _auth_cache_lock:
+            if _auth_cache is None:
+                load_env()
+                _auth_cache = AuthCache(
+                    ttl=float(os.getenv("AUTH_CACHE_TTL", "30")),
+                    negative_ttl=float(os.getenv("AUTH_CACHE_NEGATIVE_TTL", "5")),
+                )
+    return _auth_cache
+
+
+""" Hit/miss counters and size of the authorization cache """
+def get_auth_cache_stats():
+    return get_auth_cache().snapshot()
+
+# Stops at the first match; idx_employees_name_role turns it into one index lookup
+USER_ROLE_SQL = "SELECT 1 FROM employees WHERE full_name = %s AND role = %s LIMIT 1;"
+
 """
     Validates that the given username exists in the employees table with the specified role.
-    Returns True if the user has the role, False otherwise.
+    Returns True if the user has the role, False otherwise. Answers come from the
+    authorization cache when it has a fresh one.
 """
 def validate_user_role(cursor, username: str, role: str) -> bool:
-    cursor.execute(
-        """
-        SELECT COUNT(*) as count
-        FROM employees
-        WHERE full_name = %s AND role = %s;
-        """,
-        (username, role)
-    )
-    result = cursor.fetchone()
-    return result[0] > 0 if result else False
+    cache = get_auth_cache()
+    authorized = cache.get(username, role)
+    if authorized is None:
+        cursor.execute(USER_ROLE_SQL, (username, role))
+        authorized = cursor.fetchone() is not None
+        cache.put(username, role, authorized)
+    return authorized
+
+
+# Columns update_employee() can change, in the procedure's parameter order
+PROCEDURE_COLUMNS = ("salary", "full_name", "department", "role")
+UPDATE_EMPLOYEE_SQL = "CALL update_employee(%s, %s, %s, %s, %s, %s, %s, %s, %s);"
+
+"""
+    Calls the update_employee stored procedure, which checks username's role, sets the
+    audit identity, reads the old values, applies `changes` ({column: new value}) and
+    commits, all in one round trip. Columns not in `changes` are left alone.
+    With expected_version the change is only applied if the row still has that version.
+    Returns (status, old values, new values), each with the row's "version"; status is
+    'ok', 'unauthorized', 'not_found' or 'conflict' (old values are then the current ones).
+"""
+def call_update_employee(cursor, username: str, role: str, employee_id: int, changes: dict,
+                         justification: str | None = None, expected_version: int | None = None):
+    params = ((username, role, employee_id, expected_version)
+              + tuple(changes.get(c) for c in PROCEDURE_COLUMNS)
+              + (justification,))
+    row = {}
+    # CALL sends the procedure's result set and a final status; read both
+    for result in cursor.execute(UPDATE_EMPLOYEE_SQL, params, multi=True):
+        if result.with_rows:
+            row = dict(zip(result.column_names, result.fetchone()))
+            result.fetchall()
+
+    old = {c: row.get(f"old_{c}") for c in PROCEDURE_COLUMNS}
+    new = {c: row.get(f"new_{c}") for c in PROCEDURE_COLUMNS}
+    old["version"], new["version"] = row.get("old_version"), row.get("new_version")
+    return row.get("status"), old, new
+
+# Errors after which InnoDB has rolled back (1213) or given up on (1205) the statement
+# and the whole transaction can simply be tried again
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK = 1213
+RETRYABLE_ERRORS = {ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK}
+DEFAULT_RETRIES = 5
+
+_retry_lock = threading.Lock()
+_retry_stats = {"retries": 0, "gave_up": 0}
+
+"""
+    Runs func() and, if it fails with a deadlock or lock wait timeout, rolls back
+    `conn` (when given) and runs it again after a short randomized backoff, up to
+    `retries` more times. func must redo the whole transaction. Other errors, and the
+    last retryable one, are raised.
+"""
+def with_retry(func, conn=None, retries: int = DEFAULT_RETRIES, base_delay: float = 0.01):
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except mysql_connector.Error as e:
+            if e.errno not in RETRYABLE_ERRORS:
+                raise
+            if attempt == retries:
+                with _retry_lock:
+                    _retry_stats["gave_up"] += 1
+                raise
+            with _retry_lock:
+                _retry_stats["retries"] += 1
+            if conn is not None:
+                conn.rollback()
+            time.sleep(base_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+""" Returns how many transactions were retried after a deadlock or lock wait timeout and how many gave up. """
+def get_retry_stats():
+    with _retry_lock:
+        return dict(_retry_stats)
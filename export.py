@@ -0,0 +1,344 @@
+# Streams audit_log to CSV, JSONL or Parquet for auditors
+#     python export.py audit-2026.csv.gz --start 2026-01-01 --end 2026-12-31
+#     python export.py audit-2026.csv.gz --resume        # continue after the last exported row
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import itertools
+import json
+import lzma
+import time
+from datetime import datetime
+from pathlib import Path
+
+from rich import print
+
+from audit import KeysetStream, encode_resume_token
+from audit_query import AUDIT_COLUMNS, BY_AUDIT_ID, AuditQuery
+from cdc import MAX_TRACKED_GAP, FeedState
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_ROWS_PER_FILE = 1000000  # Parquet rows per part file
+
+FORMATS = ("csv", "jsonl", "parquet")
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+OPENERS = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+
+def _json_default(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else str(value)
+
+"""
+    Works out (format, compression) from the file name, ex: audit.csv.gz -> (csv, gzip).
+    Explicit --format / --compression win over the name.
+"""
+def detect_format(path: Path, fmt=None, compression=None):
+    suffixes = path.suffixes
+    if fmt is None:
+        names = [s.lstrip(".") for s in suffixes]
+        fmt = next((n for n in reversed(names) if n in FORMATS), None)
+        if fmt is None:
+            raise ValueError(f"Cannot tell the format of '{path}', pass --format")
+    if compression is None:
+        default = "snappy" if fmt == "parquet" else "none"
+        compression = COMPRESSION_SUFFIXES.get(suffixes[-1] if suffixes else "", default)
+    if fmt == "parquet" and compression not in ("none", "snappy", "zstd", "gzip"):
+        raise ValueError("Parquet compression must be snappy, zstd or gzip")
+    if fmt != "parquet" and compression not in ("none", *OPENERS):
+        raise ValueError(f"{fmt} compression must be gzip, bz2 or xz")
+    return fmt, compression
+
+
+def checkpoint_path(path: Path) -> Path:
+    return path.with_name(path.name + ".checkpoint")
+
+
+def read_checkpoint(path: Path):
+    try:
+        return json.loads(checkpoint_path(path).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path: Path, state):
+    tmp = checkpoint_path(path).with_suffix(".tmp")
+    tmp.write_text(json.dumps(state))
+    tmp.replace(checkpoint_path(path))
+
+"""
+    Appends chunks to a CSV or JSONL file. Every chunk is written and closed on its own
+    (one compressed member per chunk), so after each chunk the file ends on a clean
+    boundary and its size can be recorded in the checkpoint.
+"""
+class TextChunkWriter:
+    def __init__(self, path: Path, fmt: str, compression: str, resume_bytes=None):
+        self.path = path
+        self.fmt = fmt
+        self.compression = compression
+        if resume_bytes is None:
+            path.write_bytes(b"")
+            self.needs_header = fmt == "csv"
+        else:
+            # Drop anything written after the last checkpoint
+            with open(path, "r+b") as f:
+                f.truncate(resume_bytes)
+            self.needs_header = False
+
+    def write(self, rows):
+        buffer = io.StringIO()
+        if self.fmt == "csv":
+            writer = csv.writer(buffer)
+            if self.needs_header:
+                writer.writerow(AUDIT_COLUMNS)
+                self.needs_header = False
+            writer.writerows([row[c] for c in AUDIT_COLUMNS] for row in rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(row, default=_json_default) + "\n")
+
+        data = buffer.getvalue().encode("utf-8")
+        if self.compression == "none":
+            with open(self.path, "ab") as f:
+                f.write(data)
+        else:
+            with OPENERS[self.compression](self.path, "ab") as f:
+                f.write(data)
+        return True
+
+    """ Checkpoint fields saying how much of the output is complete """
+    def position(self):
+        return {"bytes": self.path.stat().st_size}
+
+    def close(self):
+        return False
+
+"""
+    Writes chunks as row groups of Parquet files. A Parquet file is only readable once
+    it is closed, so the export rolls over to a new part file (<name>.partN.parquet)
+    every rows_per_file rows and only closed files count as done: a crash loses at
+    most the open file. With rows_per_file equal to the chunk size every row group is
+    its own file and is checkpointed as soon as it is flushed. Files already written
+    (`files`, from the checkpoint) are kept when resuming.
+"""
+class ParquetChunkWriter:
+    def __init__(self, path: Path, compression: str, rows_per_file=DEFAULT_ROWS_PER_FILE, files=()):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow: pip install pyarrow") from None
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.compression = compression
+        self.rows_per_file = rows_per_file
+        self.files = list(files)
+        self.writer = None
+        self.rows_in_file = 0
+        self.schema = pa.schema([
+            ("audit_id", pa.int64()),
+            ("table_name", pa.string()),
+            ("row_id", pa.int64()),
+            ("column_name", pa.string()),
+            ("old_value", pa.string()),
+            ("new_value", pa.string()),
+            ("changed_by", pa.string()),
+            ("changed_role", pa.string()),
+            ("justification", pa.string()),
+            ("changed_at", pa.timestamp("us")),
+        ])
+
+    def write(self, rows):
+        if self.writer is None:
+            target = _next_part(self.path) if self.path.exists() else self.path
+            self.writer = self.pq.ParquetWriter(str(target), self.schema, compression=self.compression)
+            self.target = target
+        columns = {c: [row[c] for row in rows] for c in AUDIT_COLUMNS}
+        # Salary values come back as Decimal; both value columns stay text in the file
+        for c in ("old_value", "new_value"):
+            columns[c] = [None if v is None else str(v) for v in columns[c]]
+        self.writer.write_table(self.pa.table(columns, schema=self.schema))
+        self.rows_in_file += len(rows)
+        if self.rows_in_file >= self.rows_per_file:
+            return self.close()
+        return False
+
+    def position(self):
+        return {"files": list(self.files)}
+
+    """ Closes the open part file, if any; returns True when that completed a file """
+    def close(self):
+        if self.writer is None:
+            return False
+        self.writer.close()
+        self.writer = None
+        self.rows_in_file = 0
+        self.files.append(self.target.name)
+        return True
+
+
+def _part_name(path: Path, n: int) -> Path:
+    return path.with_name(f"{path.name.removesuffix('.parquet')}.part{n}.parquet")
+
+
+def _next_part(path: Path) -> Path:
+    n = 1
+    while _part_name(path, n).exists():
+        n += 1
+    return _part_name(path, n)
+
+""" Deletes Parquet files of this export that the checkpoint does not list (left open by a crash) """
+def _drop_unfinished_parts(path: Path, files):
+    for candidate in [path, *path.parent.glob(_part_name(path, "*").name)]:
+        if candidate.exists() and candidate.name not in files:
+            candidate.unlink()
+
+
+def _query(filters, audit_ids=()):
+    employee_id, user, role = filters["employee_id"], filters["user"], filters["role"]
+    return AuditQuery(
+        AUDIT_COLUMNS,
+        table_name="employees" if employee_id is not None else None,
+        row_ids=(employee_id,) if employee_id is not None else (),
+        users=(user,) if user is not None else (),
+        roles=(role,) if role is not None else (),
+        since=filters["start"],
+        until=filters["end"],
+        order=BY_AUDIT_ID,
+        audit_ids=audit_ids,
+    )
+
+"""
+    Streams audit_log rows in audit_id order to `path` in chunks of chunk_size rows,
+    so memory stays at one chunk whatever the size of the log.
+    Filters: start/end (changed_at), employee_id, user, role.
+    With resume=True the export continues from the checkpoint file next to the output
+    (<output>.checkpoint): after its last audit_id, plus the ids below it that had not
+    committed yet (tracked with cdc.FeedState), which are written first.
+    Returns a dict with rows written, last audit_id, seconds and rows/sec.
+"""
+def export_audit_log(path, fmt=None, compression=None, start=None, end=None, employee_id=None,
+                     user=None, role=None, chunk_size=DEFAULT_CHUNK_SIZE, resume=False,
+                     rows_per_file=DEFAULT_ROWS_PER_FILE):
+    path = Path(path)
+    fmt, compression = detect_format(path, fmt, compression)
+    filters = {"start": start, "end": end, "employee_id": employee_id, "user": user, "role": role}
+
+    state = read_checkpoint(path) if resume else None
+    if state is not None and (state["format"], state["compression"]) != (fmt, compression):
+        raise ValueError(f"The checkpoint is for a {state['format']} export; export to a new file")
+    if state is not None and state["filters"] != filters:
+        raise ValueError("The checkpoint was written with different filters; export to a new file")
+    if state is not None and fmt != "parquet" and not path.exists():
+        raise ValueError(f"Cannot resume: '{path}' is missing")
+    if state is None:
+        checkpoint_path(path).unlink(missing_ok=True)
+
+    # Checkpoints written before gap tracking only have last_audit_id
+    if state is None:
+        feed = FeedState()
+    else:
+        feed = FeedState(**state["feed"]) if "feed" in state else FeedState(state["last_audit_id"])
+    last_audit_id = state["last_audit_id"] if state else None
+    total = state["rows"] if state else 0
+    if fmt == "parquet":
+        if state is None:
+            files = []
+        elif "files" in state:
+            files = state["files"]
+        else:
+            files = [p.name for p in (path, *path.parent.glob(_part_name(path, "*").name)) if p.exists()]
+        # A fresh export replaces the files of an earlier one at this path
+        _drop_unfinished_parts(path, files)
+        writer = ParquetChunkWriter(path, compression, rows_per_file, files)
+    else:
+        writer = TextChunkWriter(path, fmt, compression, state["bytes"] if state else None)
+
+    # Rows skipped last time because they had not committed yet go first
+    rows = KeysetStream(_query(filters), page_size=chunk_size,
+                        resume_token=encode_resume_token([feed.watermark]) if state else None)
+    if feed.gaps:
+        rows = itertools.chain(KeysetStream(_query(filters, sorted(feed.gaps)), page_size=None), rows)
+
+    started = time.perf_counter()
+    written = 0
+    chunk = []
+
+    def checkpoint():
+        write_checkpoint(path, {"format": fmt, "compression": compression, "filters": filters,
+                                "last_audit_id": last_audit_id, "feed": feed.to_dict(), "rows": total,
+                                **writer.position()})
+
+    def flush():
+        nonlocal written, total, last_audit_id
+        durable = writer.write(chunk)
+        written += len(chunk)
+        total += len(chunk)
+        last_audit_id = max(last_audit_id or 0, chunk[-1]["audit_id"])
+        # Only ids close below the watermark can still be uncommitted (as in cdc.py);
+        # with filters most ids between exported rows are simply other rows
+        now = time.time()
+        feed.advance(chunk, now)
+        feed.expire_gaps(now)
+        feed.gaps = {k: v for k, v in feed.gaps.items() if k > feed.watermark - MAX_TRACKED_GAP}
+        chunk.clear()
+        if durable:
+            checkpoint()
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    if writer.close():
+        checkpoint()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": written,
+        "total_rows": total,
+        "last_audit_id": last_audit_id,
+        "seconds": elapsed,
+        "rows_per_second": written / elapsed if elapsed else 0.0,
+    }
+
+
+def parse_time(value: str) -> str:
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid timestamp '{value}', use YYYY-MM-DD HH:MM[:SS]")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export audit_log to CSV, JSONL or Parquet.")
+    parser.add_argument("output", help="output file, ex: audit.csv, audit.jsonl.gz, audit.parquet")
+    parser.add_argument("--format", choices=FORMATS, help="default: taken from the file name")
+    parser.add_argument("--compression", choices=["none", "gzip", "bz2", "xz", "snappy", "zstd"],
+                        help="default: taken from the file name (Parquet: snappy, zstd or gzip)")
+    parser.add_argument("--start", type=parse_time, help="only changes at or after this time")
+    parser.add_argument("--end", type=parse_time, help="only changes at or before this time")
+    parser.add_argument("--employee", type=int, help="only changes to this employee")
+    parser.add_argument("--user", help="only changes made by this user")
+    parser.add_argument("--role", help="only changes made with this role")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--rows-per-file", type=int, default=DEFAULT_ROWS_PER_FILE,
+                        help="Parquet only: start a new part file after this many rows")
+    parser.add_argument("--resume", action="store_true", help="continue after the last exported audit_id")
+    args = parser.parse_args()
+
+    try:
+        result = export_audit_log(args.output, args.format, args.compression, args.start, args.end,
+                                  args.employee, args.user, args.role, args.chunk_size, args.resume,
+                                  args.rows_per_file)
+    except ValueError as e:
+        print(f"[red]{e}[/red]")
+        raise SystemExit(1)
+
+    print(f"[green]Exported {result['rows']} row(s)[/green] in {result['seconds']:.2f}s "
+          f"({result['rows_per_second']:.0f} rows/sec), {result['total_rows']} in total, "
+          f"last audit_id {result['last_audit_id']}")
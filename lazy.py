@@ -0,0 +1,64 @@
+# Deferred imports to keep startup fast
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+"""
+    Stand-in for a module that is imported the first time one of its attributes is
+    used; every attribute is then read from (and written to) the real module.
+    importlib.util.LazyLoader is not thread-safe before Python 3.12: a second thread
+    can see the half-executed module and fail with AttributeError. Here the first use
+    takes a per-module lock, so concurrent first uses wait for one complete import.
+"""
+class _LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.RLock()
+        self.__dict__["_lazy_module"] = None
+
+    def _lazy_load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    name = self.__name__
+                    if sys.modules.get(name) is self:
+                        del sys.modules[name]
+                    try:
+                        module = importlib.import_module(name)
+                    except BaseException:
+                        sys.modules.setdefault(name, self)
+                        raise
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._lazy_load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+"""
+    Returns a module whose code only runs the first time one of its attributes is used.
+    Used for heavy dependencies (mysql.connector, tabulate, the report modules) that
+    short invocations may never touch. Safe to touch from several threads at once.
+"""
+def lazy_import(name: str):
+    if name in sys.modules:
+        return sys.modules[name]
+
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    module = _LazyModule(name)
+    sys.modules[name] = module
+    return module
+
+""" Imports a module returned by lazy_import now, on the calling thread; returns the real module """
+def load_now(module):
+    return module._lazy_load() if isinstance(module, _LazyModule) else module
@@ -1,20 +1,15 @@
 # Main application
 from datetime import datetime
-from tabulate import tabulate
 from rich import print
 
-from database import get_conn, set_app_identity, validate_user_role
-from audit import (
-    print_salary_changes_last_month,
-    print_name_changes_last_month,
-    print_department_changes_last_month,
-    print_role_changes_last_month,
-    print_changes_in_range,
-    print_field_history,
-    print_all_changes_for_employee,
-    print_all_changes_by_user,
-    print_all_changes_by_role,
-)
+from database import call_update_employee, get_auth_cache, get_conn, validate_user_role, with_retry
+from lazy import lazy_import
+from reference_data import get_reference_data
+
+# Report modules and tabulate load on first use so the menu appears without waiting for them
+audit = lazy_import("audit")
+snapshot = lazy_import("snapshot")
+tabulate = lazy_import("tabulate")
 
 # Authorized roles that can make changes
 AUTHORIZED_ROLES = [
@@ -48,29 +43,16 @@ def select_authorized_role():
         return None
 
 """
-    Get list of unique departments from the database.
+    Get list of unique departments, from the reference data cache.
 """
 def get_departments():
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT DISTINCT department FROM employees ORDER BY department;")
-        rows = cur.fetchall()
-        cur.close()
-        return [row[0] for row in rows]
+    return get_reference_data().departments()
 
 """
-    Get list of unique roles for a specific department.
+    Get list of unique roles for a specific department, from the reference data cache.
 """
 def get_roles_by_department(department):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT DISTINCT role FROM employees WHERE department = %s AND role IS NOT NULL ORDER BY role;",
-            (department,)
-        )
-        rows = cur.fetchall()
-        cur.close()
-        return [row[0] for row in rows]
+    return get_reference_data().roles(department)
 
 """
     Prompts the user to select a department from the list of existing departments.
@@ -162,88 +144,178 @@ def list_employees():
     ]
     headers = ["ID", "Name", "Department", "Role", "Salary", "Last Updated"]
     print("[bold magenta]Employees:[/bold magenta]")
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+    print(tabulate.tabulate(table, headers=headers, tablefmt="grid"))
 
-""" Update employee salary """
-def update_salary():
+# Columns the update paths are allowed to change
+UPDATABLE_COLUMNS = ("salary", "full_name", "department", "role")
+
+"""
+    Asks for the editor's username and role and checks the pair up front (from the
+    authorization cache when it can), so a bad login is turned away before the
+    operator types in the change. Returns (username, role) or None.
+"""
+def select_editor():
     username = input("Enter your username (for audit log): ").strip()
     role = select_authorized_role()
     if role is None:
         print("[red]Update cancelled due to invalid role selection.[/red]")
-        return
+        return None
 
-    # Validate that the username has the selected role
     with get_conn() as conn:
         cur = conn.cursor()
-        if not validate_user_role(cur, username, role):
-            print(f"[red]Authorization failed: User '{username}' does not have the role '{role}'.[/red]")
-            cur.close()
-            return
+        authorized = validate_user_role(cur, username, role)
         cur.close()
+    if not authorized:
+        print(f"[red]Authorization failed: User '{username}' does not have the role '{role}'.[/red]")
+        return None
+    return username, role
 
+"""
+    Raised when an employee was changed by someone else after the caller read it.
+    `current` holds the employee's values and version as they are now.
+"""
+class StaleVersionError(Exception):
+    def __init__(self, employee_id: int, current: dict):
+        super().__init__(f"Employee {employee_id} was changed by someone else (now at version {current['version']})")
+        self.employee_id = employee_id
+        self.current = current
+
+"""
+    Reads one employee's updatable columns and version, the values an editor is shown
+    before changing them. Returns a dict or None if the employee does not exist.
+"""
+def fetch_employee(employee_id: int):
+    with get_conn() as conn:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(
+            f"SELECT {', '.join(UPDATABLE_COLUMNS)}, version FROM employees WHERE employee_id = %s;",
+            (employee_id,),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+"""
+    Applies `changes` ({column: new value}) to one employee as username/role through
+    the update_employee procedure: the role check, old values, update and commit are
+    one round trip. The trigger logs every changed column to audit_log.
+    With expected_version (from fetch_employee) the change is only made if nobody
+    changed the employee since; a deadlock or lock wait timeout is retried.
+    Returns the old values as {column: value} plus the new "version", or None if the
+    employee does not exist.
+    Raises PermissionError if username does not hold role and StaleVersionError if
+    the employee is no longer at expected_version.
+"""
+def apply_employee_change(username: str, role: str, employee_id: int, changes: dict,
+                          justification: str | None = None, expected_version: int | None = None):
+    columns = [c for c in UPDATABLE_COLUMNS if c in changes]
+    if not columns or len(columns) != len(changes) or any(changes[c] is None for c in columns):
+        raise ValueError(f"Changes must be a non-empty subset of {', '.join(UPDATABLE_COLUMNS)}")
+
+    def attempt():
+        with get_conn() as conn:
+            cur = conn.cursor()
+            result = call_update_employee(cur, username, role, employee_id, changes,
+                                          justification, expected_version)
+            cur.close()
+            return result
+
+    # The procedure checks the role itself; a cached refusal just saves the round trip
+    auth_cache = get_auth_cache()
+    if auth_cache.get(username, role) is False:
+        raise PermissionError(f"User '{username}' does not have the role '{role}'")
+
+    status, old, new = with_retry(attempt)
+    auth_cache.put(username, role, status != "unauthorized")
+    if status == "unauthorized":
+        raise PermissionError(f"User '{username}' does not have the role '{role}'")
+    if status == "not_found":
+        return None
+    if status == "conflict":
+        raise StaleVersionError(employee_id, old)
+    if "department" in changes or "role" in changes:
+        get_reference_data().invalidate()
+    if "full_name" in changes or "role" in changes:
+        auth_cache.invalidate_user(old["full_name"], new["full_name"])
+    return {**{c: old[c] for c in columns}, "version": new["version"]}
+
+"""
+    Runs apply_employee_change() for the interactive menu, printing why it failed.
+    Returns the old values or None.
+"""
+def apply_and_report(username: str, role: str, employee_id: int, changes: dict, justification: str | None,
+                     expected_version: int | None = None):
+    try:
+        old = apply_employee_change(username, role, employee_id, changes, justification, expected_version)
+    except PermissionError:
+        print(f"[red]Authorization failed: User '{username}' does not have the role '{role}'.[/red]")
+        return None
+    except StaleVersionError as e:
+        print(f"[red]Employee {employee_id} was changed by someone else while you were editing. "
+              f"Nothing was saved.[/red]")
+        print("  Current values: " + ", ".join(f"{c}={e.current[c]}" for c in UPDATABLE_COLUMNS))
+        return None
+    if old is None:
+        print(f"[red]Employee with ID {employee_id} not found.[/red]")
+    return old
+
+"""
+    Asks for an employee ID and shows that employee's current values.
+    Returns (employee_id, current row) or None if the input is invalid or no such employee.
+"""
+def select_employee():
     try:
         employee_id = int(input("Enter employee ID to update: ").strip())
-        new_salary = float(input("Enter new salary: ").strip())
     except ValueError:
         print("[red]Invalid number entered.[/red]")
-        return
-
-    justification = input("Enter justification for this change: ").strip() or None
+        return None
 
-    with get_conn() as conn:
-        cur = conn.cursor()
+    current = fetch_employee(employee_id)
+    if current is None:
+        print(f"[red]Employee with ID {employee_id} not found.[/red]")
+        return None
+    print(f"Current: {current['full_name']}, {current['department']}, {current['role'] or 'N/A'}, "
+          f"salary {current['salary']}")
+    return employee_id, current
 
-        # Set session identity for trigger
-        set_app_identity(cur, username, role, justification)
+""" Update employee salary """
+def update_salary():
+    editor = select_editor()
+    if editor is None:
+        return
+    username, role = editor
 
-        # Optional: show old salary first
-        cur.execute("SELECT salary FROM employees WHERE employee_id = %s;", (employee_id,))
-        row = cur.fetchone()
-        if not row:
-            print(f"[red]Employee with ID {employee_id} not found.[/red]")
-            cur.close()
-            return
+    selected = select_employee()
+    if selected is None:
+        return
+    employee_id, current = selected
 
-        old_salary = row[0]
-        print(f"Old salary: {old_salary}")
+    try:
+        new_salary = float(input("Enter new salary: ").strip())
+    except ValueError:
+        print("[red]Invalid number entered.[/red]")
+        return
 
-        # Perform the update (trigger will log to audit_log)
-        cur.execute(
-            """
-            UPDATE employees
-            SET salary = %s
-            WHERE employee_id = %s;
-            """,
-            (new_salary, employee_id),
-        )
+    justification = input("Enter justification for this change: ").strip() or None
 
-        conn.commit()
-        cur.close()
+    old = apply_and_report(username, role, employee_id, {"salary": new_salary}, justification,
+                           current["version"])
+    if old is None:
+        return
 
-    print(f"[green]Updated salary for employee {employee_id}: {old_salary} -> {new_salary}[/green]")
+    print(f"[green]Updated salary for employee {employee_id}: {old['salary']} -> {new_salary}[/green]")
 
 """ Update employee name"""
 def update_name():
-    username = input("Enter your username (for audit log): ").strip()
-    role = select_authorized_role()
-    if role is None:
-        print("[red]Update cancelled due to invalid role selection.[/red]")
+    editor = select_editor()
+    if editor is None:
         return
+    username, role = editor
 
-    # Validate that the username has the selected role
-    with get_conn() as conn:
-        cur = conn.cursor()
-        if not validate_user_role(cur, username, role):
-            print(f"[red]Authorization failed: User '{username}' does not have the role '{role}'.[/red]")
-            cur.close()
-            return
-        cur.close()
-
-    try:
-        employee_id = int(input("Enter employee ID to update: ").strip())
-    except ValueError:
-        print("[red]Invalid number entered.[/red]")
+    selected = select_employee()
+    if selected is None:
         return
+    employee_id, current = selected
 
     new_name = input("Enter new full name: ").strip()
     if not new_name:
@@ -252,60 +324,24 @@ def update_name():
 
     justification = input("Enter justification for this change: ").strip() or None
 
-    with get_conn() as conn:
-        cur = conn.cursor()
-
-        # Set session identity for trigger
-        set_app_identity(cur, username, role, justification)
-
-        # Show old name first
-        cur.execute("SELECT full_name FROM employees WHERE employee_id = %s;", (employee_id,))
-        row = cur.fetchone()
-        if not row:
-            print(f"[red]Employee with ID {employee_id} not found.[/red]")
-            cur.close()
-            return
-
-        old_name = row[0]
-        print(f"Old name: {old_name}")
-
-        # Perform the update (trigger will log to audit_log)
-        cur.execute(
-            """
-            UPDATE employees
-            SET full_name = %s
-            WHERE employee_id = %s;
-            """,
-            (new_name, employee_id),
-        )
-
-        conn.commit()
-        cur.close()
+    old = apply_and_report(username, role, employee_id, {"full_name": new_name}, justification,
+                           current["version"])
+    if old is None:
+        return
 
-    print(f"[green]Updated name for employee {employee_id}: {old_name} -> {new_name}[/green]")
+    print(f"[green]Updated name for employee {employee_id}: {old['full_name']} -> {new_name}[/green]")
 
 """ Update employee department and role """
 def update_department():
-    username = input("Enter your username (for audit log): ").strip()
-    auth_role = select_authorized_role()
-    if auth_role is None:
-        print("[red]Update cancelled due to invalid role selection.[/red]")
+    editor = select_editor()
+    if editor is None:
         return
+    username, auth_role = editor
 
-    # Validate that the username has the selected role
-    with get_conn() as conn:
-        cur = conn.cursor()
-        if not validate_user_role(cur, username, auth_role):
-            print(f"[red]Authorization failed: User '{username}' does not have the role '{auth_role}'.[/red]")
-            cur.close()
-            return
-        cur.close()
-
-    try:
-        employee_id = int(input("Enter employee ID to update: ").strip())
-    except ValueError:
-        print("[red]Invalid number entered.[/red]")
+    selected = select_employee()
+    if selected is None:
         return
+    employee_id, current = selected
 
     # Select new department from list
     new_department = select_department()
@@ -321,73 +357,34 @@ def update_department():
 
     justification = input("Enter justification for this change: ").strip() or None
 
-    with get_conn() as conn:
-        cur = conn.cursor()
-
-        # Set session identity for trigger
-        set_app_identity(cur, username, auth_role, justification)
-
-        # Show old department and role first
-        cur.execute("SELECT department, role FROM employees WHERE employee_id = %s;", (employee_id,))
-        row = cur.fetchone()
-        if not row:
-            print(f"[red]Employee with ID {employee_id} not found.[/red]")
-            cur.close()
-            return
-
-        old_department = row[0]
-        old_role = row[1]
-        print(f"Old department: {old_department}, Old role: {old_role}")
-
-        # Perform the update (trigger will log both changes to audit_log)
-        cur.execute(
-            """
-            UPDATE employees
-            SET department = %s, role = %s
-            WHERE employee_id = %s;
-            """,
-            (new_department, new_role, employee_id),
-        )
-
-        conn.commit()
-        cur.close()
+    # Trigger will log both changes to audit_log
+    old = apply_and_report(username, auth_role, employee_id,
+                           {"department": new_department, "role": new_role}, justification,
+                           current["version"])
+    if old is None:
+        return
 
     print(f"[green]Updated employee {employee_id}:[/green]")
-    print(f"  Department: {old_department} -> {new_department}")
-    print(f"  Role: {old_role} -> {new_role}")
+    print(f"  Department: {old['department']} -> {new_department}")
+    print(f"  Role: {old['role']} -> {new_role}")
 
 """ Update employee role """
 def update_role():
-    username = input("Enter your username (for audit log): ").strip()
-    role = select_authorized_role()
-    if role is None:
-        print("[red]Update cancelled due to invalid role selection.[/red]")
+    editor = select_editor()
+    if editor is None:
         return
+    username, role = editor
 
-    # Validate that the username has the selected role
-    with get_conn() as conn:
-        cur = conn.cursor()
-        if not validate_user_role(cur, username, role):
-            print(f"[red]Authorization failed: User '{username}' does not have the role '{role}'.[/red]")
-            cur.close()
-            return
-        cur.close()
-
-    try:
-        employee_id = int(input("Enter employee ID to update: ").strip())
-    except ValueError:
-        print("[red]Invalid number entered.[/red]")
+    selected = select_employee()
+    if selected is None:
         return
+    employee_id, current = selected
 
     # Show available roles by department
     print("\n[bold cyan]Available Roles by Department:[/bold cyan]")
-    print("[bold]HR:[/bold] HR Manager, Payroll Specialist, Benefits Specialist, Recruiter")
-    print("[bold]Accounting:[/bold] CFO, Staff Accountant, Financial Analyst, Auditor")
-    print("[bold]IT:[/bold] CIO, Software Engineer, System Administrator, Helpdesk II, Helpdesk I")
-    print("[bold]Sales:[/bold] Sales Manager, Sales Associate II, Sales Associate I")
-    print("[bold]Marketing:[/bold] Marketing Manager, Advertising Specialist, Social Media Specialist")
-    print("[bold]Legal:[/bold] CLO, Senior Legal Counsel, IP Lawyer, Employment Lawyer")
-    print("[bold]Customer Service:[/bold] Customer Service Manager, CSR I, CSR II\n")
+    for department, roles in get_reference_data().roles_by_department().items():
+        print(f"[bold]{department}:[/bold] {', '.join(roles)}")
+    print()
 
     new_role = input("Enter new role: ").strip()
     if not new_role:
@@ -396,39 +393,38 @@ def update_role():
 
     justification = input("Enter justification for this change: ").strip() or None
 
-    with get_conn() as conn:
-        cur = conn.cursor()
-
-        # Set session identity for trigger
-        set_app_identity(cur, username, role, justification)
+    old = apply_and_report(username, role, employee_id, {"role": new_role}, justification,
+                           current["version"])
+    if old is None:
+        return
 
-        # Show old role first
-        cur.execute("SELECT role, department FROM employees WHERE employee_id = %s;", (employee_id,))
-        row = cur.fetchone()
-        if not row:
-            print(f"[red]Employee with ID {employee_id} not found.[/red]")
-            cur.close()
-            return
+    print(f"[green]Updated role for employee {employee_id}: {old['role']} -> {new_role}[/green]")
 
-        old_role = row[0]
-        department = row[1]
-        print(f"Old role: {old_role}")
-        print(f"Department: {department}")
+"""
+    Lets the user pick a group from a summary table and loads only that group's rows,
+    or 'a' to list every change grouped the same way.
+"""
+def drill_down(summary_rows, noun, print_group, print_all):
+    if not summary_rows:
+        return
 
-        # Perform the update (trigger will log to audit_log)
-        cur.execute(
-            """
-            UPDATE employees
-            SET role = %s
-            WHERE employee_id = %s;
-            """,
-            (new_role, employee_id),
-        )
+    choice = input(f"\nEnter a number to see that {noun}'s changes, 'a' for all changes, or press Enter to go back: ").strip().lower()
+    if not choice:
+        return
+    if choice == "a":
+        print_all()
+        return
 
-        conn.commit()
-        cur.close()
+    try:
+        idx = int(choice)
+    except ValueError:
+        print("[red]Invalid input. Please enter a number.[/red]")
+        return
 
-    print(f"[green]Updated role for employee {employee_id}: {old_role} -> {new_role}[/green]")
+    if 1 <= idx <= len(summary_rows):
+        print_group(summary_rows[idx - 1]["group_key"])
+    else:
+        print("[red]Invalid selection. Please choose a number from the list.[/red]")
 
 
 def show_menu():
@@ -445,15 +441,17 @@ def show_menu():
     print("  9) Show role changes in the last month")
     print("  10) Show all changes in a date range")
     print("  11) Trace field history")
-    print("  12) Show all changes organized by user")
-    print("  13) Show all changes organized by role")
-    print("  14) Exit")
+    print("  12) Show changes summarized by user")
+    print("  13) Show changes summarized by role")
+    print("  14) Show employees as of a point in time")
+    print("  15) Show full monthly report")
+    print("  16) Exit")
 
 
 def main():
     while True:
         show_menu()
-        choice = input("Choose an option (1-14): ").strip()
+        choice = input("Choose an option (1-16): ").strip()
 
         if choice == "1":
             list_employees()
@@ -466,13 +464,13 @@ def main():
         elif choice == "5":
             update_role()
         elif choice == "6":
-            print_salary_changes_last_month()
+            audit.print_salary_changes_last_month()
         elif choice == "7":
-            print_name_changes_last_month()
+            audit.print_name_changes_last_month()
         elif choice == "8":
-            print_department_changes_last_month()
+            audit.print_department_changes_last_month()
         elif choice == "9":
-            print_role_changes_last_month()
+            audit.print_role_changes_last_month()
         elif choice == "10":
             start_input = input("Enter start timestamp (MM-DD-YYYY HH:MM): ").strip()
             start_ts = parse_timestamp(start_input)
@@ -486,7 +484,7 @@ def main():
                 print("[red]Invalid end timestamp format. Please use MM-DD-YYYY HH:MM[/red]")
                 continue
 
-            print_changes_in_range(start_ts, end_ts)
+            audit.print_changes_in_range(start_ts, end_ts)
         elif choice == "11":
             try:
                 employee_id = int(input("Enter employee ID: ").strip())
@@ -496,24 +494,42 @@ def main():
                 trace_choice = input("\nEnter your choice (1-2): ").strip()
 
                 if trace_choice == "1":
-                    print_all_changes_for_employee(employee_id)
+                    audit.print_all_changes_for_employee(employee_id)
                 elif trace_choice == "2":
                     print("Field options: salary, full_name, department, role")
                     field_name = input("Enter field name: ").strip()
-                    print_field_history(employee_id, field_name)
+                    audit.print_field_history(employee_id, field_name)
                 else:
                     print("[red]Invalid option. Please enter 1 or 2.[/red]")
             except ValueError:
                 print("[red]Invalid employee ID.[/red]")
         elif choice == "12":
-            print_all_changes_by_user()
+            drill_down(audit.print_change_summary_by_user(), "user",
+                       audit.print_changes_by_user, audit.print_all_changes_by_user)
         elif choice == "13":
-            print_all_changes_by_role()
+            drill_down(audit.print_change_summary_by_role(), "role",
+                       audit.print_changes_by_role, audit.print_all_changes_by_role)
         elif choice == "14":
+            ts_input = input("Enter timestamp (MM-DD-YYYY HH:MM): ").strip()
+            ts = parse_timestamp(ts_input)
+            if ts is None:
+                print("[red]Invalid timestamp format. Please use MM-DD-YYYY HH:MM[/red]")
+                continue
+
+            employee_input = input("Enter employee ID (or press Enter for all employees): ").strip()
+            if not employee_input:
+                snapshot.print_as_of(ts)
+            elif employee_input.isdigit():
+                snapshot.print_as_of(ts, int(employee_input))
+            else:
+                print("[red]Invalid employee ID.[/red]")
+        elif choice == "15":
+            audit.print_full_monthly_report()
+        elif choice == "16":
             print("[bold green]Goodbye![/bold green]")
             break
         else:
-            print("[red]Invalid option. Please enter 1-14.[/red]")
+            print("[red]Invalid option. Please enter 1-16.[/red]")
 
 
 if __name__ == "__main__":
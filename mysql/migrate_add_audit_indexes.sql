@@ -0,0 +1,27 @@
+-- Adds the indexes audit.py relies on to an existing audit_log table.
+-- New databases created from schema.sql already have them.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_add_audit_indexes.sql
+--     python verify_indexes.py
+USE dataprovenance_db;
+
+-- Last-month reports: WHERE table_name = ? AND column_name = ? AND changed_at >= ?
+-- ORDER BY changed_at DESC. The trailing row_id/changed_by/changed_role make the
+-- index covering for everything except the TEXT columns (old/new value,
+-- justification), which InnoDB cannot store in a secondary index.
+ALTER TABLE audit_log
+    ADD INDEX idx_audit_column_time (table_name, column_name, changed_at, row_id, changed_by, changed_role),
+
+-- Field history and per-employee history: WHERE table_name = ? AND row_id = ? [AND column_name = ?]
+-- ORDER BY changed_at
+    ADD INDEX idx_audit_row_time (table_name, row_id, changed_at),
+
+-- Changes by user / organized by user: WHERE changed_by = ? ORDER BY changed_at DESC
+    ADD INDEX idx_audit_user_time (changed_by, changed_at DESC),
+
+-- Changes by role / organized by role: WHERE changed_role = ? ORDER BY changed_at DESC
+    ADD INDEX idx_audit_role_time (changed_role, changed_at DESC),
+
+-- Date range report: WHERE changed_at BETWEEN ? AND ? ORDER BY changed_at
+    ADD INDEX idx_audit_changed_at (changed_at);
@@ -0,0 +1,23 @@
+-- Adds the checkpoint tables used by snapshot.py for as-of queries.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_add_checkpoints.sql
+--     python snapshot.py --min-changes 0
+USE dataprovenance_db;
+
+CREATE TABLE IF NOT EXISTS employee_checkpoints (
+    checkpoint_id INT AUTO_INCREMENT PRIMARY KEY,
+    taken_at      TIMESTAMP NOT NULL,
+    last_audit_id INT NOT NULL,
+    INDEX idx_checkpoint_taken_at (taken_at)
+);
+
+CREATE TABLE IF NOT EXISTS employee_checkpoint_rows (
+    checkpoint_id INT NOT NULL,
+    employee_id   INT NOT NULL,
+    full_name     VARCHAR(255) NOT NULL,
+    department    VARCHAR(100) NOT NULL,
+    role          VARCHAR(100) NULL,
+    salary        DECIMAL(12,2) NOT NULL,
+    PRIMARY KEY (checkpoint_id, employee_id)
+);
@@ -0,0 +1,37 @@
+-- Moves hash chaining out of the audited write. trg_audit_log_chain locked
+-- audit_chain_head for every audit insert, which serialized all audited writes and
+-- could deadlock with the joined UPDATE in batch_update.py. Rows are now chained after
+-- they commit by `python chain.py seal`, in chain_seq order, and only the sealer locks
+-- the chain head. The existing chain is rebuilt from genesis, so delete the old
+-- audit_chain.checkpoint (chain.py ignores checkpoints without a chain_seq).
+--
+-- Usage (after migrate_typed_audit_values.sql, which reinstalls the trigger):
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_async_chain_sealing.sql
+--     python chain.py seal
+--     python chain.py verify --full
+-- and keep `python chain.py seal --follow` running alongside the application.
+USE dataprovenance_db;
+
+DROP TRIGGER IF EXISTS trg_audit_log_chain;
+
+-- The archive and exchange tables must keep the same columns as audit_log for
+-- EXCHANGE PARTITION and the INSERT ... SELECT * in partitions.py
+ALTER TABLE audit_log
+    ADD COLUMN chain_seq BIGINT NULL AFTER row_hash,
+    ADD INDEX idx_audit_chain_seq (chain_seq);
+ALTER TABLE audit_log_archive
+    ADD COLUMN chain_seq BIGINT NULL AFTER row_hash,
+    ADD INDEX idx_audit_chain_seq (chain_seq);
+ALTER TABLE audit_log_exchange
+    ADD COLUMN chain_seq BIGINT NULL AFTER row_hash,
+    ADD INDEX idx_audit_chain_seq (chain_seq);
+
+-- SELECT * in a view is expanded when the view is created
+CREATE OR REPLACE VIEW audit_log_all AS
+    SELECT * FROM audit_log
+    UNION ALL
+    SELECT * FROM audit_log_archive;
+
+ALTER TABLE audit_chain_head
+    ADD COLUMN last_seq BIGINT NOT NULL DEFAULT 0;
+UPDATE audit_chain_head SET last_hash = REPEAT('0', 64), last_seq = 0 WHERE id = 1;
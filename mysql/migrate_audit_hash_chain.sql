@@ -0,0 +1,71 @@
+-- Adds the tamper-evident hash chain to audit_log: prev_hash/row_hash columns on the
+-- audit tables, the audit_chain_head table and trg_audit_log_chain. Rows written
+-- before this migration are chained by `python chain.py seal`, which should run
+-- before the application writes again. migrate_async_chain_sealing.sql later replaces
+-- the trigger with the sealer in chain.py; run it after this one.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_audit_hash_chain.sql
+--     python chain.py seal
+--     python chain.py verify
+USE dataprovenance_db;
+
+-- The archive and exchange tables must keep the same columns as audit_log for
+-- EXCHANGE PARTITION and the INSERT ... SELECT * in partitions.py
+ALTER TABLE audit_log
+    ADD COLUMN prev_hash CHAR(64) NULL,
+    ADD COLUMN row_hash  CHAR(64) NULL;
+ALTER TABLE audit_log_archive
+    ADD COLUMN prev_hash CHAR(64) NULL,
+    ADD COLUMN row_hash  CHAR(64) NULL;
+ALTER TABLE audit_log_exchange
+    ADD COLUMN prev_hash CHAR(64) NULL,
+    ADD COLUMN row_hash  CHAR(64) NULL;
+
+-- SELECT * in a view is expanded when the view is created
+CREATE OR REPLACE VIEW audit_log_all AS
+    SELECT * FROM audit_log
+    UNION ALL
+    SELECT * FROM audit_log_archive;
+
+-- Newest row_hash in the audit chain. trg_audit_log_chain locks this row for every
+-- audit insert, which keeps audit_id order and chain order the same.
+CREATE TABLE IF NOT EXISTS audit_chain_head (
+    id        TINYINT PRIMARY KEY CHECK (id = 1),
+    last_hash CHAR(64) NOT NULL
+);
+INSERT IGNORE INTO audit_chain_head (id, last_hash) VALUES (1, REPEAT('0', 64));
+
+DELIMITER $$
+
+-- Chains every audit row to the one before it. The hash input is each value
+-- length-prefixed ('~' for NULL) so values cannot be shifted between columns, and
+-- changed_at is hashed as a Unix timestamp so the session time zone does not matter.
+DROP TRIGGER IF EXISTS trg_audit_log_chain$$
+
+CREATE TRIGGER trg_audit_log_chain
+BEFORE INSERT ON audit_log
+FOR EACH ROW
+BEGIN
+    DECLARE v_prev_hash CHAR(64);
+
+    SELECT last_hash INTO v_prev_hash FROM audit_chain_head WHERE id = 1 FOR UPDATE;
+
+    SET NEW.prev_hash = v_prev_hash;
+    SET NEW.row_hash = SHA2(CONCAT(
+        v_prev_hash,
+        CONCAT(LENGTH(NEW.table_name), ':', NEW.table_name),
+        CONCAT(LENGTH(NEW.row_id), ':', NEW.row_id),
+        CONCAT(LENGTH(NEW.column_name), ':', NEW.column_name),
+        IF(NEW.old_value IS NULL, '~', CONCAT(LENGTH(NEW.old_value), ':', NEW.old_value)),
+        IF(NEW.new_value IS NULL, '~', CONCAT(LENGTH(NEW.new_value), ':', NEW.new_value)),
+        CONCAT(LENGTH(NEW.changed_by), ':', NEW.changed_by),
+        IF(NEW.changed_role IS NULL, '~', CONCAT(LENGTH(NEW.changed_role), ':', NEW.changed_role)),
+        IF(NEW.justification IS NULL, '~', CONCAT(LENGTH(NEW.justification), ':', NEW.justification)),
+        CONCAT(LENGTH(UNIX_TIMESTAMP(NEW.changed_at)), ':', UNIX_TIMESTAMP(NEW.changed_at))
+    ), 256);
+
+    UPDATE audit_chain_head SET last_hash = NEW.row_hash WHERE id = 1;
+END$$
+
+DELIMITER ;
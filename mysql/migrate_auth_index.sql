@@ -0,0 +1,10 @@
+-- Backs the authorization check (full_name = ? AND role = ?) run by
+-- database.validate_user_role() and the update_employee procedure with an index
+-- lookup instead of a scan of employees.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_auth_index.sql
+USE dataprovenance_db;
+
+ALTER TABLE employees
+    ADD INDEX idx_employees_name_role (full_name, role);
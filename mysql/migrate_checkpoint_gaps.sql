@@ -0,0 +1,15 @@
+-- Adds employee_checkpoint_gaps, the audit ids each checkpoint could not see yet.
+-- Checkpoints taken before this migration have no recorded gaps; take a fresh one.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_checkpoint_gaps.sql
+--     python snapshot.py --min-changes 0
+USE dataprovenance_db;
+
+-- Audit ids below a checkpoint's last_audit_id whose transaction had not committed
+-- when it was taken, so the copy does not reflect them (or rolled back for good)
+CREATE TABLE IF NOT EXISTS employee_checkpoint_gaps (
+    checkpoint_id INT NOT NULL,
+    audit_id      INT NOT NULL,
+    PRIMARY KEY (checkpoint_id, audit_id)
+);
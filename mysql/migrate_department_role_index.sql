@@ -0,0 +1,9 @@
+-- Lets reference_data.py read every (department, role) pair with one pass over a
+-- small index instead of a scan of employees when its cache is (re)loaded.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_department_role_index.sql
+USE dataprovenance_db;
+
+ALTER TABLE employees
+    ADD INDEX idx_employees_department_role (department, role);
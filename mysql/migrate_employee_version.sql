@@ -0,0 +1,160 @@
+-- Adds employees.version for optimistic concurrency: trg_employees_audit bumps it on
+-- every audited change and update_employee refuses a change made against an older
+-- version than the row has now.
+--
+-- Usage (after migrate_update_procedure.sql):
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_employee_version.sql
+USE dataprovenance_db;
+
+ALTER TABLE employees
+    ADD COLUMN version INT NOT NULL DEFAULT 0 AFTER last_updated;
+
+DELIMITER $$
+
+DROP TRIGGER IF EXISTS trg_employees_audit$$
+
+CREATE TRIGGER trg_employees_audit
+BEFORE UPDATE ON employees
+FOR EACH ROW
+BEGIN
+    -- Resolve the editor once per row instead of once per changed column
+    DECLARE v_changed_by VARCHAR(255) DEFAULT COALESCE(@app_current_user, CURRENT_USER());
+
+    -- Log every changed sensitive field (salary, full_name, department, role)
+    -- with a single INSERT ... SELECT
+    IF NOT (NEW.salary <=> OLD.salary)
+       OR NOT (NEW.full_name <=> OLD.full_name)
+       OR NOT (NEW.department <=> OLD.department)
+       OR NOT (NEW.role <=> OLD.role) THEN
+        -- Optimistic concurrency: editors pass the version they read to update_employee
+        SET NEW.version = OLD.version + 1;
+
+        INSERT INTO audit_log (
+            table_name,
+            row_id,
+            column_name,
+            old_value,
+            new_value,
+            old_amount,
+            new_amount,
+            changed_by,
+            changed_role,
+            justification,
+            changed_at
+        )
+        SELECT
+            'employees',
+            OLD.employee_id,
+            c.column_name,
+            c.old_value,
+            c.new_value,
+            c.old_amount,
+            c.new_amount,
+            v_changed_by,
+            @app_current_role,
+            @app_justification,
+            NOW()
+        FROM (
+            SELECT 'salary' AS column_name,
+                   CAST(NULL AS CHAR(255)) AS old_value,
+                   CAST(NULL AS CHAR(255)) AS new_value,
+                   OLD.salary AS old_amount,
+                   NEW.salary AS new_amount,
+                   NOT (NEW.salary <=> OLD.salary) AS is_changed
+            UNION ALL
+            SELECT 'full_name', OLD.full_name, NEW.full_name, NULL, NULL,
+                   NOT (NEW.full_name <=> OLD.full_name)
+            UNION ALL
+            SELECT 'department', OLD.department, NEW.department, NULL, NULL,
+                   NOT (NEW.department <=> OLD.department)
+            UNION ALL
+            SELECT 'role', OLD.role, NEW.role, NULL, NULL,
+                   NOT (NEW.role <=> OLD.role)
+        ) AS c
+        WHERE c.is_changed;
+    END IF;
+END$$
+
+-- Applies one employee change in a single call: checks that p_username holds
+-- p_auth_role, sets the identity the audit trigger reads, locks and reads the old
+-- values, updates and commits. NULL arguments leave that column unchanged.
+-- With p_expected_version set, nothing is changed unless the row still has that
+-- version (the one the editor read), so an editor never overwrites a change they
+-- have not seen.
+-- Returns one row: status ('ok', 'unauthorized', 'not_found' or 'conflict'), and
+-- old_*/new_* values and versions. On a conflict old_* are the current values.
+DROP PROCEDURE IF EXISTS update_employee$$
+
+CREATE PROCEDURE update_employee(
+    IN p_username         VARCHAR(255),
+    IN p_auth_role        VARCHAR(100),
+    IN p_employee_id      INT,
+    IN p_expected_version INT,
+    IN p_salary           DECIMAL(12,2),
+    IN p_full_name        VARCHAR(255),
+    IN p_department       VARCHAR(100),
+    IN p_role             VARCHAR(100),
+    IN p_justification    TEXT
+)
+BEGIN
+    DECLARE v_status      VARCHAR(16) DEFAULT 'ok';
+    DECLARE v_salary      DECIMAL(12,2);
+    DECLARE v_full_name   VARCHAR(255);
+    DECLARE v_department  VARCHAR(100);
+    DECLARE v_role        VARCHAR(100);
+    DECLARE v_version     INT;
+    DECLARE v_new_version INT;
+
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_status = 'not_found';
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET @app_current_user = NULL, @app_current_role = NULL, @app_justification = NULL;
+        RESIGNAL;
+    END;
+
+    IF NOT EXISTS (SELECT 1 FROM employees WHERE full_name = p_username AND role = p_auth_role) THEN
+        SET v_status = 'unauthorized';
+    ELSE
+        START TRANSACTION;
+        SELECT salary, full_name, department, role, version
+          INTO v_salary, v_full_name, v_department, v_role, v_version
+          FROM employees
+         WHERE employee_id = p_employee_id
+           FOR UPDATE;
+
+        IF v_status = 'not_found' THEN
+            ROLLBACK;
+        ELSEIF p_expected_version IS NOT NULL AND v_version <> p_expected_version THEN
+            SET v_status = 'conflict';
+            ROLLBACK;
+        ELSE
+            SET @app_current_user = p_username,
+                @app_current_role = p_auth_role,
+                @app_justification = p_justification;
+            UPDATE employees
+            SET salary     = COALESCE(p_salary, salary),
+                full_name  = COALESCE(p_full_name, full_name),
+                department = COALESCE(p_department, department),
+                role       = COALESCE(p_role, role)
+            WHERE employee_id = p_employee_id;
+            SELECT version INTO v_new_version FROM employees WHERE employee_id = p_employee_id;
+            COMMIT;
+            SET @app_current_user = NULL, @app_current_role = NULL, @app_justification = NULL;
+        END IF;
+    END IF;
+
+    SELECT v_status                             AS status,
+           v_salary                             AS old_salary,
+           v_full_name                          AS old_full_name,
+           v_department                         AS old_department,
+           v_role                               AS old_role,
+           COALESCE(p_salary, v_salary)         AS new_salary,
+           COALESCE(p_full_name, v_full_name)   AS new_full_name,
+           COALESCE(p_department, v_department) AS new_department,
+           COALESCE(p_role, v_role)             AS new_role,
+           v_version                            AS old_version,
+           COALESCE(v_new_version, v_version)   AS new_version;
+END$$
+
+DELIMITER ;
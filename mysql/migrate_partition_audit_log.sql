@@ -0,0 +1,29 @@
+-- Converts an existing audit_log into the monthly-partitioned layout and creates
+-- the archive tables and audit_log_all view. Run once, then run partitions.py to
+-- create the monthly partitions.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_partition_audit_log.sql
+--     python partitions.py
+USE dataprovenance_db;
+
+-- Every unique key on a partitioned table must include the partitioning column
+ALTER TABLE audit_log
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (audit_id, changed_at);
+
+ALTER TABLE audit_log
+    PARTITION BY RANGE (UNIX_TIMESTAMP(changed_at)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+
+CREATE TABLE IF NOT EXISTS audit_log_archive LIKE audit_log;
+ALTER TABLE audit_log_archive REMOVE PARTITIONING;
+
+CREATE TABLE IF NOT EXISTS audit_log_exchange LIKE audit_log;
+ALTER TABLE audit_log_exchange REMOVE PARTITIONING;
+
+CREATE OR REPLACE VIEW audit_log_all AS
+    SELECT * FROM audit_log
+    UNION ALL
+    SELECT * FROM audit_log_archive;
@@ -0,0 +1,64 @@
+-- Replaces trg_employees_audit with the single INSERT version from schema.sql.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_single_insert_trigger.sql
+USE dataprovenance_db;
+
+DELIMITER $$
+
+DROP TRIGGER IF EXISTS trg_employees_audit$$
+
+CREATE TRIGGER trg_employees_audit
+BEFORE UPDATE ON employees
+FOR EACH ROW
+BEGIN
+    -- Resolve the editor once per row instead of once per changed column
+    DECLARE v_changed_by VARCHAR(255) DEFAULT COALESCE(@app_current_user, CURRENT_USER());
+
+    -- Log every changed sensitive field (salary, full_name, department, role)
+    -- with a single INSERT ... SELECT
+    IF NOT (NEW.salary <=> OLD.salary)
+       OR NOT (NEW.full_name <=> OLD.full_name)
+       OR NOT (NEW.department <=> OLD.department)
+       OR NOT (NEW.role <=> OLD.role) THEN
+        INSERT INTO audit_log (
+            table_name,
+            row_id,
+            column_name,
+            old_value,
+            new_value,
+            changed_by,
+            changed_role,
+            justification,
+            changed_at
+        )
+        SELECT
+            'employees',
+            OLD.employee_id,
+            c.column_name,
+            c.old_value,
+            c.new_value,
+            v_changed_by,
+            @app_current_role,
+            @app_justification,
+            NOW()
+        FROM (
+            SELECT 'salary' AS column_name,
+                   CAST(OLD.salary AS CHAR) AS old_value,
+                   CAST(NEW.salary AS CHAR) AS new_value,
+                   NOT (NEW.salary <=> OLD.salary) AS is_changed
+            UNION ALL
+            SELECT 'full_name', OLD.full_name, NEW.full_name,
+                   NOT (NEW.full_name <=> OLD.full_name)
+            UNION ALL
+            SELECT 'department', OLD.department, NEW.department,
+                   NOT (NEW.department <=> OLD.department)
+            UNION ALL
+            SELECT 'role', OLD.role, NEW.role,
+                   NOT (NEW.role <=> OLD.role)
+        ) AS c
+        WHERE c.is_changed;
+    END IF;
+END$$
+
+DELIMITER ;
@@ -0,0 +1,27 @@
+-- Extends the user and role indexes with column_name so the per-user and per-role
+-- summaries in audit.py (GROUP BY changed_by / changed_role with a per-field
+-- breakdown) are answered from the index alone. The leading columns are unchanged,
+-- so the changes-by-user and changes-by-role reports still use them.
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_summary_indexes.sql
+USE dataprovenance_db;
+
+ALTER TABLE audit_log
+    DROP INDEX idx_audit_user_time,
+    ADD INDEX idx_audit_user_time (changed_by, changed_at DESC, column_name),
+    DROP INDEX idx_audit_role_time,
+    ADD INDEX idx_audit_role_time (changed_role, changed_at DESC, column_name);
+
+ALTER TABLE audit_log_archive
+    DROP INDEX idx_audit_user_time,
+    ADD INDEX idx_audit_user_time (changed_by, changed_at DESC, column_name),
+    DROP INDEX idx_audit_role_time,
+    ADD INDEX idx_audit_role_time (changed_role, changed_at DESC, column_name);
+
+-- The exchange table has to match audit_log exactly for EXCHANGE PARTITION
+ALTER TABLE audit_log_exchange
+    DROP INDEX idx_audit_user_time,
+    ADD INDEX idx_audit_user_time (changed_by, changed_at DESC, column_name),
+    DROP INDEX idx_audit_role_time,
+    ADD INDEX idx_audit_role_time (changed_role, changed_at DESC, column_name);
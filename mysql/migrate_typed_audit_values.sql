@@ -0,0 +1,163 @@
+-- Stores audit values by type: salary changes move to DECIMAL old_amount/new_amount
+-- columns, and old_value/new_value become VARCHAR(255) for names, departments and
+-- roles. Adds the generated change_pct column with an index for queries like
+-- "raises over 10%", and replaces both triggers to write the new columns.
+-- Salary amounts are hashed as the same text as before, so the audit chain still verifies.
+--
+-- Usage (after migrate_audit_hash_chain.sql):
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_typed_audit_values.sql
+--     python chain.py verify --full
+USE dataprovenance_db;
+
+-- The archive and exchange tables must match audit_log for EXCHANGE PARTITION
+ALTER TABLE audit_log
+    ADD COLUMN old_amount DECIMAL(12,2) NULL AFTER new_value,
+    ADD COLUMN new_amount DECIMAL(12,2) NULL AFTER old_amount,
+    ADD COLUMN change_pct DECIMAL(9,2) AS (ROUND((new_amount - old_amount) * 100 / NULLIF(old_amount, 0), 2)) VIRTUAL,
+    ADD INDEX idx_audit_change_pct (change_pct, changed_at);
+ALTER TABLE audit_log_archive
+    ADD COLUMN old_amount DECIMAL(12,2) NULL AFTER new_value,
+    ADD COLUMN new_amount DECIMAL(12,2) NULL AFTER old_amount,
+    ADD COLUMN change_pct DECIMAL(9,2) AS (ROUND((new_amount - old_amount) * 100 / NULLIF(old_amount, 0), 2)) VIRTUAL,
+    ADD INDEX idx_audit_change_pct (change_pct, changed_at);
+ALTER TABLE audit_log_exchange
+    ADD COLUMN old_amount DECIMAL(12,2) NULL AFTER new_value,
+    ADD COLUMN new_amount DECIMAL(12,2) NULL AFTER old_amount,
+    ADD COLUMN change_pct DECIMAL(9,2) AS (ROUND((new_amount - old_amount) * 100 / NULLIF(old_amount, 0), 2)) VIRTUAL,
+    ADD INDEX idx_audit_change_pct (change_pct, changed_at);
+
+UPDATE audit_log
+SET old_amount = CAST(old_value AS DECIMAL(12,2)),
+    new_amount = CAST(new_value AS DECIMAL(12,2)),
+    old_value  = NULL,
+    new_value  = NULL
+WHERE column_name = 'salary';
+UPDATE audit_log_archive
+SET old_amount = CAST(old_value AS DECIMAL(12,2)),
+    new_amount = CAST(new_value AS DECIMAL(12,2)),
+    old_value  = NULL,
+    new_value  = NULL
+WHERE column_name = 'salary';
+UPDATE audit_log_exchange
+SET old_amount = CAST(old_value AS DECIMAL(12,2)),
+    new_amount = CAST(new_value AS DECIMAL(12,2)),
+    old_value  = NULL,
+    new_value  = NULL
+WHERE column_name = 'salary';
+
+ALTER TABLE audit_log
+    MODIFY old_value VARCHAR(255) NULL,
+    MODIFY new_value VARCHAR(255) NULL;
+ALTER TABLE audit_log_archive
+    MODIFY old_value VARCHAR(255) NULL,
+    MODIFY new_value VARCHAR(255) NULL;
+ALTER TABLE audit_log_exchange
+    MODIFY old_value VARCHAR(255) NULL,
+    MODIFY new_value VARCHAR(255) NULL;
+
+-- SELECT * in a view is expanded when the view is created
+CREATE OR REPLACE VIEW audit_log_all AS
+    SELECT * FROM audit_log
+    UNION ALL
+    SELECT * FROM audit_log_archive;
+
+DELIMITER $$
+
+DROP TRIGGER IF EXISTS trg_employees_audit$$
+
+CREATE TRIGGER trg_employees_audit
+BEFORE UPDATE ON employees
+FOR EACH ROW
+BEGIN
+    -- Resolve the editor once per row instead of once per changed column
+    DECLARE v_changed_by VARCHAR(255) DEFAULT COALESCE(@app_current_user, CURRENT_USER());
+
+    -- Log every changed sensitive field (salary, full_name, department, role)
+    -- with a single INSERT ... SELECT
+    IF NOT (NEW.salary <=> OLD.salary)
+       OR NOT (NEW.full_name <=> OLD.full_name)
+       OR NOT (NEW.department <=> OLD.department)
+       OR NOT (NEW.role <=> OLD.role) THEN
+        INSERT INTO audit_log (
+            table_name,
+            row_id,
+            column_name,
+            old_value,
+            new_value,
+            old_amount,
+            new_amount,
+            changed_by,
+            changed_role,
+            justification,
+            changed_at
+        )
+        SELECT
+            'employees',
+            OLD.employee_id,
+            c.column_name,
+            c.old_value,
+            c.new_value,
+            c.old_amount,
+            c.new_amount,
+            v_changed_by,
+            @app_current_role,
+            @app_justification,
+            NOW()
+        FROM (
+            SELECT 'salary' AS column_name,
+                   CAST(NULL AS CHAR(255)) AS old_value,
+                   CAST(NULL AS CHAR(255)) AS new_value,
+                   OLD.salary AS old_amount,
+                   NEW.salary AS new_amount,
+                   NOT (NEW.salary <=> OLD.salary) AS is_changed
+            UNION ALL
+            SELECT 'full_name', OLD.full_name, NEW.full_name, NULL, NULL,
+                   NOT (NEW.full_name <=> OLD.full_name)
+            UNION ALL
+            SELECT 'department', OLD.department, NEW.department, NULL, NULL,
+                   NOT (NEW.department <=> OLD.department)
+            UNION ALL
+            SELECT 'role', OLD.role, NEW.role, NULL, NULL,
+                   NOT (NEW.role <=> OLD.role)
+        ) AS c
+        WHERE c.is_changed;
+    END IF;
+END$$
+
+-- Chains every audit row to the one before it. The hash input is each value
+-- length-prefixed ('~' for NULL) so values cannot be shifted between columns.
+-- changed_at is hashed as a Unix timestamp so the session time zone does not matter,
+-- and salary amounts as text, the way they were stored before they got DECIMAL columns.
+DROP TRIGGER IF EXISTS trg_audit_log_chain$$
+
+CREATE TRIGGER trg_audit_log_chain
+BEFORE INSERT ON audit_log
+FOR EACH ROW
+BEGIN
+    DECLARE v_prev_hash CHAR(64);
+    DECLARE v_old_value VARCHAR(255);
+    DECLARE v_new_value VARCHAR(255);
+
+    SET v_old_value = COALESCE(CAST(NEW.old_amount AS CHAR), NEW.old_value);
+    SET v_new_value = COALESCE(CAST(NEW.new_amount AS CHAR), NEW.new_value);
+
+    SELECT last_hash INTO v_prev_hash FROM audit_chain_head WHERE id = 1 FOR UPDATE;
+
+    SET NEW.prev_hash = v_prev_hash;
+    SET NEW.row_hash = SHA2(CONCAT(
+        v_prev_hash,
+        CONCAT(LENGTH(NEW.table_name), ':', NEW.table_name),
+        CONCAT(LENGTH(NEW.row_id), ':', NEW.row_id),
+        CONCAT(LENGTH(NEW.column_name), ':', NEW.column_name),
+        IF(v_old_value IS NULL, '~', CONCAT(LENGTH(v_old_value), ':', v_old_value)),
+        IF(v_new_value IS NULL, '~', CONCAT(LENGTH(v_new_value), ':', v_new_value)),
+        CONCAT(LENGTH(NEW.changed_by), ':', NEW.changed_by),
+        IF(NEW.changed_role IS NULL, '~', CONCAT(LENGTH(NEW.changed_role), ':', NEW.changed_role)),
+        IF(NEW.justification IS NULL, '~', CONCAT(LENGTH(NEW.justification), ':', NEW.justification)),
+        CONCAT(LENGTH(UNIX_TIMESTAMP(NEW.changed_at)), ':', UNIX_TIMESTAMP(NEW.changed_at))
+    ), 256);
+
+    UPDATE audit_chain_head SET last_hash = NEW.row_hash WHERE id = 1;
+END$$
+
+DELIMITER ;
@@ -0,0 +1,78 @@
+-- Adds the update_employee stored procedure used by main.apply_employee_change().
+--
+-- Usage:
+--     mysql -u admin -p dataprovenance_db < mysql/migrate_update_procedure.sql
+USE dataprovenance_db;
+
+DELIMITER $$
+
+-- Applies one employee change in a single call: checks that p_username holds
+-- p_auth_role, sets the identity the audit trigger reads, locks and reads the old
+-- values, updates and commits. NULL arguments leave that column unchanged.
+-- Returns one row: status ('ok', 'unauthorized' or 'not_found'), old_* and new_* values.
+DROP PROCEDURE IF EXISTS update_employee$$
+
+CREATE PROCEDURE update_employee(
+    IN p_username      VARCHAR(255),
+    IN p_auth_role     VARCHAR(100),
+    IN p_employee_id   INT,
+    IN p_salary        DECIMAL(12,2),
+    IN p_full_name     VARCHAR(255),
+    IN p_department    VARCHAR(100),
+    IN p_role          VARCHAR(100),
+    IN p_justification TEXT
+)
+BEGIN
+    DECLARE v_status     VARCHAR(16) DEFAULT 'ok';
+    DECLARE v_salary     DECIMAL(12,2);
+    DECLARE v_full_name  VARCHAR(255);
+    DECLARE v_department VARCHAR(100);
+    DECLARE v_role       VARCHAR(100);
+
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_status = 'not_found';
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET @app_current_user = NULL, @app_current_role = NULL, @app_justification = NULL;
+        RESIGNAL;
+    END;
+
+    IF NOT EXISTS (SELECT 1 FROM employees WHERE full_name = p_username AND role = p_auth_role) THEN
+        SET v_status = 'unauthorized';
+    ELSE
+        START TRANSACTION;
+        SELECT salary, full_name, department, role
+          INTO v_salary, v_full_name, v_department, v_role
+          FROM employees
+         WHERE employee_id = p_employee_id
+           FOR UPDATE;
+
+        IF v_status = 'not_found' THEN
+            ROLLBACK;
+        ELSE
+            SET @app_current_user = p_username,
+                @app_current_role = p_auth_role,
+                @app_justification = p_justification;
+            UPDATE employees
+            SET salary     = COALESCE(p_salary, salary),
+                full_name  = COALESCE(p_full_name, full_name),
+                department = COALESCE(p_department, department),
+                role       = COALESCE(p_role, role)
+            WHERE employee_id = p_employee_id;
+            COMMIT;
+            SET @app_current_user = NULL, @app_current_role = NULL, @app_justification = NULL;
+        END IF;
+    END IF;
+
+    SELECT v_status                             AS status,
+           v_salary                             AS old_salary,
+           v_full_name                          AS old_full_name,
+           v_department                         AS old_department,
+           v_role                               AS old_role,
+           COALESCE(p_salary, v_salary)         AS new_salary,
+           COALESCE(p_full_name, v_full_name)   AS new_full_name,
+           COALESCE(p_department, v_department) AS new_department,
+           COALESCE(p_role, v_role)             AS new_role;
+END$$
+
+DELIMITER ;
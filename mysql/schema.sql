@@ -3,7 +3,14 @@ CREATE DATABASE IF NOT EXISTS dataprovenance_db;
 USE dataprovenance_db;
 
 -- Main table: employees
+DROP TABLE IF EXISTS employee_checkpoint_gaps;
+DROP TABLE IF EXISTS employee_checkpoint_rows;
+DROP TABLE IF EXISTS employee_checkpoints;
+DROP VIEW IF EXISTS audit_log_all;
+DROP TABLE IF EXISTS audit_log_exchange;
+DROP TABLE IF EXISTS audit_log_archive;
 DROP TABLE IF EXISTS audit_log;
+DROP TABLE IF EXISTS audit_chain_head;
 DROP TABLE IF EXISTS employees;
 
 CREATE TABLE employees (
@@ -13,21 +20,98 @@ CREATE TABLE employees (
     role          VARCHAR(100) NULL,
     salary        DECIMAL(12,2) NOT NULL,
     last_updated  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-        ON UPDATE CURRENT_TIMESTAMP
+        ON UPDATE CURRENT_TIMESTAMP,
+    version       INT NOT NULL DEFAULT 0,  -- bumped by trg_employees_audit on every audited change
+    -- Serves SELECT DISTINCT department, role for the reference data cache from the index alone
+    INDEX idx_employees_department_role (department, role),
+    -- Authorization checks (full_name = ? AND role = ?) in validate_user_role and update_employee
+    INDEX idx_employees_name_role (full_name, role)
 );
 
--- Audit log table
+-- Audit log table, range-partitioned by month on changed_at.
+-- Partitioning requires changed_at in the primary key. partitions.py splits
+-- pmax into monthly partitions and moves old months to audit_log_archive.
 CREATE TABLE audit_log (
-    audit_id      INT AUTO_INCREMENT PRIMARY KEY,
+    audit_id      INT AUTO_INCREMENT,
     table_name    VARCHAR(64) NOT NULL,
     row_id        INT NOT NULL,            -- maps to employees.employee_id
     column_name   VARCHAR(64) NOT NULL,    -- ex: 'salary'
-    old_value     TEXT,
-    new_value     TEXT,
+    old_value     VARCHAR(255) NULL,       -- full_name, department and role changes
+    new_value     VARCHAR(255) NULL,
+    old_amount    DECIMAL(12,2) NULL,      -- salary changes (old_value/new_value stay NULL)
+    new_amount    DECIMAL(12,2) NULL,
     changed_by    VARCHAR(255) NOT NULL,   -- username
     changed_role  VARCHAR(255) NULL,       -- ex: 'HR_Manager'
     justification TEXT NULL,               -- reason for the change
-    changed_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    changed_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    prev_hash     CHAR(64) NULL,           -- row_hash of the audit row before this one
+    row_hash      CHAR(64) NULL,           -- SHA-256 over prev_hash and this row (see chain.py)
+    chain_seq     BIGINT NULL,             -- position in the chain; NULL until chain.py seals the row
+    change_pct    DECIMAL(9,2) AS (ROUND((new_amount - old_amount) * 100 / NULLIF(old_amount, 0), 2)) VIRTUAL,
+
+    -- Indexes matched to the queries in audit.py (see migrate_add_audit_indexes.sql)
+    INDEX idx_audit_column_time (table_name, column_name, changed_at, row_id, changed_by, changed_role),
+    INDEX idx_audit_row_time (table_name, row_id, changed_at),
+    INDEX idx_audit_user_time (changed_by, changed_at DESC, column_name),
+    INDEX idx_audit_role_time (changed_role, changed_at DESC, column_name),
+    INDEX idx_audit_changed_at (changed_at),
+    INDEX idx_audit_change_pct (change_pct, changed_at),
+    INDEX idx_audit_chain_seq (chain_seq),
+
+    PRIMARY KEY (audit_id, changed_at)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(changed_at)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Newest row_hash and chain_seq in the audit chain. Only the sealer in chain.py
+-- touches this row, after the audited writes have committed, so writers never wait on it.
+CREATE TABLE audit_chain_head (
+    id        TINYINT PRIMARY KEY CHECK (id = 1),
+    last_hash CHAR(64) NOT NULL,
+    last_seq  BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO audit_chain_head (id, last_hash, last_seq) VALUES (1, REPEAT('0', 64), 0);
+
+-- Months detached from audit_log by partitions.py end up here
+CREATE TABLE audit_log_archive LIKE audit_log;
+ALTER TABLE audit_log_archive REMOVE PARTITIONING;
+
+-- Empty staging table used by ALTER TABLE ... EXCHANGE PARTITION
+CREATE TABLE audit_log_exchange LIKE audit_log;
+ALTER TABLE audit_log_exchange REMOVE PARTITIONING;
+
+-- Live and archived audit rows together, for reports that reach into archived months
+CREATE VIEW audit_log_all AS
+    SELECT * FROM audit_log
+    UNION ALL
+    SELECT * FROM audit_log_archive;
+
+-- Materialized copies of employees used as starting points by snapshot.as_of().
+-- last_audit_id is the newest audit row already reflected in the copy.
+CREATE TABLE employee_checkpoints (
+    checkpoint_id INT AUTO_INCREMENT PRIMARY KEY,
+    taken_at      TIMESTAMP NOT NULL,
+    last_audit_id INT NOT NULL,
+    INDEX idx_checkpoint_taken_at (taken_at)
+);
+
+CREATE TABLE employee_checkpoint_rows (
+    checkpoint_id INT NOT NULL,
+    employee_id   INT NOT NULL,
+    full_name     VARCHAR(255) NOT NULL,
+    department    VARCHAR(100) NOT NULL,
+    role          VARCHAR(100) NULL,
+    salary        DECIMAL(12,2) NOT NULL,
+    PRIMARY KEY (checkpoint_id, employee_id)
+);
+
+-- Audit ids below a checkpoint's last_audit_id whose transaction had not committed
+-- when it was taken, so the copy does not reflect them (or rolled back for good)
+CREATE TABLE employee_checkpoint_gaps (
+    checkpoint_id INT NOT NULL,
+    audit_id      INT NOT NULL,
+    PRIMARY KEY (checkpoint_id, audit_id)
 );
 
 -- Trigger to log changes to sensitive fields on employees
@@ -39,105 +123,144 @@ CREATE TRIGGER trg_employees_audit
 BEFORE UPDATE ON employees
 FOR EACH ROW
 BEGIN
-    -- Log salary changes
-    IF NOT (NEW.salary <=> OLD.salary) THEN
-        INSERT INTO audit_log (
-            table_name,
-            row_id,
-            column_name,
-            old_value,
-            new_value,
-            changed_by,
-            changed_role,
-            justification,
-            changed_at
-        ) VALUES (
-            'employees',
-            OLD.employee_id,
-            'salary',
-            OLD.salary,
-            NEW.salary,
-            COALESCE(@app_current_user, CURRENT_USER()),
-            @app_current_role,
-            @app_justification,
-            NOW()
-        );
-    END IF;
+    -- Resolve the editor once per row instead of once per changed column
+    DECLARE v_changed_by VARCHAR(255) DEFAULT COALESCE(@app_current_user, CURRENT_USER());
 
-    -- Log name changes
-    IF NOT (NEW.full_name <=> OLD.full_name) THEN
-        INSERT INTO audit_log (
-            table_name,
-            row_id,
-            column_name,
-            old_value,
-            new_value,
-            changed_by,
-            changed_role,
-            justification,
-            changed_at
-        ) VALUES (
-            'employees',
-            OLD.employee_id,
-            'full_name',
-            OLD.full_name,
-            NEW.full_name,
-            COALESCE(@app_current_user, CURRENT_USER()),
-            @app_current_role,
-            @app_justification,
-            NOW()
-        );
-    END IF;
+    -- Log every changed sensitive field (salary, full_name, department, role)
+    -- with a single INSERT ... SELECT
+    IF NOT (NEW.salary <=> OLD.salary)
+       OR NOT (NEW.full_name <=> OLD.full_name)
+       OR NOT (NEW.department <=> OLD.department)
+       OR NOT (NEW.role <=> OLD.role) THEN
+        -- Optimistic concurrency: editors pass the version they read to update_employee
+        SET NEW.version = OLD.version + 1;
 
-    -- Log department changes
-    IF NOT (NEW.department <=> OLD.department) THEN
         INSERT INTO audit_log (
             table_name,
             row_id,
             column_name,
             old_value,
             new_value,
+            old_amount,
+            new_amount,
             changed_by,
             changed_role,
             justification,
             changed_at
-        ) VALUES (
+        )
+        SELECT
             'employees',
             OLD.employee_id,
-            'department',
-            OLD.department,
-            NEW.department,
-            COALESCE(@app_current_user, CURRENT_USER()),
+            c.column_name,
+            c.old_value,
+            c.new_value,
+            c.old_amount,
+            c.new_amount,
+            v_changed_by,
             @app_current_role,
             @app_justification,
             NOW()
-        );
+        FROM (
+            SELECT 'salary' AS column_name,
+                   CAST(NULL AS CHAR(255)) AS old_value,
+                   CAST(NULL AS CHAR(255)) AS new_value,
+                   OLD.salary AS old_amount,
+                   NEW.salary AS new_amount,
+                   NOT (NEW.salary <=> OLD.salary) AS is_changed
+            UNION ALL
+            SELECT 'full_name', OLD.full_name, NEW.full_name, NULL, NULL,
+                   NOT (NEW.full_name <=> OLD.full_name)
+            UNION ALL
+            SELECT 'department', OLD.department, NEW.department, NULL, NULL,
+                   NOT (NEW.department <=> OLD.department)
+            UNION ALL
+            SELECT 'role', OLD.role, NEW.role, NULL, NULL,
+                   NOT (NEW.role <=> OLD.role)
+        ) AS c
+        WHERE c.is_changed;
     END IF;
+END$$
 
-    -- Log role changes
-    IF NOT (NEW.role <=> OLD.role) THEN
-        INSERT INTO audit_log (
-            table_name,
-            row_id,
-            column_name,
-            old_value,
-            new_value,
-            changed_by,
-            changed_role,
-            justification,
-            changed_at
-        ) VALUES (
-            'employees',
-            OLD.employee_id,
-            'role',
-            OLD.role,
-            NEW.role,
-            COALESCE(@app_current_user, CURRENT_USER()),
-            @app_current_role,
-            @app_justification,
-            NOW()
-        );
+-- Applies one employee change in a single call: checks that p_username holds
+-- p_auth_role, sets the identity the audit trigger reads, locks and reads the old
+-- values, updates and commits. NULL arguments leave that column unchanged.
+-- With p_expected_version set, nothing is changed unless the row still has that
+-- version (the one the editor read), so an editor never overwrites a change they
+-- have not seen.
+-- Returns one row: status ('ok', 'unauthorized', 'not_found' or 'conflict'), and
+-- old_*/new_* values and versions. On a conflict old_* are the current values.
+DROP PROCEDURE IF EXISTS update_employee$$
+
+CREATE PROCEDURE update_employee(
+    IN p_username         VARCHAR(255),
+    IN p_auth_role        VARCHAR(100),
+    IN p_employee_id      INT,
+    IN p_expected_version INT,
+    IN p_salary           DECIMAL(12,2),
+    IN p_full_name        VARCHAR(255),
+    IN p_department       VARCHAR(100),
+    IN p_role             VARCHAR(100),
+    IN p_justification    TEXT
+)
+BEGIN
+    DECLARE v_status      VARCHAR(16) DEFAULT 'ok';
+    DECLARE v_salary      DECIMAL(12,2);
+    DECLARE v_full_name   VARCHAR(255);
+    DECLARE v_department  VARCHAR(100);
+    DECLARE v_role        VARCHAR(100);
+    DECLARE v_version     INT;
+    DECLARE v_new_version INT;
+
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_status = 'not_found';
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET @app_current_user = NULL, @app_current_role = NULL, @app_justification = NULL;
+        RESIGNAL;
+    END;
+
+    IF NOT EXISTS (SELECT 1 FROM employees WHERE full_name = p_username AND role = p_auth_role) THEN
+        SET v_status = 'unauthorized';
+    ELSE
+        START TRANSACTION;
+        SELECT salary, full_name, department, role, version
+          INTO v_salary, v_full_name, v_department, v_role, v_version
+          FROM employees
+         WHERE employee_id = p_employee_id
+           FOR UPDATE;
+
+        IF v_status = 'not_found' THEN
+            ROLLBACK;
+        ELSEIF p_expected_version IS NOT NULL AND v_version <> p_expected_version THEN
+            SET v_status = 'conflict';
+            ROLLBACK;
+        ELSE
+            SET @app_current_user = p_username,
+                @app_current_role = p_auth_role,
+                @app_justification = p_justification;
+            UPDATE employees
+            SET salary     = COALESCE(p_salary, salary),
+                full_name  = COALESCE(p_full_name, full_name),
+                department = COALESCE(p_department, department),
+                role       = COALESCE(p_role, role)
+            WHERE employee_id = p_employee_id;
+            SELECT version INTO v_new_version FROM employees WHERE employee_id = p_employee_id;
+            COMMIT;
+            SET @app_current_user = NULL, @app_current_role = NULL, @app_justification = NULL;
+        END IF;
     END IF;
+
+    SELECT v_status                             AS status,
+           v_salary                             AS old_salary,
+           v_full_name                          AS old_full_name,
+           v_department                         AS old_department,
+           v_role                               AS old_role,
+           COALESCE(p_salary, v_salary)         AS new_salary,
+           COALESCE(p_full_name, v_full_name)   AS new_full_name,
+           COALESCE(p_department, v_department) AS new_department,
+           COALESCE(p_role, v_role)             AS new_role,
+           v_version                            AS old_version,
+           COALESCE(v_new_version, v_version)   AS new_version;
 END$$
 
 DELIMITER ;
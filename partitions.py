@@ -0,0 +1,147 @@
+# Maintenance for the monthly partitions on audit_log
+import argparse
+from datetime import date, datetime
+
+from tabulate import tabulate
+from rich import print
+
+from audit_query import AUDIT_COLUMNS
+from database import get_conn
+
+# Every audit_log column except the generated change_pct
+STORED_COLUMNS = AUDIT_COLUMNS + ("old_amount", "new_amount", "prev_hash", "row_hash", "chain_seq")
+
+""" First day of the month `offset` months after the month containing day """
+def add_months(day: date, offset: int) -> date:
+    index = day.year * 12 + (day.month - 1) + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+""" Partition name for the month starting at month_start, ex: p202610 """
+def partition_name(month_start: date) -> str:
+    return f"p{month_start.year:04d}{month_start.month:02d}"
+
+"""
+    Returns the monthly partitions of audit_log as (name, month_start, row_estimate),
+    oldest first. The pmax catch-all is not included.
+"""
+def list_partitions(cur):
+    cur.execute(
+        """
+        SELECT partition_name, partition_description, table_rows
+        FROM information_schema.partitions
+        WHERE table_schema = DATABASE()
+          AND table_name = 'audit_log'
+          AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position;
+        """
+    )
+    partitions = []
+    for name, description, rows in cur.fetchall():
+        if name == "pmax":
+            continue
+        # Bound is UNIX_TIMESTAMP of the first day of the next month
+        upper = datetime.fromtimestamp(int(description)).date()
+        partitions.append((name, add_months(upper, -1), rows))
+    return partitions
+
+"""
+    Makes sure audit_log has a partition for the current month and the next
+    `months_ahead` months by splitting them off pmax.
+    Returns the names of the partitions that were created.
+"""
+def ensure_future_partitions(cur, months_ahead: int = 3, today: date | None = None):
+    today = today or date.today()
+    existing = list_partitions(cur)
+    if existing:
+        next_month = add_months(existing[-1][1], 1)
+    else:
+        next_month = add_months(today, 0)
+
+    last_month = add_months(today, months_ahead)
+    new_parts = []
+    while next_month <= last_month:
+        new_parts.append(next_month)
+        next_month = add_months(next_month, 1)
+
+    if not new_parts:
+        return []
+
+    definitions = ", ".join(
+        f"PARTITION {partition_name(m)} VALUES LESS THAN "
+        f"(UNIX_TIMESTAMP('{add_months(m, 1).isoformat()} 00:00:00'))"
+        for m in new_parts
+    )
+    cur.execute(
+        f"ALTER TABLE audit_log REORGANIZE PARTITION pmax INTO "
+        f"({definitions}, PARTITION pmax VALUES LESS THAN MAXVALUE);"
+    )
+    return [partition_name(m) for m in new_parts]
+
+"""
+    Moves rows left in audit_log_exchange by an interrupted run into the archive.
+    INSERT IGNORE keeps this safe to repeat. The columns are listed because the
+    generated change_pct column cannot be copied.
+"""
+def flush_exchange(cur):
+    columns = ", ".join(STORED_COLUMNS)
+    cur.execute(f"INSERT IGNORE INTO audit_log_archive ({columns}) SELECT {columns} FROM audit_log_exchange;")
+    moved = cur.rowcount
+    cur.execute("TRUNCATE TABLE audit_log_exchange;")
+    return moved
+
+"""
+    Detaches every partition holding months older than `retain_months` and moves its
+    rows into audit_log_archive. Each partition is swapped into audit_log_exchange
+    (a metadata-only operation), copied into the archive and then dropped.
+    Returns (partition, rows moved) pairs.
+"""
+def archive_old_partitions(conn, cur, retain_months: int = 12, today: date | None = None):
+    today = today or date.today()
+    cutoff = add_months(today, -retain_months)
+
+    flush_exchange(cur)
+    conn.commit()
+
+    archived = []
+    for name, month_start, _ in list_partitions(cur):
+        if month_start >= cutoff:
+            break
+        cur.execute(f"ALTER TABLE audit_log EXCHANGE PARTITION {name} WITH TABLE audit_log_exchange;")
+        moved = flush_exchange(cur)
+        conn.commit()
+        cur.execute(f"ALTER TABLE audit_log DROP PARTITION {name};")
+        archived.append((name, moved))
+    return archived
+
+"""
+    Pre-creates upcoming partitions and archives expired ones, then prints the layout.
+"""
+def run_maintenance(months_ahead: int = 3, retain_months: int = 12):
+    with get_conn() as conn:
+        cur = conn.cursor()
+
+        created = ensure_future_partitions(cur, months_ahead)
+        if created:
+            print(f"[green]Created partitions:[/green] {', '.join(created)}")
+        else:
+            print("[yellow]Future partitions already exist.[/yellow]")
+
+        archived = archive_old_partitions(conn, cur, retain_months)
+        for name, moved in archived:
+            print(f"[green]Archived {name}:[/green] {moved} row(s) moved to audit_log_archive")
+        if not archived:
+            print(f"[yellow]No partitions older than {retain_months} month(s) to archive.[/yellow]")
+
+        table = [[name, month_start, rows] for name, month_start, rows in list_partitions(cur)]
+        cur.close()
+
+    print("[bold cyan]audit_log partitions:[/bold cyan]")
+    print(tabulate(table, headers=["Partition", "Month", "Est. Rows"], tablefmt="grid"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create upcoming audit_log partitions and archive old ones.")
+    parser.add_argument("--ahead", type=int, default=3, help="months of future partitions to keep ready")
+    parser.add_argument("--retain", type=int, default=12, help="months of history to keep in audit_log")
+    args = parser.parse_args()
+    run_maintenance(args.ahead, args.retain)
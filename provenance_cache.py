@@ -0,0 +1,244 @@
+# In-process cache of per-employee change history
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from audit_query import decode_values
+from database import get_conn
+
+HISTORY_SQL = """
+    SELECT
+        audit_id,
+        column_name,
+        old_value,
+        new_value,
+        old_amount AS old_value_amount,
+        new_amount AS new_value_amount,
+        changed_by,
+        changed_role,
+        justification,
+        changed_at
+    FROM {source}
+    WHERE table_name = 'employees'
+      AND row_id = %s
+    ORDER BY changed_at ASC, audit_id ASC;
+"""
+
+CURRENT_SQL = """
+    SELECT employee_id, full_name, department, role, salary
+    FROM employees
+    WHERE employee_id = %s;
+"""
+
+# New audit rows are always in the live table, and the primary key makes this a range read.
+# Rows of every table are read so the feed state sees each audit_id and can tell skipped
+# ids (transactions that had not committed yet) from ids that belong to other tables.
+DELTA_COLUMNS = """
+    SELECT
+        audit_id,
+        table_name,
+        row_id,
+        column_name,
+        old_value,
+        new_value,
+        old_amount AS old_value_amount,
+        new_amount AS new_value_amount,
+        changed_by,
+        changed_role,
+        justification,
+        changed_at
+    FROM audit_log
+"""
+DELTA_SQL = DELTA_COLUMNS + "WHERE audit_id > %s ORDER BY audit_id LIMIT %s;"
+GAP_SQL = DELTA_COLUMNS + "WHERE audit_id IN ({ids}) ORDER BY audit_id;"
+RECENT_IDS_SQL = "SELECT audit_id FROM audit_log WHERE audit_id > %s ORDER BY audit_id;"
+
+
+def _estimate_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_estimate_size(v) for v in obj)
+    return size
+
+"""
+    Feed state for a cache that is (re)starting at `newest`. Ids below it that are not
+    committed yet would be missed, so the ids in the last MAX_TRACKED_GAP are read once
+    and the missing ones start out as gaps.
+"""
+def _fresh_state(cur, newest, now):
+    from cdc import FeedState, MAX_TRACKED_GAP  # cdc imports audit, which imports this module
+
+    state = FeedState(max(newest - MAX_TRACKED_GAP, 0))
+    cur.execute(RECENT_IDS_SQL, (state.watermark,))
+    state.advance(cur.fetchall(), now)
+    return state
+
+"""
+    LRU cache of {employee_id: (current row, full change history)}, bounded in bytes.
+    Freshness is kept by polling MAX(audit_id) at most every poll_interval seconds and
+    folding only the newer audit rows into the cached employees they touch. Ids skipped
+    because their transaction had not committed yet are tracked with cdc.FeedState and
+    folded in once they show up. If more than max_delta_rows arrived since the last
+    poll the cache is simply cleared.
+"""
+class ProvenanceCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, poll_interval=1.0, max_delta_rows=10000):
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.max_delta_rows = max_delta_rows
+        self._entries = OrderedDict()  # employee_id -> entry dict, least recently used first
+        self._bytes = 0
+        self._state = None             # cdc.FeedState: audit_ids folded into the cache
+        self._polled_at = None
+        self._lock = threading.RLock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "delta_rows": 0,
+            "resets": 0,
+        }
+
+    """ Returns (current employee row or None, list of history rows oldest first) """
+    def get(self, employee_id: int):
+        with self._lock:
+            with get_conn() as conn:
+                cur = conn.cursor(dictionary=True)
+                self._sync(cur)
+
+                entry = self._entries.get(employee_id)
+                if entry is not None:
+                    self._entries.move_to_end(employee_id)
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+                    entry = self._load(cur, employee_id)
+                    self._store(employee_id, entry)
+                cur.close()
+            return entry["current"], entry["history"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._state = None
+            self._polled_at = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "watermark": self._state.watermark if self._state else None,
+                "gaps": len(self._state.gaps) if self._state else 0,
+            }
+
+    def _load(self, cur, employee_id):
+        from audit import audit_source  # audit.py imports this module
+
+        cur.execute(CURRENT_SQL, (employee_id,))
+        current = cur.fetchone()
+        cur.execute(HISTORY_SQL.format(source=audit_source(cur)), (employee_id,))
+        history = [decode_values(row) for row in cur.fetchall()]
+        last_audit_id = max((r["audit_id"] for r in history), default=0)
+        return {"current": current, "history": history, "last_audit_id": last_audit_id}
+
+    def _store(self, employee_id, entry):
+        entry["bytes"] = _estimate_size(entry["current"]) + _estimate_size(entry["history"])
+        if entry["bytes"] > self.max_bytes:
+            return
+        self._entries[employee_id] = entry
+        self._bytes += entry["bytes"]
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted["bytes"]
+            self.stats["evictions"] += 1
+
+    """
+        Folds audit rows committed since the last poll into the cached entries they
+        touch: rows after the watermark and skipped ids that have committed since.
+        Within one employee audit_ids follow commit order (the row lock serializes
+        updates), so an entry never needs a row older than its last_audit_id.
+    """
+    def _sync(self, cur):
+        now = time.monotonic()
+        if self._polled_at is not None and now - self._polled_at < self.poll_interval:
+            return
+        self._polled_at = now
+
+        cur.execute("SELECT COALESCE(MAX(audit_id), 0) AS newest FROM audit_log;")
+        newest = cur.fetchone()["newest"]
+        if self._state is None or not self._entries:
+            self._state = _fresh_state(cur, newest, now)
+            return
+        state = self._state
+        state.expire_gaps(now)
+        if newest <= state.watermark and not state.gaps:
+            return
+
+        cur.execute(DELTA_SQL, (state.watermark, self.max_delta_rows + 1))
+        rows = cur.fetchall()
+        if len(rows) > self.max_delta_rows:
+            self._entries.clear()
+            self._bytes = 0
+            self.stats["resets"] += 1
+            self._state = _fresh_state(cur, newest, now)
+            return
+        if state.gaps:
+            ids = sorted(state.gaps)
+            cur.execute(GAP_SQL.format(ids=", ".join(["%s"] * len(ids))), ids)
+            rows = sorted(cur.fetchall() + rows, key=lambda r: r["audit_id"])
+        state.advance(rows, now)
+
+        rows = [decode_values(row) for row in rows if row.pop("table_name") == "employees"]
+        for row in rows:
+            entry = self._entries.get(row["row_id"])
+            if entry is None or row["audit_id"] <= entry["last_audit_id"]:
+                continue
+            employee_id = row.pop("row_id")
+            entry["history"].append(row)
+            entry["last_audit_id"] = row["audit_id"]
+            if entry["current"] is not None and row["column_name"] in entry["current"]:
+                entry["current"][row["column_name"]] = row["new_value"]
+            self.stats["delta_rows"] += 1
+
+            # Re-measure the entry since its history grew
+            self._bytes -= entry["bytes"]
+            entry["bytes"] = _estimate_size(entry["current"]) + _estimate_size(entry["history"])
+            self._bytes += entry["bytes"]
+            if entry["bytes"] > self.max_bytes:
+                del self._entries[employee_id]
+                self._bytes -= entry["bytes"]
+                self.stats["evictions"] += 1
+
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted["bytes"]
+            self.stats["evictions"] += 1
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+""" Returns the process-wide provenance cache, sized from PROVENANCE_CACHE_BYTES """
+def get_provenance_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProvenanceCache(
+                    max_bytes=int(os.getenv("PROVENANCE_CACHE_BYTES", str(32 * 1024 * 1024))),
+                    poll_interval=float(os.getenv("PROVENANCE_CACHE_POLL", "1.0")),
+                )
+    return _cache
+
+
+""" Hit/miss/eviction counters and current size of the provenance cache """
+def get_provenance_cache_stats():
+    return get_provenance_cache().snapshot()
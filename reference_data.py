@@ -0,0 +1,96 @@
+# In-process cache of reference data: departments and the roles in each
+import os
+import threading
+import time
+
+from database import get_conn, load_env
+
+# One pass over idx_employees_department_role gives every (department, role) pair
+DEPARTMENT_ROLES_SQL = "SELECT DISTINCT department, role FROM employees ORDER BY department, role;"
+
+"""
+    The departments in employees and the roles held in each, read with one query and
+    kept for `ttl` seconds. Updates made by this process that touch department or role
+    call invalidate(), so the next read reloads; changes made elsewhere show up once
+    the TTL runs out.
+"""
+class ReferenceData:
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._roles = None       # {department: [roles]}, departments in order
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "loads": 0,
+            "invalidations": 0,
+        }
+
+    def _current(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._roles is not None and now - self._loaded_at < self.ttl:
+                self.stats["hits"] += 1
+                return self._roles
+
+            with get_conn() as conn:
+                cur = conn.cursor()
+                cur.execute(DEPARTMENT_ROLES_SQL)
+                rows = cur.fetchall()
+                cur.close()
+
+            roles = {}
+            for department, role in rows:
+                # A department whose employees have no role still gets listed
+                department_roles = roles.setdefault(department, [])
+                if role is not None:
+                    department_roles.append(role)
+            self._roles = roles
+            self._loaded_at = now
+            self.stats["loads"] += 1
+            return roles
+
+    """ Sorted list of departments """
+    def departments(self):
+        return list(self._current())
+
+    """ Sorted list of roles held in `department` (empty if there are none) """
+    def roles(self, department):
+        return list(self._current().get(department, ()))
+
+    """ {department: [roles]} for every department """
+    def roles_by_department(self):
+        return {department: list(roles) for department, roles in self._current().items()}
+
+    def invalidate(self):
+        with self._lock:
+            self._roles = None
+            self._loaded_at = None
+            self.stats["invalidations"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "ttl": self.ttl,
+                "age": None if self._loaded_at is None else time.monotonic() - self._loaded_at,
+            }
+
+
+_reference = None
+_reference_lock = threading.Lock()
+
+""" Returns the process-wide reference data cache, with its TTL from REFERENCE_DATA_TTL """
+def get_reference_data():
+    global _reference
+    if _reference is None:
+        with _reference_lock:
+            if _reference is None:
+                load_env()
+                _reference = ReferenceData(ttl=float(os.getenv("REFERENCE_DATA_TTL", "300")))
+    return _reference
+
+
+""" Hit/load/invalidation counters and the age of the cached reference data """
+def get_reference_data_stats():
+    return get_reference_data().snapshot()
@@ -0,0 +1,429 @@
+# Salary analytics over the audit history
+# Salary audit rows are loaded column by column into NumPy arrays and every statistic
+# is computed with array operations (sorts, cumulative sums, bincounts) instead of a
+# Python loop over rows, so a few million changes take seconds.
+#     python salary_analytics.py                                # everything, by month
+#     python salary_analytics.py --since 2025-01-01 --by role --period quarter
+import argparse
+
+from tabulate import tabulate
+from rich import print
+
+from audit import audit_source
+from database import get_conn
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+FETCH_BATCH = 100000
+PERCENTILES = (10, 25, 50, 75, 90)
+# Raise percentage buckets: below the first edge, between each pair, from the last edge up
+RAISE_EDGES = (-10, -5, 0, 2, 4, 6, 8, 10, 15, 20)
+PERIODS = ("month", "quarter", "year")
+GROUPINGS = ("department", "role")
+
+# changed_at as wall-clock seconds since 1970 (not UNIX_TIMESTAMP, which converts
+# from the session time zone), so month boundaries match what the reports show.
+# Amounts come back as integer cents: exact, and no Decimal per value.
+SALARY_ROWS_SQL = """
+    SELECT row_id, audit_id,
+           TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', changed_at),
+           CAST(old_amount * 100 AS SIGNED),
+           CAST(new_amount * 100 AS SIGNED),
+           changed_by
+    FROM {source}
+    WHERE table_name = 'employees'
+      AND column_name = 'salary'
+      AND old_amount IS NOT NULL
+      AND new_amount IS NOT NULL
+      {bounds};
+"""
+
+# Department and role changes, to know which department and role each salary change
+# was made in. The whole history is read whatever the bounds.
+ATTRIBUTE_CHANGES_SQL = """
+    SELECT row_id, audit_id,
+           TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', changed_at),
+           COALESCE(old_value, ''),
+           COALESCE(new_value, '')
+    FROM {source}
+    WHERE table_name = 'employees'
+      AND column_name = %s;
+"""
+
+CURRENT_ATTRIBUTES_SQL = "SELECT employee_id, department, COALESCE(role, '') FROM employees;"
+
+""" Runs sql and returns one NumPy array per column, fetching FETCH_BATCH rows at a time """
+def _fetch_columns(cur, sql, params, dtypes):
+    cur.execute(sql, params)
+    parts = [[] for _ in dtypes]
+    while True:
+        rows = cur.fetchmany(FETCH_BATCH)
+        if not rows:
+            break
+        for part, values, dtype in zip(parts, zip(*rows), dtypes):
+            part.append(np.array(values, dtype=dtype))
+    return [np.concatenate(part) if part else np.array([], dtype=dtype) for part, dtype in zip(parts, dtypes)]
+
+"""
+    Value of an employee attribute at the time of each salary change: the new value of
+    the employee's last change at or before it, else the old value of their first
+    change after it, else their current value. One sort of salary rows and attribute
+    changes together; no per-row lookups.
+    changes is (employee, seconds, audit_id, old code, new code); current maps
+    employee_id -> code (default_code for employees that no longer exist).
+"""
+def _as_of(employee, seconds, audit_id, changes, current, default_code):
+    lookup = np.full(int(max(employee.max(initial=0), max(current, default=0))) + 1, default_code, dtype=np.int64)
+    if current:
+        ids = np.fromiter(current.keys(), dtype=np.int64, count=len(current))
+        lookup[ids] = np.fromiter(current.values(), dtype=np.int64, count=len(current))
+    values = lookup[employee]
+
+    c_employee, c_seconds, c_audit_id, c_old, c_new = changes
+    n, total = len(employee), len(employee) + len(c_employee)
+    if not len(c_employee) or not n:
+        return values
+
+    all_employee = np.concatenate([employee, c_employee])
+    order = np.lexsort((np.concatenate([audit_id, c_audit_id]),
+                        np.concatenate([seconds, c_seconds]),
+                        all_employee))
+    sorted_employee = all_employee[order]
+    is_change = order >= n
+    positions = np.arange(total)
+    previous = np.maximum.accumulate(np.where(is_change, positions, -1))
+    following = np.minimum.accumulate(np.where(is_change, positions, total)[::-1])[::-1]
+
+    salary_pos = np.flatnonzero(~is_change)
+    salary_rows = order[salary_pos]
+
+    before = previous[salary_pos]
+    has_before = before >= 0
+    has_before[has_before] = sorted_employee[before[has_before]] == sorted_employee[salary_pos[has_before]]
+    values[salary_rows[has_before]] = c_new[order[before[has_before]] - n]
+
+    after = following[salary_pos]
+    has_after = ~has_before & (after < total)
+    has_after[has_after] = sorted_employee[after[has_after]] == sorted_employee[salary_pos[has_after]]
+    values[salary_rows[has_after]] = c_old[order[after[has_after]] - n]
+    return values
+
+"""
+    Every salary change in a period as parallel NumPy arrays, one entry per audit row:
+    employee, audit_id, seconds (wall-clock since 1970), old_cents, new_cents, and the
+    codes editor, department and role into the `editors` and `labels` name arrays.
+"""
+class SalaryHistory:
+    def __init__(self, employee, audit_id, seconds, old_cents, new_cents, editor, editors,
+                 department, role, labels):
+        self.employee = employee
+        self.audit_id = audit_id
+        self.seconds = seconds
+        self.old_cents = old_cents
+        self.new_cents = new_cents
+        self.editor = editor
+        self.editors = editors
+        self.department = department
+        self.role = role
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.employee)
+
+    """ Change as a percentage of the old salary (NaN when the old salary was 0) """
+    def raise_pct(self):
+        old = self.old_cents.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(old > 0, (self.new_cents - self.old_cents) * 100.0 / old, np.nan)
+
+    """ Period number of each change (months, quarters or years since 1970) """
+    def periods(self, period="month"):
+        months = self.seconds.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+        return months // {"month": 1, "quarter": 3, "year": 12}[period]
+
+    """ Rows as dicts, for code (and benchmarks) that work row by row """
+    def to_rows(self):
+        return [
+            {
+                "employee_id": int(e), "audit_id": int(a), "seconds": int(s),
+                "old_cents": int(o), "new_cents": int(n), "changed_by": str(self.editors[ed]),
+                "department": str(self.labels[d]), "role": str(self.labels[r]),
+            }
+            for e, a, s, o, n, ed, d, r in zip(self.employee, self.audit_id, self.seconds, self.old_cents,
+                                               self.new_cents, self.editor, self.department, self.role)
+        ]
+
+
+def period_label(number, period="month"):
+    number = int(number)
+    if period == "month":
+        return f"{1970 + number // 12}-{number % 12 + 1:02d}"
+    if period == "quarter":
+        return f"{1970 + number // 4}-Q{number % 4 + 1}"
+    return str(1970 + number)
+
+"""
+    Loads every salary change between since and until (inclusive, either may be None)
+    into a SalaryHistory, with the department and role each was made in.
+"""
+def load_salary_history(since=None, until=None):
+    bounds, params = "", []
+    if since is not None:
+        bounds += " AND changed_at >= %s"
+        params.append(since)
+    if until is not None:
+        bounds += " AND changed_at <= %s"
+        params.append(until)
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        source = audit_source(cur, since)
+        employee, audit_id, seconds, old_cents, new_cents, editor_names = _fetch_columns(
+            cur, SALARY_ROWS_SQL.format(source=source, bounds=bounds), tuple(params),
+            (np.int64, np.int64, np.int64, np.int64, np.int64, str),
+        )
+        history_source = audit_source(cur)
+        attribute_changes = {
+            column: _fetch_columns(cur, ATTRIBUTE_CHANGES_SQL.format(source=history_source), (column,),
+                                   (np.int64, np.int64, np.int64, str, str))
+            for column in GROUPINGS
+        }
+        cur.execute(CURRENT_ATTRIBUTES_SQL)
+        current = cur.fetchall()
+        cur.close()
+
+    editors, editor = np.unique(editor_names, return_inverse=True)
+
+    # One label vocabulary for departments and roles; '' stands for no role / unknown
+    names = [np.array([""], dtype=str), np.array([r[1] for r in current] + [r[2] for r in current], dtype=str)]
+    for changes in attribute_changes.values():
+        names.extend(changes[3:])
+    labels = np.unique(np.concatenate(names))
+    unknown = int(np.searchsorted(labels, ""))
+
+    attributes = {}
+    for index, column in enumerate(GROUPINGS, 1):
+        c_employee, c_audit_id, c_seconds, c_old, c_new = attribute_changes[column]
+        changes = (c_employee, c_seconds, c_audit_id,
+                   np.searchsorted(labels, c_old), np.searchsorted(labels, c_new))
+        codes = np.searchsorted(labels, np.array([r[index] for r in current], dtype=str))
+        current_codes = dict(zip((r[0] for r in current), codes.tolist()))
+        attributes[column] = _as_of(employee, seconds, audit_id, changes, current_codes, unknown)
+
+    return SalaryHistory(employee, audit_id, seconds, old_cents, new_cents, editor.astype(np.int64), editors,
+                         attributes["department"], attributes["role"], labels)
+
+"""
+    Distribution of raise percentages: count, mean, the given percentiles and how many
+    changes fall in each RAISE_EDGES bucket, plus counts of raises, cuts and no-ops.
+"""
+def raise_distribution(history, percentiles=PERCENTILES, edges=RAISE_EDGES):
+    pct = history.raise_pct()
+    pct = pct[~np.isnan(pct)]
+    counts = np.bincount(np.searchsorted(np.asarray(edges, dtype=np.float64), pct, side="right"),
+                         minlength=len(edges) + 1)
+    bounds = (None,) + tuple(edges) + (None,)
+    return {
+        "count": int(len(pct)),
+        "mean": float(pct.mean()) if len(pct) else None,
+        "percentiles": dict(zip(percentiles, np.percentile(pct, percentiles).tolist())) if len(pct) else {},
+        "raises": int(np.count_nonzero(pct > 0)),
+        "cuts": int(np.count_nonzero(pct < 0)),
+        "unchanged": int(np.count_nonzero(pct == 0)),
+        "buckets": [(bounds[i], bounds[i + 1], int(c)) for i, c in enumerate(counts)],
+    }
+
+"""
+    Raise percentage percentiles for every (department or role, period) pair, computed
+    for all groups at once: one lexsort by (group, period, value), then each percentile
+    is read off every group's slice by index, interpolating like np.percentile.
+    Returns rows {group, period, count, mean, p<q>...} ordered by group then period.
+"""
+def group_percentiles(history, by="department", period="month", percentiles=PERCENTILES):
+    pct = history.raise_pct()
+    valid = ~np.isnan(pct)
+    values = pct[valid]
+    groups = getattr(history, by)[valid]
+    periods = history.periods(period)[valid]
+    if not len(values):
+        return []
+
+    order = np.lexsort((values, periods, groups))
+    values, groups, periods = values[order], groups[order], periods[order]
+    boundary = np.empty(len(values), dtype=bool)
+    boundary[0] = True
+    boundary[1:] = (groups[1:] != groups[:-1]) | (periods[1:] != periods[:-1])
+    starts = np.flatnonzero(boundary)
+    counts = np.diff(np.append(starts, len(values)))
+
+    position = starts[:, None] + (counts[:, None] - 1) * (np.asarray(percentiles, dtype=np.float64) / 100)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    table = values[low] + (values[high] - values[low]) * (position - low)
+    means = np.add.reduceat(values, starts) / counts
+
+    return [
+        {
+            "group": str(history.labels[groups[s]]) or "N/A",
+            "period": period_label(periods[s], period),
+            "count": int(c),
+            "mean": float(m),
+            **{f"p{q}": float(v) for q, v in zip(percentiles, row)},
+        }
+        for s, c, m, row in zip(starts, counts, means, table)
+    ]
+
+"""
+    Running salary change per employee. Returns a dict of arrays, one entry per employee
+    (employee_id, changes, first_cents = salary before their first change, last_cents,
+    total_cents) and `running_cents`, the change to date after each audit row, in
+    (employee, time) order given by `order`.
+"""
+def cumulative_by_employee(history):
+    order = np.lexsort((history.audit_id, history.seconds, history.employee))
+    employee = history.employee[order]
+    delta = (history.new_cents - history.old_cents)[order]
+    if not len(employee):
+        empty = np.array([], dtype=np.int64)
+        return {"employee_id": empty, "changes": empty, "first_cents": empty, "last_cents": empty,
+                "total_cents": empty, "running_cents": empty, "order": order}
+
+    boundary = np.empty(len(employee), dtype=bool)
+    boundary[0] = True
+    boundary[1:] = employee[1:] != employee[:-1]
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(employee)) - 1
+
+    running = np.cumsum(delta)
+    # Subtract the total carried over from the employees sorted before each one
+    running -= (running[starts] - delta[starts])[np.cumsum(boundary) - 1]
+    return {
+        "employee_id": employee[starts],
+        "changes": ends - starts + 1,
+        "first_cents": history.old_cents[order][starts],
+        "last_cents": history.new_cents[order][ends],
+        "total_cents": running[ends],
+        "running_cents": running,
+        "order": order,
+    }
+
+"""
+    Totals per editor: number of changes, raises and cuts, net and gross amount changed
+    and mean raise percentage. Returns rows sorted by gross amount, largest first.
+"""
+def editor_totals(history):
+    size = len(history.editors)
+    delta = history.new_cents - history.old_cents
+    pct = history.raise_pct()
+    valid = ~np.isnan(pct)
+
+    changes = np.bincount(history.editor, minlength=size)
+    raises = np.bincount(history.editor[delta > 0], minlength=size)
+    cuts = np.bincount(history.editor[delta < 0], minlength=size)
+    net = np.bincount(history.editor, weights=delta, minlength=size)
+    gross = np.bincount(history.editor, weights=np.abs(delta), minlength=size)
+    pct_count = np.bincount(history.editor[valid], minlength=size)
+    pct_sum = np.bincount(history.editor[valid], weights=pct[valid], minlength=size)
+
+    rows = [
+        {
+            "changed_by": str(history.editors[i]),
+            "changes": int(changes[i]),
+            "raises": int(raises[i]),
+            "cuts": int(cuts[i]),
+            "net_cents": int(net[i]),
+            "gross_cents": int(gross[i]),
+            "mean_pct": float(pct_sum[i] / pct_count[i]) if pct_count[i] else None,
+        }
+        for i in np.argsort(-gross, kind="stable")
+    ]
+    return rows
+
+
+def _money(cents):
+    return f"{cents / 100:,.2f}"
+
+
+def _pct(value):
+    return "N/A" if value is None else f"{value:.2f}%"
+
+
+def print_raise_distribution(history):
+    result = raise_distribution(history)
+    print(f"[bold cyan]Raise percentages ({result['count']:,} salary changes):[/bold cyan]")
+    if not result["count"]:
+        print("[yellow]No salary changes in this period.[/yellow]")
+        return result
+    print(f"Mean {_pct(result['mean'])}; {result['raises']:,} raises, {result['cuts']:,} cuts, "
+          f"{result['unchanged']:,} unchanged")
+    print(tabulate([[f"p{q}", _pct(v)] for q, v in result["percentiles"].items()],
+                   headers=["Percentile", "Raise"], tablefmt="grid"))
+    table = [
+        [("< " + f"{high:g}%") if low is None else (f">= {low:g}%" if high is None else f"{low:g}% to {high:g}%"),
+         count]
+        for low, high, count in result["buckets"]
+    ]
+    print(tabulate(table, headers=["Bucket", "Changes"], tablefmt="grid"))
+    return result
+
+
+def print_group_percentiles(history, by="department", period="month"):
+    rows = group_percentiles(history, by, period)
+    print(f"[bold cyan]Raise percentiles by {by} and {period}:[/bold cyan]")
+    if not rows:
+        print("[yellow]No salary changes in this period.[/yellow]")
+        return rows
+    headers = [by.title(), period.title(), "Changes", "Mean"] + [f"p{q}" for q in PERCENTILES]
+    table = [[r["group"], r["period"], r["count"], _pct(r["mean"])] + [_pct(r[f"p{q}"]) for q in PERCENTILES]
+             for r in rows]
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+    return rows
+
+
+def print_top_employees(history, top=10):
+    result = cumulative_by_employee(history)
+    print(f"[bold cyan]Largest cumulative salary changes (top {top}):[/bold cyan]")
+    if not len(result["employee_id"]):
+        print("[yellow]No salary changes in this period.[/yellow]")
+        return result
+    biggest = np.argsort(-np.abs(result["total_cents"]), kind="stable")[:top]
+    table = [
+        [int(result["employee_id"][i]), int(result["changes"][i]), _money(result["first_cents"][i]),
+         _money(result["last_cents"][i]), _money(result["total_cents"][i]),
+         _pct(result["total_cents"][i] * 100 / result["first_cents"][i]) if result["first_cents"][i] else "N/A"]
+        for i in biggest
+    ]
+    print(tabulate(table, headers=["Employee ID", "Changes", "From", "To", "Change", "Change %"], tablefmt="grid"))
+    return result
+
+
+def print_editor_totals(history, top=10):
+    rows = editor_totals(history)
+    print(f"[bold cyan]Salary changes by editor (top {top} by amount changed):[/bold cyan]")
+    if not rows:
+        print("[yellow]No salary changes in this period.[/yellow]")
+        return rows
+    table = [[r["changed_by"], r["changes"], r["raises"], r["cuts"], _money(r["net_cents"]),
+              _money(r["gross_cents"]), _pct(r["mean_pct"])]
+             for r in rows[:top]]
+    print(tabulate(table, headers=["Changed By", "Changes", "Raises", "Cuts", "Net", "Gross", "Mean Raise"],
+                   tablefmt="grid"))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Salary statistics over the audit history.")
+    parser.add_argument("--since", help="first changed_at to include, ex: 2025-01-01")
+    parser.add_argument("--until", help="last changed_at to include")
+    parser.add_argument("--by", choices=GROUPINGS, default="department", help="grouping for the percentiles")
+    parser.add_argument("--period", choices=PERIODS, default="month", help="time bucket for the percentiles")
+    parser.add_argument("--top", type=int, default=10, help="employees and editors to list")
+    args = parser.parse_args()
+
+    history = load_salary_history(args.since, args.until)
+    print(f"[green]Loaded {len(history):,} salary changes.[/green]")
+    print_raise_distribution(history)
+    print_group_percentiles(history, args.by, args.period)
+    print_top_employees(history, args.top)
+    print_editor_totals(history, args.top)
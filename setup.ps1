@@ -95,6 +95,10 @@ DB_NAME=$DB_NAME
 "@ | Out-File -Encoding UTF8 ".env"
 }
 
+# 6) Create the monthly audit_log partitions
+Write-Host "`n>>> Creating audit_log partitions..."
+python partitions.py
+
 Write-Host "`n=== Setup complete! ==="
 Write-Host "To activate the virtual environment in the future: .\venv\Scripts\Activate.ps1"
 Write-Host "Then run the app with: python main.py"
@@ -57,6 +57,11 @@ EOF
   echo ">>> .env created."
 fi
 
+# 6) Create the monthly audit_log partitions
+echo
+echo ">>> Creating audit_log partitions..."
+python partitions.py
+
 echo
 echo "=== Setup complete! ==="
 echo "To activate the virtual environment later, run: source venv/bin/activate"
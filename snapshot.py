@@ -0,0 +1,276 @@
+# Point-in-time ("as of") reconstruction of the employees table
+import argparse
+from datetime import datetime
+
+from tabulate import tabulate
+from rich import print
+
+from audit import audit_source
+from audit_query import decode_values
+from cdc import MAX_TRACKED_GAP, FeedState
+from database import get_conn
+
+TRACKED_FIELDS = ("full_name", "department", "role", "salary")
+
+CHECKPOINT_BEFORE_SQL = """
+    SELECT checkpoint_id, taken_at, last_audit_id
+    FROM employee_checkpoints
+    WHERE taken_at <= %s
+    ORDER BY taken_at DESC
+    LIMIT 1;
+"""
+
+CHECKPOINT_AFTER_SQL = """
+    SELECT checkpoint_id, taken_at, last_audit_id
+    FROM employee_checkpoints
+    WHERE taken_at > %s
+    ORDER BY taken_at ASC
+    LIMIT 1;
+"""
+
+# Changes made after a checkpoint and up to the target time, replayed oldest first.
+# {gap_filter} adds the checkpoint's gaps: ids below its last_audit_id whose
+# transaction had not committed when it was taken, so the copy does not have them.
+FORWARD_DELTAS_SQL = """
+    SELECT row_id, column_name, new_value AS value, new_amount AS value_amount
+    FROM {source}
+    WHERE table_name = 'employees'
+      AND (audit_id > %s {gap_filter})
+      AND changed_at <= %s
+      {employee_filter}
+    ORDER BY changed_at ASC, audit_id ASC;
+"""
+
+# Changes made after the target time (and covered by the checkpoint), undone newest
+# first. {gap_filter} leaves out the checkpoint's gaps, which the copy does not have.
+REVERSE_DELTAS_SQL = """
+    SELECT row_id, column_name, old_value AS value, old_amount AS value_amount
+    FROM {source}
+    WHERE table_name = 'employees'
+      AND changed_at > %s
+      AND audit_id <= %s {gap_filter}
+      {employee_filter}
+    ORDER BY changed_at DESC, audit_id DESC;
+"""
+
+# Gap rows of a later checkpoint made up to the target time, replayed oldest first
+GAP_DELTAS_SQL = """
+    SELECT row_id, column_name, new_value AS value, new_amount AS value_amount
+    FROM {source}
+    WHERE table_name = 'employees'
+      AND audit_id IN ({gap_ids})
+      AND changed_at <= %s
+      {employee_filter}
+    ORDER BY changed_at ASC, audit_id ASC;
+"""
+
+GAPS_SQL = "SELECT audit_id FROM employee_checkpoint_gaps WHERE checkpoint_id = %s ORDER BY audit_id;"
+
+def _find_checkpoint(cur, sql, timestamp):
+    cur.execute(sql, (timestamp,))
+    return cur.fetchone()
+
+
+def _checkpoint_gaps(cur, checkpoint):
+    cur.execute(GAPS_SQL, (checkpoint["checkpoint_id"],))
+    return tuple(r["audit_id"] for r in cur.fetchall())
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _employee_filter(employee_id):
+    if employee_id is None:
+        return "", (), ""
+    return "AND row_id = %s", (employee_id,), "AND employee_id = %s"
+
+
+def _load_checkpoint(cur, checkpoint, employee_id):
+    _, params, where = _employee_filter(employee_id)
+    cur.execute(
+        f"""
+        SELECT employee_id, full_name, department, role, salary
+        FROM employee_checkpoint_rows
+        WHERE checkpoint_id = %s {where};
+        """,
+        (checkpoint["checkpoint_id"],) + params,
+    )
+    return {r["employee_id"]: r for r in cur.fetchall()}
+
+
+def _load_current(cur, employee_id):
+    _, params, where = _employee_filter(employee_id)
+    cur.execute(
+        f"""
+        SELECT employee_id, full_name, department, role, salary
+        FROM employees
+        WHERE TRUE {where};
+        """,
+        params,
+    )
+    return {r["employee_id"]: r for r in cur.fetchall()}
+
+
+def _apply_deltas(cur, state, sql, params, employee_id, start_time, **parts):
+    audit_filter, filter_params, _ = _employee_filter(employee_id)
+    cur.execute(
+        sql.format(source=audit_source(cur, start_time), employee_filter=audit_filter, **parts),
+        params + filter_params,
+    )
+    applied = 0
+    for row in cur:
+        employee = state.get(row["row_id"])
+        if employee is None or row["column_name"] not in TRACKED_FIELDS:
+            continue
+        employee[row["column_name"]] = decode_values(row, ("value",))["value"]
+        applied += 1
+    return applied
+
+"""
+    Reconstructs employee rows as they were at `timestamp`.
+    Starts from whichever is closer in time: the newest checkpoint taken at or before
+    the timestamp (replaying later changes forward), or the next checkpoint after it
+    (or the live employees table when there is none, undoing later changes). The work
+    is bounded by the changes between the timestamp and that starting point.
+    Only updates are audited, so employees inserted after `timestamp` still appear and
+    deleted ones do not.
+    Returns a list of dicts ordered by employee_id.
+"""
+def as_of(timestamp, employee_id: int | None = None):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+
+    with get_conn() as conn:
+        cur = conn.cursor(dictionary=True)
+        before = _find_checkpoint(cur, CHECKPOINT_BEFORE_SQL, timestamp)
+        after = _find_checkpoint(cur, CHECKPOINT_AFTER_SQL, timestamp)
+        if after:
+            after_time = after["taken_at"]
+        else:
+            # taken_at and changed_at are server times; so is the live table's "now"
+            cur.execute("SELECT NOW() AS now;")
+            after_time = cur.fetchone()["now"]
+
+        if before and timestamp - before["taken_at"] <= after_time - timestamp:
+            state = _load_checkpoint(cur, before, employee_id)
+            gaps = _checkpoint_gaps(cur, before)
+            _apply_deltas(cur, state, FORWARD_DELTAS_SQL,
+                          (before["last_audit_id"], *gaps, timestamp), employee_id, before["taken_at"],
+                          gap_filter=f"OR audit_id IN ({_placeholders(gaps)})" if gaps else "")
+        else:
+            if after:
+                state = _load_checkpoint(cur, after, employee_id)
+                last_audit_id = after["last_audit_id"]
+                gaps = _checkpoint_gaps(cur, after)
+            else:
+                state = _load_current(cur, employee_id)
+                last_audit_id = 2 ** 31 - 1
+                gaps = ()
+            _apply_deltas(cur, state, REVERSE_DELTAS_SQL,
+                          (timestamp, last_audit_id, *gaps), employee_id, timestamp,
+                          gap_filter=f"AND audit_id NOT IN ({_placeholders(gaps)})" if gaps else "")
+            if gaps:
+                _apply_deltas(cur, state, GAP_DELTAS_SQL, (*gaps, timestamp), employee_id, timestamp,
+                              gap_ids=_placeholders(gaps))
+        cur.close()
+
+    return [state[k] for k in sorted(state)]
+
+"""
+    Display employees as they were at `timestamp`.
+"""
+def print_as_of(timestamp, employee_id: int | None = None):
+    rows = as_of(timestamp, employee_id)
+    if not rows:
+        if employee_id is None:
+            print(f"[yellow]No employees found as of {timestamp}.[/yellow]")
+        else:
+            print(f"[yellow]Employee {employee_id} not found as of {timestamp}.[/yellow]")
+        return
+
+    table = [
+        [
+            r["employee_id"],
+            r["full_name"],
+            r["department"],
+            r["role"] or "N/A",
+            r["salary"],
+        ]
+        for r in rows
+    ]
+    headers = ["ID", "Name", "Department", "Role", "Salary"]
+    print(f"[bold magenta]Employees as of {timestamp}:[/bold magenta]")
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+
+"""
+    Materializes the current employees table as a checkpoint.
+    The audit high-water mark and the employee rows are read from one consistent
+    snapshot so replaying from the checkpoint never double-applies or skips a change.
+    Audit ids commit out of order, so the ids in the last MAX_TRACKED_GAP below the
+    high-water mark that the snapshot cannot see are stored as the checkpoint's gaps,
+    the way cdc.FeedState tracks them; replay treats them as not in the copy.
+    Returns the new checkpoint_id.
+"""
+def create_checkpoint():
+    with get_conn() as conn:
+        conn.start_transaction(consistent_snapshot=True)
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(audit_id), 0), NOW() FROM audit_log;")
+        last_audit_id, taken_at = cur.fetchone()
+        gaps = FeedState(max(last_audit_id - MAX_TRACKED_GAP, 0))
+        cur.execute("SELECT audit_id FROM audit_log WHERE audit_id > %s ORDER BY audit_id;", (gaps.watermark,))
+        gaps.advance([{"audit_id": row[0]} for row in cur.fetchall()], now=0)
+        cur.execute("SELECT employee_id, full_name, department, role, salary FROM employees;")
+        employees = cur.fetchall()
+
+        cur.execute(
+            "INSERT INTO employee_checkpoints (taken_at, last_audit_id) VALUES (%s, %s);",
+            (taken_at, last_audit_id),
+        )
+        checkpoint_id = cur.lastrowid
+        cur.executemany(
+            """
+            INSERT INTO employee_checkpoint_rows
+                (checkpoint_id, employee_id, full_name, department, role, salary)
+            VALUES (%s, %s, %s, %s, %s, %s);
+            """,
+            [(checkpoint_id,) + tuple(e) for e in employees],
+        )
+        cur.executemany(
+            "INSERT INTO employee_checkpoint_gaps (checkpoint_id, audit_id) VALUES (%s, %s);",
+            [(checkpoint_id, audit_id) for audit_id in sorted(gaps.gaps)],
+        )
+        conn.commit()
+        cur.close()
+
+    print(f"[green]Checkpoint {checkpoint_id} taken at {taken_at}:[/green] {len(employees)} employee(s), audit_id <= {last_audit_id}"
+          f"{f' except {len(gaps.gaps)} uncommitted' if gaps.gaps else ''}")
+    return checkpoint_id
+
+"""
+    Takes a checkpoint only if at least `min_changes` audit rows were written since the
+    last one. Meant to be run periodically (e.g. from cron).
+    Returns the new checkpoint_id or None.
+"""
+def maybe_checkpoint(min_changes: int = 10000):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(last_audit_id), 0) FROM employee_checkpoints;")
+        last_audit_id = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM audit_log WHERE audit_id > %s;", (last_audit_id,))
+        pending = cur.fetchone()[0]
+        cur.close()
+
+    if pending < min_changes:
+        print(f"[yellow]{pending} change(s) since the last checkpoint, fewer than {min_changes}; skipping.[/yellow]")
+        return None
+    return create_checkpoint()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Take a checkpoint of the employees table for as-of queries.")
+    parser.add_argument("--min-changes", type=int, default=10000,
+                        help="only checkpoint after this many audit rows since the last checkpoint (0 = always)")
+    args = parser.parse_args()
+    maybe_checkpoint(args.min_changes)
@@ -0,0 +1,47 @@
+import sys
+import threading
+
+from lazy import lazy_import
+
+SLOW_MODULE = """
+import time
+time.sleep(0.2)  # keep the first import running while the other threads arrive
+def connect():
+    return "connected"
+"""
+
+
+def test_first_use_from_many_threads(tmp_path, monkeypatch):
+    (tmp_path / "slow_lazy_module.py").write_text(SLOW_MODULE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "slow_lazy_module", raising=False)
+
+    module = lazy_import("slow_lazy_module")
+    threads = 8
+    barrier = threading.Barrier(threads)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(module.connect())
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    assert errors == []
+    assert results == ["connected"] * threads
+    assert sys.modules["slow_lazy_module"] is not module  # the real module replaced the stand-in
+
+
+def test_missing_module():
+    try:
+        lazy_import("no_such_module_anywhere")
+    except ModuleNotFoundError:
+        return
+    raise AssertionError("expected ModuleNotFoundError")
@@ -0,0 +1,117 @@
+# Checks that every audit.py query is served by an index
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from tabulate import tabulate
+from rich import print
+
+import audit
+from database import get_conn
+
+# Any recent constant gives the plan the reports get from audit.one_month_ago()
+MONTH_AGO = (datetime.now() - timedelta(days=31)).replace(microsecond=0)
+
+""" SQL and params of the first page of an audit.py stream, as it runs against audit_log """
+def first_page(stream):
+    return stream.query.page_query(audit.LIVE_SOURCE)
+
+
+def summary(sql):
+    return sql.format(source=audit.LIVE_SOURCE), ()
+
+# (name, sql, sample params, indexes it is meant to use) for every query audit.py runs against audit_log
+QUERIES = [
+    ("salary changes last month", *first_page(audit.iter_salary_changes_last_month(since=MONTH_AGO)),
+     ("idx_audit_column_time",)),
+    ("name changes last month", *first_page(audit.iter_name_changes_last_month(since=MONTH_AGO)),
+     ("idx_audit_column_time",)),
+    ("department changes last month", *first_page(audit.iter_department_changes_last_month(since=MONTH_AGO)),
+     ("idx_audit_column_time",)),
+    ("role changes last month", *first_page(audit.iter_role_changes_last_month(since=MONTH_AGO)),
+     ("idx_audit_column_time",)),
+    ("changes in range", *first_page(audit.iter_changes_in_range("2024-01-01 00:00:00", "2024-02-01 00:00:00")),
+     ("idx_audit_changed_at",)),
+    ("field history", *first_page(audit.iter_field_history(1, "salary")),
+     ("idx_audit_row_time", "idx_audit_column_time")),
+    ("all changes for employee", *first_page(audit.iter_all_changes_for_employee(1)), ("idx_audit_row_time",)),
+    ("changes by user", *first_page(audit.iter_changes_by_user("Shirley Collins")), ("idx_audit_user_time",)),
+    ("changes by role", *first_page(audit.iter_changes_by_role("HR Manager")), ("idx_audit_role_time",)),
+    ("salary raises over 10%", *first_page(audit.iter_salary_raises(10)), ("idx_audit_change_pct",)),
+    ("summary by user", *summary(audit.USER_SUMMARY_SQL), ("idx_audit_user_time",)),
+    ("summary by role", *summary(audit.ROLE_SUMMARY_SQL), ("idx_audit_role_time",)),
+]
+
+# These dump the whole log on purpose, so a full scan is expected
+FULL_LOG_QUERIES = [
+    ("all changes organized by user", *first_page(audit.iter_all_changes_organized_by_user()), None),
+    ("all changes organized by role", *first_page(audit.iter_all_changes_organized_by_role()), None),
+]
+
+"""
+    Runs EXPLAIN on a query and returns the plan row for audit_log.
+"""
+def explain(cur, sql: str, params: tuple):
+    cur.execute("EXPLAIN " + sql.strip().rstrip(";"), params)
+    rows = cur.fetchall()
+    for row in rows:
+        if row["table"] and row["table"].startswith("audit_log"):
+            return row
+    return rows[0] if rows else None
+
+"""
+    EXPLAINs every audit.py query. A query fails when MySQL scans the whole table or
+    does not use one of the indexes it was written for. On a small table the
+    optimizer may legitimately prefer scanning; allow_small_table_scans turns those
+    failures into warnings.
+    Returns True if every query passed.
+"""
+def verify_indexes(allow_small_table_scans=False) -> bool:
+    failures = 0
+    table = []
+    with get_conn() as conn:
+        cur = conn.cursor(dictionary=True)
+        for name, sql, params, expected_keys in QUERIES + FULL_LOG_QUERIES:
+            plan = explain(cur, sql, params)
+            if plan is None:
+                status = "[yellow]no plan[/yellow]"
+            elif expected_keys is None:
+                status = "[cyan]full log (expected)[/cyan]"
+            elif plan["type"] == "ALL" or plan["key"] not in expected_keys:
+                problem = "FULL SCAN" if plan["type"] == "ALL" else f"expected {' or '.join(expected_keys)}"
+                if allow_small_table_scans and plan["possible_keys"]:
+                    status = f"[yellow]{problem} (small table?)[/yellow]"
+                else:
+                    status = f"[red]{problem}[/red]"
+                    failures += 1
+            else:
+                status = "[green]ok[/green]"
+
+            table.append([
+                name,
+                plan["type"] if plan else "N/A",
+                plan["key"] if plan else "N/A",
+                plan["rows"] if plan else "N/A",
+                plan["Extra"] if plan else "N/A",
+                status,
+            ])
+        cur.close()
+
+    headers = ["Query", "Access Type", "Index Used", "Est. Rows", "Extra", "Status"]
+    print("[bold cyan]audit_log index verification:[/bold cyan]")
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+
+    if failures:
+        print(f"[red]{failures} query(s) scan the table or miss their index. "
+              "Run mysql/migrate_add_audit_indexes.sql.[/red]")
+        return False
+    print("[green]All audit queries use their indexes.[/green]")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every audit.py query uses its index.")
+    parser.add_argument("--allow-small-table-scans", action="store_true",
+                        help="only warn when the optimizer scans a table it has indexes for (small test data)")
+    args = parser.parse_args()
+    sys.exit(0 if verify_indexes(args.allow_small_table_scans) else 1)